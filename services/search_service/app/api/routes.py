@@ -1,7 +1,9 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Depends
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from pydantic import BaseModel
 from app.main import document_processor
+from storage.chroma import build_where
+from services.uploads import UploadTooLarge, spool_upload
 import logging
 
 router = APIRouter()
@@ -10,28 +12,53 @@ logger = logging.getLogger(__name__)
 class SearchQuery(BaseModel):
     query: str
     limit: Optional[int] = 5
+    plan_id: Optional[int] = None
+    client_id: Optional[int] = None
+    document_type: Optional[str] = None
+    where: Optional[Dict[str, Any]] = None
+    where_document: Optional[Dict[str, Any]] = None
 
 class ProcessResponse(BaseModel):
     document_id: str
     summary: str
     entities: List[dict]
+    # True when the same file was already processed with matching metadata
+    duplicate: bool = False
 
 @router.post("/documents/upload")
 async def upload_document(
     file: UploadFile = File(...),
-    title: Optional[str] = None
+    title: Optional[str] = None,
+    plan_id: Optional[int] = None,
+    client_id: Optional[int] = None,
+    document_type: Optional[str] = None
 ):
-    """Upload and process a document."""
+    """Upload and process a document.
+
+    The file is streamed to a spooled temporary file and hashed on the way;
+    re-uploading a file already processed with matching metadata returns the
+    existing document.
+    """
     try:
-        content = await file.read()
-        content = content.decode("utf-8")
-        title = title or file.filename
-        
-        result = await document_processor.process_document(
-            content=content,
-            title=title
-        )
+        metadata = {
+            "plan_id": plan_id,
+            "client_id": client_id,
+            "document_type": document_type
+        }
+        with await spool_upload(file) as upload:
+            result = await document_processor.find_duplicate(upload.sha256, metadata)
+            if result is None:
+                result = await document_processor.process_document(
+                    content=upload.read_text(),
+                    title=title or file.filename,
+                    metadata=metadata,
+                    content_sha256=upload.sha256
+                )
         return ProcessResponse(**result)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="Document must be UTF-8 text")
     except Exception as e:
         logger.error(f"Error processing document: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -40,9 +67,19 @@ async def upload_document(
 async def search_documents(query: SearchQuery):
     """Search through processed documents."""
     try:
+        where = build_where(
+            {
+                "plan_id": query.plan_id,
+                "client_id": query.client_id,
+                "document_type": query.document_type
+            },
+            query.where
+        )
         results = await document_processor.search(
             query=query.query,
-            limit=query.limit
+            limit=query.limit,
+            where=where,
+            where_document=query.where_document
         )
         return results
     except Exception as e:
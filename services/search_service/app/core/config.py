@@ -17,6 +17,26 @@ class Settings(BaseSettings):
 
     # ChromaDB Settings
     CHROMA_PERSIST_DIRECTORY: str = os.getenv("CHROMA_PERSIST_DIRECTORY", "./chroma_db")
+    CHROMA_BATCH_SIZE: int = int(os.getenv("CHROMA_BATCH_SIZE", "256"))
+    CHROMA_FLUSH_INTERVAL: float = float(os.getenv("CHROMA_FLUSH_INTERVAL", "1.0"))
+    CHROMA_FLUSH_MAX_ATTEMPTS: int = int(os.getenv("CHROMA_FLUSH_MAX_ATTEMPTS", "3"))
+
+    # Embedding model settings (EMBEDDING_MODEL, EMBEDDING_BACKEND, ...) are read by
+    # services.embedding_engine.EngineConfig so both apps share one engine
+
+    # Lexical Search Settings
+    BM25_INDEX_DIR: str = os.getenv("BM25_INDEX_DIR", "./bm25_index")
+    HYBRID_CANDIDATES: int = int(os.getenv("HYBRID_CANDIDATES", "50"))
+
+    # Reranking Settings
+    RERANK_ENABLED: bool = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+    RERANK_MODEL: str = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+    RERANK_CANDIDATES: int = int(os.getenv("RERANK_CANDIDATES", "30"))
+    RERANK_BATCH_SIZE: int = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+    RERANK_BUDGET_MS: float = float(os.getenv("RERANK_BUDGET_MS", "200"))
+
+    # Startup Settings
+    WARMUP_ON_STARTUP: bool = os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true"
 
     # Anthropic Settings
     ANTHROPIC_API_KEY: str = os.getenv("ANTHROPIC_API_KEY", "")
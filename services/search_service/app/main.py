@@ -1,17 +1,28 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Response
+from typing import List, Optional
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from storage.chroma import ChromaStore
 from storage.neo4j import Neo4jStore
+from storage.bm25 import BM25Index
 from services.llm import LLMService
 from services.embeddings import EmbeddingsService
 from services.document import DocumentProcessor
+from services.reranker import Reranker
+from services.lazy import Lazy, resolve, warm_up, component_status, record_timing, startup_timings
+from services.process_pool import process_pool
+from services.tracing import instrument_app
+import asyncio
 import logging
+import time
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Namespace of this app's lazily loaded components in services.lazy
+COMPONENTS = "app"
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json"
@@ -26,31 +37,116 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
+# Stage timing middleware and the Prometheus /metrics endpoint
+instrument_app(app)
+
+# Initialize services; models are wrapped in Lazy and load on first use. The
+# stores are Lazy too so their clients are created in each worker, after a
+# preloading master has forked, rather than shared across processes.
+init_start = time.perf_counter()
 try:
-    chroma_store = ChromaStore(persist_directory=settings.CHROMA_PERSIST_DIRECTORY)
-    neo4j_store = Neo4jStore(
+    chroma_store = Lazy("chroma", lambda: ChromaStore(
+        persist_directory=settings.CHROMA_PERSIST_DIRECTORY,
+        batch_size=settings.CHROMA_BATCH_SIZE,
+        flush_interval=settings.CHROMA_FLUSH_INTERVAL,
+        max_attempts=settings.CHROMA_FLUSH_MAX_ATTEMPTS
+    ), COMPONENTS)
+    neo4j_store = Lazy("neo4j", lambda: Neo4jStore(
         uri=settings.NEO4J_URI,
         username=settings.NEO4J_USER,
         password=settings.NEO4J_PASSWORD
-    )
-    embeddings_service = EmbeddingsService()
+    ), COMPONENTS)
+    lexical_index = BM25Index(settings.BM25_INDEX_DIR)
+    embeddings_service = Lazy("embeddings", EmbeddingsService, COMPONENTS)
     llm_service = LLMService()
+    reranker = Lazy("reranker", lambda: Reranker(
+        model_name=settings.RERANK_MODEL,
+        batch_size=settings.RERANK_BATCH_SIZE,
+        budget_ms=settings.RERANK_BUDGET_MS
+    ), COMPONENTS) if settings.RERANK_ENABLED else None
     document_processor = DocumentProcessor(
         embeddings_service=embeddings_service,
         llm_service=llm_service,
         chroma_store=chroma_store,
-        neo4j_store=neo4j_store
+        neo4j_store=neo4j_store,
+        lexical_index=lexical_index,
+        reranker=reranker
     )
 except Exception as e:
     logger.error(f"Failed to initialize services: {str(e)}")
     raise
+record_timing("services", time.perf_counter() - init_start, COMPONENTS)
+warmup_task: Optional[asyncio.Task] = None
+
+# Components holding only model weights, which forked workers can share
+FORK_SAFE_COMPONENTS = ("embeddings", "reranker")
+
+def preload():
+    """Load the models in a pre-forking server's master process (see gunicorn.conf.py)."""
+    warm_up(COMPONENTS, [name for name in FORK_SAFE_COMPONENTS if name in component_status(COMPONENTS)])
+    logger.info(f"Preloaded models: {startup_timings(COMPONENTS)}")
+
+@app.on_event("startup")
+async def startup_event():
+    """Optionally load the models in the background so first requests stay fast."""
+    global warmup_task
+    # Connect this worker's own store clients before serving
+    await asyncio.gather(resolve(chroma_store), resolve(neo4j_store))
+    if settings.WARMUP_ON_STARTUP:
+        # Keep a reference: the event loop only holds tasks weakly
+        warmup_task = asyncio.create_task(asyncio.to_thread(warm_up, COMPONENTS))
+    logger.info(f"Service startup timings: {startup_timings(COMPONENTS)}")
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Cleanup connections on shutdown."""
-    neo4j_store.close()
+    if chroma_store.loaded:
+        await asyncio.to_thread(chroma_store.flush)
+    if neo4j_store.loaded:
+        neo4j_store.close()
+    process_pool.shutdown()
 
 # Import and include routers
 from app.api.routes import router as api_router
-app.include_router(api_router, prefix=settings.API_V1_STR) 
\ No newline at end of file
+app.include_router(api_router, prefix=settings.API_V1_STR) 
+
+@app.get("/health/live")
+async def liveness():
+    """The process is up and the event loop is responding."""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness(response: Response):
+    """Ready once, with WARMUP_ON_STARTUP, every model has loaded."""
+    components = component_status(COMPONENTS)
+    ready = not settings.WARMUP_ON_STARTUP or all(components.values())
+    if not ready:
+        response.status_code = 503
+    return {
+        "status": "ready" if ready else "starting",
+        "components": components,
+        "timings": startup_timings(COMPONENTS),
+    }
+
+@app.get("/health/rerank")
+async def rerank_health():
+    """Cross-encoder latency and budget statistics since the model loaded."""
+    if reranker is None:
+        return {"enabled": False}
+    if not reranker.loaded:
+        return {"enabled": True, "loaded": False}
+    return {"enabled": True, "loaded": True, **reranker.stats()}
+
+@app.get("/health/pool")
+async def pool_health():
+    """Process pool queue depth and task latency."""
+    return process_pool.stats()
+
+@app.post("/warmup")
+async def warmup(components: Optional[List[str]] = Query(None)):
+    """Load the given components (all by default) so no request pays for it."""
+    try:
+        timings = await asyncio.to_thread(warm_up, COMPONENTS, components)
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"components": component_status(COMPONENTS), "timings": timings}
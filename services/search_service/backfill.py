@@ -0,0 +1,271 @@
+"""Resumable, throttled batch jobs that rewrite existing rows after a schema change.
+
+Run from services/ as a module:
+
+    python -m search_service.backfill status
+    python -m search_service.backfill pack-embeddings --rows-per-second 2000
+    python -m search_service.backfill move-content
+    python -m search_service.backfill prune-blobs
+    python -m search_service.reembed --mode reencode      # also built on this module
+
+A job walks one table in primary-key order. Each batch is processed and
+committed together with the job's checkpoint row, so an interrupted job
+resumes after the last committed batch. To keep live traffic unaffected the
+batch size adapts to BACKFILL_TARGET_BATCH_SECONDS, the row rate is capped
+at ``rows_per_second``, and on PostgreSQL every batch runs with a short
+lock_timeout and is retried with a smaller batch when it hits one.
+"""
+import argparse
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, List, Optional, Sequence
+from dotenv import load_dotenv
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Query, Session, undefer
+from .database import SessionLocal
+from .models import BackfillCheckpoint, PensionPlan, Document
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+BACKFILL_BATCH_SIZE = int(os.getenv("BACKFILL_BATCH_SIZE", "500"))
+BACKFILL_MAX_BATCH_SIZE = int(os.getenv("BACKFILL_MAX_BATCH_SIZE", "5000"))
+# Batches are resized towards this duration, keeping row locks short
+BACKFILL_TARGET_BATCH_SECONDS = float(os.getenv("BACKFILL_TARGET_BATCH_SECONDS", "0.5"))
+# Row rate cap across batches; 0 disables throttling
+BACKFILL_ROWS_PER_SECOND = float(os.getenv("BACKFILL_ROWS_PER_SECOND", "1000"))
+# A batch waiting this long for a lock gives up and retries smaller (PostgreSQL)
+BACKFILL_LOCK_TIMEOUT_MS = int(os.getenv("BACKFILL_LOCK_TIMEOUT_MS", "2000"))
+BACKFILL_MAX_RETRIES = 5
+
+
+@dataclass
+class Backfill:
+    """A batch job over ``model``; ``process(db, rows)`` updates rows in place and returns how many changed."""
+    name: str
+    model: type
+    process: Callable[[Session, List], int]
+    # Narrows the rows the job visits, e.g. to those not migrated yet
+    where: Optional[Callable[[Query], Query]] = None
+    # Loader options such as undefer() for deferred columns the job reads
+    options: Sequence = field(default_factory=tuple)
+
+    def query(self, db: Session) -> Query:
+        query = db.query(self.model).options(*self.options)
+        return self.where(query) if self.where else query
+
+
+def _checkpoint(db: Session, name: str, restart: bool, start_after: Optional[int]) -> BackfillCheckpoint:
+    checkpoint = db.get(BackfillCheckpoint, name)
+    if checkpoint is None or restart:
+        if checkpoint is None:
+            checkpoint = BackfillCheckpoint(name=name)
+            db.add(checkpoint)
+        checkpoint.last_id = 0
+        checkpoint.rows_done = 0
+        checkpoint.started_at = datetime.utcnow()
+        checkpoint.finished_at = None
+    if start_after is not None:
+        checkpoint.last_id = start_after
+        checkpoint.finished_at = None
+    checkpoint.updated_at = datetime.utcnow()
+    db.commit()
+    return checkpoint
+
+
+def _set_lock_timeout(db: Session):
+    if BACKFILL_LOCK_TIMEOUT_MS and db.get_bind().dialect.name == "postgresql":
+        db.connection().exec_driver_sql(f"SET LOCAL lock_timeout = '{BACKFILL_LOCK_TIMEOUT_MS}ms'")
+
+
+def run(
+    job: Backfill,
+    batch_size: int = BACKFILL_BATCH_SIZE,
+    rows_per_second: float = BACKFILL_ROWS_PER_SECOND,
+    restart: bool = False,
+    start_after: Optional[int] = None,
+    progress_seconds: float = 10.0,
+    count: bool = True
+) -> int:
+    """Run ``job`` to completion from its checkpoint; returns rows changed in this run."""
+    db = SessionLocal()
+    try:
+        checkpoint = _checkpoint(db, job.name, restart, start_after)
+        if checkpoint.finished_at is not None:
+            print(f"{job.name}: already finished at {checkpoint.finished_at:%Y-%m-%d %H:%M} ({checkpoint.rows_done} rows); use --restart to run again")
+            return 0
+
+        model = job.model
+        remaining = job.query(db).filter(model.id > checkpoint.last_id).count() if count else None
+        print(f"{job.name}: resuming after id {checkpoint.last_id}" + (f", {remaining} rows to visit" if count else ""))
+
+        changed = visited = retries = 0
+        start = last_report = time.perf_counter()
+        while True:
+            batch_start = time.perf_counter()
+            try:
+                _set_lock_timeout(db)
+                rows = (
+                    job.query(db)
+                    .filter(model.id > checkpoint.last_id)
+                    .order_by(model.id)
+                    .limit(batch_size)
+                    .all()
+                )
+                if not rows:
+                    checkpoint.finished_at = datetime.utcnow()
+                    checkpoint.updated_at = checkpoint.finished_at
+                    db.commit()
+                    break
+                updated = job.process(db, rows)
+                # The checkpoint commits with the batch, so a resumed job never repeats or skips rows
+                checkpoint.last_id = rows[-1].id
+                checkpoint.rows_done += updated
+                checkpoint.updated_at = datetime.utcnow()
+                db.commit()
+            except OperationalError as e:
+                # Lock or statement timeout: back off with a smaller batch instead of blocking traffic
+                db.rollback()
+                retries += 1
+                if retries > BACKFILL_MAX_RETRIES:
+                    raise
+                batch_size = max(1, batch_size // 2)
+                logger.warning(f"{job.name}: batch failed ({str(e).splitlines()[0]}); retrying with {batch_size} rows")
+                time.sleep(min(30.0, 2 ** retries))
+                continue
+
+            retries = 0
+            changed += updated
+            visited += len(rows)
+
+            elapsed = time.perf_counter() - batch_start
+            if elapsed > 2 * BACKFILL_TARGET_BATCH_SECONDS:
+                batch_size = max(1, batch_size // 2)
+            elif elapsed < BACKFILL_TARGET_BATCH_SECONDS / 2 and len(rows) == batch_size:
+                batch_size = min(BACKFILL_MAX_BATCH_SIZE, batch_size * 2)
+            if rows_per_second:
+                time.sleep(max(0.0, len(rows) / rows_per_second - elapsed))
+
+            if time.perf_counter() - last_report >= progress_seconds:
+                last_report = time.perf_counter()
+                rate = visited / (last_report - start)
+                progress = f"{visited} rows visited, {changed} changed, {rate:.0f} rows/s, last id {checkpoint.last_id}"
+                if remaining:
+                    eta = (remaining - visited) / rate if rate else float("inf")
+                    progress += f", {100 * visited / remaining:.1f}% done, ETA {eta / 60:.1f} min"
+                print(f"{job.name}: {progress}")
+
+        print(f"{job.name}: finished, {visited} rows visited, {changed} changed in {time.perf_counter() - start:.1f}s")
+        return changed
+    finally:
+        db.close()
+
+
+def status() -> List[BackfillCheckpoint]:
+    db = SessionLocal()
+    try:
+        return db.query(BackfillCheckpoint).order_by(BackfillCheckpoint.started_at).all()
+    finally:
+        db.close()
+
+
+def pack_embeddings_job(model) -> Backfill:
+    """Move embeddings still only in the legacy float column into the compact packed column."""
+    from . import semantic_index
+
+    def process(db: Session, rows: List) -> int:
+        for row in rows:
+            semantic_index.set_embedding(row, list(semantic_index.get_embedding(row)))
+        return len(rows)
+
+    return Backfill(
+        name=f"pack-embeddings:{model.__tablename__}",
+        model=model,
+        process=process,
+        where=lambda query: query.filter(model.embedding_packed.is_(None), model.embedding.isnot(None)),
+        options=(undefer(model.embedding_packed), undefer(model.embedding)),
+    )
+
+
+def move_content_job() -> Backfill:
+    """Move document bodies from the legacy content column into the blob store."""
+    from . import document_content
+
+    def process(db: Session, rows: List) -> int:
+        for row in rows:
+            document_content.set_content(row, row.content)
+        return len(rows)
+
+    return Backfill(
+        name="move-content:documents",
+        model=Document,
+        process=process,
+        where=lambda query: query.filter(Document.content.isnot(None), Document.content_key.is_(None)),
+        options=(undefer(Document.content),),
+    )
+
+
+def add_run_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE, help="Initial rows per batch")
+    parser.add_argument("--rows-per-second", type=float, default=BACKFILL_ROWS_PER_SECOND, help="0 disables throttling")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and start from the beginning")
+    parser.add_argument("--start-after", type=int, help="Resume after this primary key")
+    parser.add_argument("--no-count", action="store_true", help="Skip counting rows up front (no ETA)")
+
+
+def run_with_arguments(job: Backfill, args) -> int:
+    return run(
+        job,
+        batch_size=args.batch_size,
+        rows_per_second=args.rows_per_second,
+        restart=args.restart,
+        start_after=args.start_after,
+        count=not args.no_count
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resumable batched backfills.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("status", help="Show the checkpoint of every backfill")
+    pack = commands.add_parser("pack-embeddings", help="Fill embedding_packed from the legacy float column")
+    pack.add_argument("--table", choices=["plans", "documents", "all"], default="all")
+    add_run_arguments(pack)
+    move = commands.add_parser("move-content", help="Move document bodies into the blob store")
+    add_run_arguments(move)
+    prune = commands.add_parser("prune-blobs", help="Delete blobs no document references")
+    prune.add_argument("--min-age", type=float, default=3600.0, help="Keep blobs younger than this many seconds")
+    args = parser.parse_args()
+    if args.command == "pack-embeddings" and args.table == "all" and args.start_after is not None:
+        # Primary keys of one table mean nothing in the other
+        parser.error("--start-after needs --table plans or --table documents")
+
+    if args.command == "status":
+        for checkpoint in status():
+            state = f"finished {checkpoint.finished_at:%Y-%m-%d %H:%M}" if checkpoint.finished_at else "in progress"
+            print(f"{checkpoint.name}: {state}, {checkpoint.rows_done} rows, last id {checkpoint.last_id}")
+        return
+    if args.command == "move-content":
+        run_with_arguments(move_content_job(), args)
+        return
+    if args.command == "prune-blobs":
+        from . import document_content
+
+        db = SessionLocal()
+        try:
+            print(f"prune-blobs: removed {document_content.prune_blobs(db, args.min_age)} blobs")
+        finally:
+            db.close()
+        return
+
+    models = {"plans": [PensionPlan], "documents": [Document], "all": [PensionPlan, Document]}[args.table]
+    for model in models:
+        run_with_arguments(pack_embeddings_job(model), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""Headless load and soak test of the legacy /chat workflow.
+
+Run from services/search_service (needs httpx):
+
+    python -m benchmarks.chat_load --ramp 1 5 10 25 50 --stage-seconds 60
+    python -m benchmarks.chat_load --ramp 10 --soak-hours 4 --token-delay 0.02 --output soak.json
+    python -m benchmarks.chat_load --url http://localhost:8000 --clients 200 --ramp 10 20 40
+
+Each virtual broker owns one client and runs chat sessions against it: a few
+turns about that client's plans with think time in between, then a pause
+before the next session. Concurrency (the number of brokers) is ramped
+through ``--ramp`` stages and optionally held for a soak run.
+
+By default the app runs in this process on a seeded SQLite database with the
+fakes from benchmarks/fixtures.py (``--database-url`` points it at Postgres
+instead); the fake Anthropic answer takes ``--llm-latency`` plus
+``--token-delay`` per token. In-process runs also sample event-loop lag,
+time spent waiting for a database pool connection, pool occupancy, process
+pool stats and RSS. With ``--url`` the load goes to a running server and
+only client-side latency and throughput are recorded.
+
+Every ``--sample-seconds`` a sample is taken of the window since the last
+one. Stages are flagged as saturated when throughput stops rising while the
+p95 latency climbs, and the soak summary gives the RSS growth rate from a
+least-squares fit, which should be flat once caches are warm.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from typing import Dict, List, Optional
+import numpy as np
+from .fixtures import percentiles, synthetic_corpus
+
+QUESTIONS = [
+    "What are the {topic} rules in my {plan} plan?",
+    "How does {topic} work for {company}?",
+    "Can you explain the {topic} section again?",
+    "What happens to {topic} if I change employer?",
+    "Summarise the {topic} terms of the {company} plan.",
+]
+
+
+class Recorder:
+    """Request outcomes and in-process probes, drained once per sample window."""
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.errors = 0
+        self.loop_lag: List[float] = []
+        self.pool_wait: List[float] = []
+
+    def drain(self) -> Dict[str, List[float]]:
+        window = {
+            "latencies": self.latencies, "errors": self.errors,
+            "loop_lag": self.loop_lag, "pool_wait": self.pool_wait,
+        }
+        self.latencies, self.errors, self.loop_lag, self.pool_wait = [], 0, [], []
+        return window
+
+
+def rss_mb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm") as f:
+            return round(int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20, 1)
+    except OSError:
+        return None
+
+
+def instrument_pool(engine, recorder: Recorder):
+    """Time every connection checkout from the SQLAlchemy pool, including the wait for a free slot."""
+    pool = engine.pool
+    connect = pool.connect
+
+    def timed_connect():
+        start = time.perf_counter()
+        try:
+            return connect()
+        finally:
+            recorder.pool_wait.append(time.perf_counter() - start)
+
+    pool.connect = timed_connect
+
+
+async def monitor_loop_lag(recorder: Recorder, interval: float = 0.1):
+    """How late the event loop wakes a sleeping task; high lag means blocking work on the loop."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        recorder.loop_lag.append(time.perf_counter() - start - interval)
+
+
+async def broker(http, client: Dict, corpus, recorder: Recorder, rng, args):
+    """One broker chatting with one client, session after session."""
+    plans = [corpus.plans[i] for i in client["plans"]] or corpus.plans[:1]
+    while True:
+        for _ in range(int(rng.integers(args.turns[0], args.turns[1] + 1))):
+            plan = plans[int(rng.integers(len(plans)))]
+            question = QUESTIONS[int(rng.integers(len(QUESTIONS)))].format(
+                topic=plan["topics"][int(rng.integers(len(plan["topics"])))],
+                plan=plan["plan_type"], company=plan["company_name"],
+            )
+            start = time.perf_counter()
+            try:
+                response = await http.post(
+                    "/chat", json={"query": question, "client_id": client["id"]},
+                    headers={"Idempotency-Key": uuid.uuid4().hex}
+                )
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            recorder.latencies.append(time.perf_counter() - start)
+            recorder.errors += failed
+            await asyncio.sleep(rng.exponential(args.think_time))
+        await asyncio.sleep(rng.exponential(args.session_pause))
+
+
+def summarize(window: Dict, seconds: float) -> Dict:
+    latencies = window["latencies"]
+    sample = {
+        "requests": len(latencies),
+        "errors": window["errors"],
+        "throughput_rps": round(len(latencies) / seconds, 2),
+        **percentiles(latencies),
+    }
+    if window["loop_lag"]:
+        lag = 1000 * np.asarray(window["loop_lag"])
+        sample.update(loop_lag_p99_ms=round(float(np.percentile(lag, 99)), 2), loop_lag_max_ms=round(float(lag.max()), 2))
+    if window["pool_wait"]:
+        wait = 1000 * np.asarray(window["pool_wait"])
+        sample.update(pool_wait_p95_ms=round(float(np.percentile(wait, 95)), 2), pool_wait_max_ms=round(float(wait.max()), 2))
+    return sample
+
+
+def flag_saturation(stages: List[Dict]):
+    """Mark stages where more brokers no longer buy throughput but do cost latency."""
+    for previous, stage in zip(stages, stages[1:]):
+        if previous["p95_ms"] and stage["p95_ms"]:
+            stage["saturated"] = (
+                stage["throughput_rps"] < 1.1 * previous["throughput_rps"] and stage["p95_ms"] > 1.5 * previous["p95_ms"]
+            )
+
+
+def growth_per_hour(samples: List[Dict], key: str) -> Optional[float]:
+    points = [(s["elapsed_s"], s[key]) for s in samples if s.get(key) is not None]
+    if len(points) < 3:
+        return None
+    x, y = np.asarray(points, dtype=np.float64).T
+    return round(float(np.polyfit(x, y, 1)[0]) * 3600, 2)
+
+
+class LoadRun:
+    def __init__(self, http, corpus, clients: List[Dict], args, probes=None):
+        self.http = http
+        self.corpus = corpus
+        self.clients = clients
+        self.args = args
+        self.probes = probes or (lambda: {})
+        self.recorder = Recorder()
+        self.brokers: List[asyncio.Task] = []
+        self.samples: List[Dict] = []
+        self.start = time.perf_counter()
+
+    def scale_to(self, concurrency: int):
+        while len(self.brokers) < concurrency:
+            client = self.clients[len(self.brokers) % len(self.clients)]
+            rng = np.random.default_rng([self.args.seed, len(self.brokers)])
+            self.brokers.append(asyncio.create_task(broker(self.http, client, self.corpus, self.recorder, rng, self.args)))
+
+    async def hold(self, phase: str, seconds: float) -> List[Dict]:
+        """Run for ``seconds`` at the current concurrency, sampling every window."""
+        samples = []
+        end = time.perf_counter() + seconds
+        while time.perf_counter() < end:
+            window_start = time.perf_counter()
+            await asyncio.sleep(min(self.args.sample_seconds, end - window_start))
+            sample = {
+                "phase": phase,
+                "elapsed_s": round(time.perf_counter() - self.start, 1),
+                "concurrency": len(self.brokers),
+                **summarize(self.recorder.drain(), time.perf_counter() - window_start),
+                **self.probes(),
+            }
+            samples.append(sample)
+            if self.args.verbose:
+                print(json.dumps(sample), file=sys.stderr)
+        self.samples += samples
+        return samples
+
+    async def run(self) -> Dict:
+        stages = []
+        for concurrency in self.args.ramp:
+            self.scale_to(concurrency)
+            self.recorder.drain()
+            window_start = time.perf_counter()
+            await self.hold("ramp", self.args.stage_seconds)
+            stage_samples = [s for s in self.samples if s["phase"] == "ramp" and s["concurrency"] == concurrency]
+            requests = sum(s["requests"] for s in stage_samples)
+            stages.append({
+                "concurrency": concurrency,
+                "requests": requests,
+                "errors": sum(s["errors"] for s in stage_samples),
+                "throughput_rps": round(requests / (time.perf_counter() - window_start), 2),
+                "p50_ms": _weighted(stage_samples, "p50_ms"),
+                "p95_ms": max((s["p95_ms"] for s in stage_samples if s["p95_ms"] is not None), default=None),
+                "p99_ms": max((s["p99_ms"] for s in stage_samples if s["p99_ms"] is not None), default=None),
+            })
+        flag_saturation(stages)
+
+        soak = None
+        if self.args.soak_hours:
+            self.scale_to(self.args.soak_concurrency or self.args.ramp[-1])
+            snapshot = tracemalloc.take_snapshot() if tracemalloc.is_tracing() else None
+            samples = await self.hold("soak", 3600 * self.args.soak_hours)
+            soak = {
+                "concurrency": len(self.brokers),
+                "requests": sum(s["requests"] for s in samples),
+                "errors": sum(s["errors"] for s in samples),
+                "rss_start_mb": samples[0].get("rss_mb") if samples else None,
+                "rss_end_mb": samples[-1].get("rss_mb") if samples else None,
+                "rss_growth_mb_per_hour": growth_per_hour(samples, "rss_mb"),
+                "p95_growth_ms_per_hour": growth_per_hour(samples, "p95_ms"),
+            }
+            if snapshot is not None:
+                # Allocation sites that grew the most over the soak
+                diff = tracemalloc.take_snapshot().compare_to(snapshot, "lineno")
+                soak["top_allocation_growth"] = [
+                    {"site": str(stat.traceback), "size_kb": round(stat.size_diff / 1024, 1), "count": stat.count_diff}
+                    for stat in diff[:15]
+                ]
+
+        for task in self.brokers:
+            task.cancel()
+        await asyncio.gather(*self.brokers, return_exceptions=True)
+        return {"stages": stages, "soak": soak, "samples": self.samples}
+
+
+def _weighted(samples: List[Dict], key: str) -> Optional[float]:
+    """Request-weighted mean of a per-window statistic."""
+    pairs = [(s[key], s["requests"]) for s in samples if s.get(key) is not None and s["requests"]]
+    if not pairs:
+        return None
+    values, weights = zip(*pairs)
+    return round(float(np.average(values, weights=weights)), 2)
+
+
+async def run_in_process(args) -> Dict:
+    import httpx
+    from .e2e import _configure_environment, _install_fakes, _seed_database
+    from .fixtures import NoopDatabase
+
+    with tempfile.TemporaryDirectory() as workdir:
+        _configure_environment(workdir, args)
+        if args.database_url:
+            os.environ["DATABASE_URL"] = args.database_url
+        set_latency = _install_fakes(args)
+        set_latency(False)
+
+        from search_service import main as legacy
+        from search_service.database import engine
+        from search_service.services.process_pool import process_pool
+        legacy.database = NoopDatabase()
+
+        corpus = synthetic_corpus(args.plans, args.documents_per_plan, clients=args.clients, queries=1, seed=args.seed)
+        client_ids = _seed_database(corpus)
+        clients = [{**client, "id": client_id} for client, client_id in zip(corpus.clients, client_ids)]
+        await legacy.app.router.startup()
+        set_latency(True)
+
+        def probes():
+            pool = engine.pool
+            sample = {"rss_mb": rss_mb(), "pool_pending": process_pool.stats()["queued"]}
+            if hasattr(pool, "checkedout"):
+                sample["db_checked_out"] = pool.checkedout()
+            return sample
+
+        transport = httpx.ASGITransport(app=legacy.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://load", timeout=None) as http:
+            run = LoadRun(http, corpus, clients, args, probes)
+            instrument_pool(engine, run.recorder)
+            lag = asyncio.create_task(monitor_loop_lag(run.recorder))
+            try:
+                report = await run.run()
+            finally:
+                lag.cancel()
+                await legacy.app.router.shutdown()
+        return report
+
+
+async def run_remote(args) -> Dict:
+    import httpx
+
+    corpus = synthetic_corpus(args.plans, args.documents_per_plan, clients=args.clients, queries=1, seed=args.seed)
+    # The server's clients are assumed to be ids 1..N, linked to plans as in the seed data
+    clients = [{**client, "id": i + 1} for i, client in enumerate(corpus.clients)]
+    limits = httpx.Limits(max_connections=max(args.ramp + [args.soak_concurrency or 0]))
+    async with httpx.AsyncClient(base_url=args.url, timeout=None, limits=limits) as http:
+        return await LoadRun(http, corpus, clients, args).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ramp", type=int, nargs="+", default=[1, 5, 10, 25, 50], help="Concurrent brokers per stage")
+    parser.add_argument("--stage-seconds", type=float, default=60)
+    parser.add_argument("--soak-hours", type=float, default=0.0, help="Hold concurrency this long after the ramp")
+    parser.add_argument("--soak-concurrency", type=int, help="Brokers during the soak (default: last ramp stage)")
+    parser.add_argument("--sample-seconds", type=float, default=10)
+    parser.add_argument("--think-time", type=float, default=5.0, help="Mean seconds between turns")
+    parser.add_argument("--session-pause", type=float, default=30.0, help="Mean seconds between sessions")
+    parser.add_argument("--turns", type=int, nargs=2, default=[3, 8], metavar=("MIN", "MAX"), help="Turns per session")
+    parser.add_argument("--plans", type=int, default=500)
+    parser.add_argument("--documents-per-plan", type=int, default=3)
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="Seconds to the first token of a fake answer")
+    parser.add_argument("--token-delay", type=float, default=0.01, help="Seconds per token of a fake answer")
+    parser.add_argument("--parse-latency", type=float, default=0.0)
+    parser.add_argument("--real-embeddings", action="store_true", help="Use the configured embedding model")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of the hashing encoder")
+    parser.add_argument("--database-url", help="Run the in-process app against this database instead of SQLite")
+    parser.add_argument("--url", help="Load a running server instead of an in-process app")
+    parser.add_argument("--tracemalloc", action="store_true", help="Report the allocation sites that grew during the soak")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--verbose", action="store_true", help="Print every sample to stderr")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    args = parser.parse_args()
+
+    if args.tracemalloc:
+        tracemalloc.start(10)
+    report = asyncio.run(run_remote(args) if args.url else run_in_process(args))
+    report = {
+        "benchmark": "chat_load",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        **report,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+"""End-to-end latency and throughput of the HTTP endpoints with local stand-ins.
+
+Run from services/search_service (needs httpx for the in-process ASGI client):
+
+    python -m benchmarks.e2e --sizes 100 1000 5000 --output e2e.json
+    python -m benchmarks.e2e --sizes 1000 --real-embeddings --llm-latency 0.8
+
+Each corpus size runs in a fresh subprocess with its own SQLite database,
+Chroma directory and BM25/vector indexes. Anthropic, LlamaParse, Ollama and
+Neo4j are replaced by the deterministic fakes in benchmarks/fixtures.py with
+the configured latencies, and the embedding model by a hashing encoder unless
+--real-embeddings is given. Both apps are driven in-process, so the numbers
+cover routing, validation, database, retrieval and serialisation but no
+network hops.
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from .fixtures import (
+    FakeAnthropic, FakeParser, HashEncoder, InMemoryGraphStore, NoopDatabase,
+    fake_graph_llm, fake_ollama, percentiles, synthetic_corpus,
+)
+
+SERVICE_DIR = Path(__file__).resolve().parents[1]
+ENDPOINTS = ("search", "chat", "uploads", "api_search", "graph_query")
+
+
+def _configure_environment(workdir: str, args):
+    """Point every store at ``workdir``; must run before the apps are imported."""
+    os.environ.update({
+        "DATABASE_URL": f"sqlite:///{workdir}/bench.db",
+        "CHROMA_PERSIST_DIRECTORY": f"{workdir}/chroma",
+        "BM25_INDEX_DIR": f"{workdir}/bm25",
+        "EMBEDDING_INDEX_DIR": f"{workdir}/vectors",
+        "DOCUMENT_BLOB_DIR": f"{workdir}/blobs",
+        "RERANK_ENABLED": "false",
+        "WARMUP_ON_STARTUP": "false",
+    })
+    # The legacy app is the search_service package, imported from services/
+    sys.path.insert(0, str(SERVICE_DIR.parent))
+    sys.path.insert(0, str(SERVICE_DIR))
+
+
+def _install_fakes(args):
+    """Swap external clients for local fakes; returns a function setting their latency."""
+    import importlib
+    import storage.neo4j
+    import services.llm
+
+    if not args.real_embeddings:
+        # Both apps share this module (see the aliases at the end of embedding_engine.py)
+        importlib.import_module("services.embedding_engine").build_encoder = lambda *a, **kw: HashEncoder(args.dim)
+
+    storage.neo4j.Neo4jStore = InMemoryGraphStore
+
+    from search_service import llm_service, document_processor, graph_service
+    anthropic = FakeAnthropic(args.llm_latency)
+    parser = FakeParser(args.parse_latency)
+    graph_llm = fake_graph_llm(args.llm_latency)
+    llm_service.AsyncAnthropic = lambda **kwargs: anthropic
+    document_processor.LlamaParse = lambda **kwargs: parser
+    graph_service.Anthropic = lambda **kwargs: graph_llm
+    if not args.real_embeddings:
+        graph_service.HuggingFaceEmbedding = lambda **kwargs: hash_graph_embedding(args.dim)
+
+    def set_latency(enabled: bool):
+        anthropic.latency = args.llm_latency if enabled else 0.0
+        anthropic.token_delay = args.token_delay if enabled else 0.0
+        parser.latency = args.parse_latency if enabled else 0.0
+        graph_llm.delay = args.llm_latency if enabled else 0.0
+        services.llm.LLMService._generate = fake_ollama(args.llm_latency if enabled else 0.0)
+    return set_latency
+
+
+def hash_graph_embedding(dim: int):
+    """HashEncoder exposed as a LlamaIndex embedding model for GraphService."""
+    from llama_index.embeddings.base import BaseEmbedding
+
+    encoder = HashEncoder(dim)
+
+    class HashEmbedding(BaseEmbedding):
+        def _get_query_embedding(self, query: str):
+            return encoder.encode([query], normalize=True)[0].tolist()
+
+        async def _aget_query_embedding(self, query: str):
+            return self._get_query_embedding(query)
+
+        def _get_text_embedding(self, text: str):
+            return encoder.encode([text], normalize=True)[0].tolist()
+
+    return HashEmbedding()
+
+
+def _seed_database(corpus):
+    """Insert plans, documents and clients with embeddings; returns the client ids."""
+    from datetime import datetime
+    from search_service.database import SessionLocal, engine
+    from search_service.models import Base, PensionPlan, Document, Client
+    from search_service.embeddings import embeddings_service
+    from search_service import document_content, semantic_index
+
+    Base.metadata.create_all(bind=engine)
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        plan_vectors = embeddings_service.embed([p["description"] for p in corpus.plans])
+        plans = []
+        for plan, vector in zip(corpus.plans, plan_vectors):
+            row = PensionPlan(
+                **{k: v for k, v in plan.items() if k != "topics"}, created_at=now, updated_at=now
+            )
+            semantic_index.set_embedding(row, vector.tolist())
+            plans.append(row)
+        db.add_all(plans)
+        db.flush()
+
+        document_vectors = embeddings_service.embed([d["content"] for d in corpus.documents])
+        for document, vector in zip(corpus.documents, document_vectors):
+            row = Document(
+                pension_plan_id=plans[document["plan"]].id, filename=document["filename"],
+                summary=document["content"][:120], key_information="", created_at=now, updated_at=now,
+            )
+            document_content.set_content(row, document["content"])
+            semantic_index.set_embedding(row, vector.tolist())
+            db.add(row)
+
+        clients = []
+        for client in corpus.clients:
+            row = Client(**{k: v for k, v in client.items() if k != "plans"}, created_at=now, updated_at=now)
+            row.pension_plans = [plans[i] for i in client["plans"]]
+            clients.append(row)
+        db.add_all(clients)
+        db.commit()
+        return [client.id for client in clients]
+    finally:
+        db.close()
+
+
+async def _seed_services(corpus, graph_documents: int):
+    """Index documents through the app's DocumentProcessor and build the knowledge graph."""
+    from app.main import document_processor, chroma_store
+    from search_service.graph_service import graph_service
+
+    for document in corpus.documents:
+        await document_processor.process_document(
+            document["content"], document["filename"], {"plan_id": document["plan"], "document_type": document["topic"]}
+        )
+    chroma_store.flush()
+
+    graph_docs = [{"content": d["content"], "title": d["filename"]} for d in corpus.documents[:graph_documents]]
+    if graph_docs:
+        await graph_service.process_documents(graph_docs)
+
+
+async def _measure(client, requests, concurrency: int, warmup: int):
+    """Send ``requests`` (callables returning a coroutine) ``concurrency`` at a time."""
+    for make in requests[:warmup]:
+        await make(client)
+
+    latencies, errors = [], 0
+    queue = iter(requests[warmup:])
+
+    async def worker():
+        nonlocal errors
+        for make in queue:
+            start = time.perf_counter()
+            response = await make(client)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        **percentiles(latencies),
+    }
+
+
+def _scenarios(corpus, client_ids, n: int):
+    queries = [q["query"] for q in corpus.queries]
+
+    def query(i):
+        return queries[i % len(queries)]
+
+    def upload(i):
+        document = corpus.documents[i % len(corpus.documents)]
+        return lambda c: c.post(
+            "/uploads/", params={"client_id": client_ids[i % len(client_ids)]},
+            # Unique bytes per request, so uploads are processed rather than matched by hash
+            files={"file": (f"upload_{i}.pdf", io.BytesIO(f"{document['content']}\n[{i}]".encode()), "application/pdf")},
+        )
+
+    return {
+        "search": ("legacy", [lambda c, i=i: c.post("/search/", json={"query": query(i), "limit": 10}) for i in range(n)]),
+        "chat": ("legacy", [
+            lambda c, i=i: c.post("/chat", json={"query": query(i), "client_id": client_ids[i % len(client_ids)]})
+            for i in range(n)
+        ]),
+        "uploads": ("legacy", [upload(i) for i in range(n)]),
+        "api_search": ("app", [lambda c, i=i: c.post("/api/v1/search", json={"query": query(i), "limit": 5}) for i in range(n)]),
+        "graph_query": ("legacy", [lambda c, i=i: c.post("/graph/query", json={"query": query(i)}) for i in range(n)]),
+    }
+
+
+async def run_size(args) -> dict:
+    """Seed one corpus size and measure every selected endpoint."""
+    import httpx
+
+    with tempfile.TemporaryDirectory() as workdir:
+        _configure_environment(workdir, args)
+        set_latency = _install_fakes(args)
+        set_latency(False)
+
+        from search_service import main as legacy
+        legacy.database = NoopDatabase()
+        from app import main as app_main
+
+        corpus = synthetic_corpus(args.size, args.documents_per_plan, queries=max(args.requests, 100), seed=args.seed)
+        seed_start = time.perf_counter()
+        client_ids = _seed_database(corpus)
+        await legacy.app.router.startup()
+        await app_main.app.router.startup()
+        await _seed_services(corpus, args.graph_documents)
+        seed_seconds = time.perf_counter() - seed_start
+        set_latency(True)
+
+        apps = {"legacy": legacy.app, "app": app_main.app}
+        scenarios = _scenarios(corpus, client_ids, args.requests + args.warmup)
+        results = {}
+        try:
+            for name in args.endpoints:
+                target, requests = scenarios[name]
+                transport = httpx.ASGITransport(app=apps[target])
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+                    results[name] = await _measure(client, requests, args.concurrency, args.warmup)
+        finally:
+            await legacy.app.router.shutdown()
+            await app_main.app.router.shutdown()
+
+        return {
+            "plans": len(corpus.plans),
+            "documents": len(corpus.documents),
+            "clients": len(corpus.clients),
+            "seed_seconds": round(seed_seconds, 2),
+            "endpoints": results,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000], help="Pension plans per run")
+    parser.add_argument("--documents-per-plan", type=int, default=3)
+    parser.add_argument("--endpoints", nargs="+", default=list(ENDPOINTS), choices=ENDPOINTS)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="Seconds per fake LLM call")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="Seconds per token of a fake Anthropic answer")
+    parser.add_argument("--parse-latency", type=float, default=1.0, help="Seconds per fake LlamaParse call")
+    parser.add_argument("--graph-documents", type=int, default=200, help="Documents fed to the knowledge graph")
+    parser.add_argument("--real-embeddings", action="store_true", help="Use the configured embedding model")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of the hashing encoder")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout")
+    parser.add_argument("--size", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--result-file", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.size is not None:
+        # Child process: one corpus size, result written to --result-file
+        result = asyncio.run(run_size(args))
+        with open(args.result_file, "w") as f:
+            json.dump(result, f)
+        return
+
+    runs = []
+    for size in args.sizes:
+        with tempfile.NamedTemporaryFile(suffix=".json") as result_file:
+            command = [sys.executable, "-m", "benchmarks.e2e", *sys.argv[1:], "--size", str(size), "--result-file", result_file.name]
+            subprocess.run(command, cwd=SERVICE_DIR, check=True)
+            runs.append(json.load(open(result_file.name)))
+
+    report = {
+        "benchmark": "e2e",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {k: v for k, v in vars(args).items() if k not in ("size", "result_file", "output")},
+        "runs": runs,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
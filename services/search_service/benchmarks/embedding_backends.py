@@ -0,0 +1,113 @@
+"""Throughput of the embedding inference backends and their equivalence to PyTorch.
+
+Run from services/search_service:
+
+    python -m benchmarks.embedding_backends --model BAAI/bge-small-en-v1.5 --threads 4
+
+Every backend embeds the same synthetic pension texts. Outputs are compared
+row by row with the torch backend; the script exits non-zero when a backend's
+minimum cosine similarity falls below its tolerance.
+"""
+import argparse
+import json
+import sys
+import time
+import numpy as np
+from services.inference import BACKENDS, build_encoder
+
+# Minimum cosine similarity to the torch output accepted per backend
+TOLERANCE = {"torch": 1.0, "onnx": 0.999, "onnx-int8": 0.97}
+
+TEMPLATES = [
+    "The {company} defined contribution plan matches {rate}% of salary after {months} months of employment.",
+    "Policy PN-{year}-{number:03d} covers disability and survivor benefits for {company} employees.",
+    "According to § {section}, members may transfer their pension savings when changing employer.",
+    "{company} (CVR {cvr}) offers a hybrid scheme with a guaranteed minimum return of {rate}%.",
+]
+
+
+def synthetic_texts(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    companies = ["Nordic Freight", "Aarhus Dental", "Vestas Supply", "Copenhagen Legal", "Odense Retail"]
+    return [
+        TEMPLATES[i % len(TEMPLATES)].format(
+            company=companies[rng.integers(len(companies))],
+            rate=int(rng.integers(2, 15)),
+            months=int(rng.integers(0, 12)),
+            year=int(rng.integers(2015, 2025)),
+            number=int(rng.integers(1, 999)),
+            section=int(rng.integers(1, 60)),
+            cvr=int(rng.integers(10000000, 99999999)),
+        )
+        for i in range(n)
+    ]
+
+
+def measure(encoder, texts, batch_size: int, repeats: int):
+    encoder.encode(texts[:batch_size], batch_size=batch_size)  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        embeddings = encoder.encode(texts, batch_size=batch_size)
+    elapsed = time.perf_counter() - start
+    single = time.perf_counter()
+    for text in texts[:50]:
+        encoder.encode([text])
+    single_ms = 1000 * (time.perf_counter() - single) / min(50, len(texts))
+    return embeddings, len(texts) * repeats / elapsed, single_ms
+
+
+def cosine_rows(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    a = a / np.linalg.norm(a, axis=1, keepdims=True)
+    b = b / np.linalg.norm(b, axis=1, keepdims=True)
+    return (a * b).sum(axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="BAAI/bge-small-en-v1.5")
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS), choices=BACKENDS)
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--cache-dir", default="./onnx_models")
+    args = parser.parse_args()
+
+    texts = synthetic_texts(args.texts)
+    backends = ["torch"] + [b for b in args.backends if b != "torch"]
+    reference = None
+    results = []
+    failed = False
+
+    for backend in backends:
+        load_start = time.perf_counter()
+        encoder = build_encoder(args.model, backend=backend, device="cpu", threads=args.threads, cache_dir=args.cache_dir)
+        load_s = time.perf_counter() - load_start
+
+        embeddings, throughput, single_ms = measure(encoder, texts, args.batch_size, args.repeats)
+        if reference is None:
+            reference = embeddings
+        cosines = cosine_rows(embeddings, reference)
+        passed = bool(cosines.min() >= TOLERANCE[backend] - 1e-6)
+        failed |= not passed
+
+        results.append({
+            "backend": backend,
+            "load_seconds": round(load_s, 2),
+            "texts_per_second": round(throughput, 1),
+            "single_text_ms": round(single_ms, 2),
+            "min_cosine_vs_torch": float(cosines.min()),
+            "mean_cosine_vs_torch": float(cosines.mean()),
+            "equivalent": passed,
+        })
+
+    baseline = results[0]["texts_per_second"]
+    for result in results:
+        result["speedup_vs_torch"] = round(result["texts_per_second"] / baseline, 2)
+
+    print(json.dumps({"model": args.model, "threads": args.threads, "results": results}, indent=2))
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""Synthetic pension corpus and deterministic local stand-ins for external services.
+
+Used by the benchmark scripts so they run on one machine without Anthropic,
+LlamaParse, Ollama, Neo4j or Postgres. Every fake takes a ``latency`` in
+seconds to mimic the remote call it replaces.
+"""
+import asyncio
+import hashlib
+import re
+import time
+from dataclasses import dataclass, field
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+import numpy as np
+
+COMPANIES = [
+    "Nordic Freight", "Aarhus Dental", "Vestas Supply", "Copenhagen Legal", "Odense Retail",
+    "Aalborg Marine", "Fyn Logistics", "Esbjerg Energy", "Roskilde Media", "Horsens Foods",
+]
+PLAN_TYPES = ["defined contribution", "defined benefit", "hybrid", "cash balance"]
+TOPICS = {
+    "transfer": "Members may transfer their pension savings to a new employer's scheme within {months} months.",
+    "disability": "Disability cover pays {rate}% of salary until the member reaches pension age.",
+    "survivor": "Survivor benefits pay a lump sum of {multiple} times annual salary to dependants.",
+    "contribution": "The employer contributes {rate}% and the employee {employee_rate}% of monthly salary.",
+    "retirement": "Early retirement is possible from age {age} with a reduced annuity.",
+    "investment": "Savings are invested in a life-cycle fund with a guaranteed minimum return of {guarantee}%.",
+}
+
+
+@dataclass
+class Corpus:
+    plans: List[Dict] = field(default_factory=list)
+    documents: List[Dict] = field(default_factory=list)
+    clients: List[Dict] = field(default_factory=list)
+    # Labelled queries: text plus the indexes of the plans and documents that answer it
+    queries: List[Dict] = field(default_factory=list)
+
+
+def synthetic_corpus(plans: int, documents_per_plan: int = 3, clients: Optional[int] = None, queries: int = 100, seed: int = 0) -> Corpus:
+    """Generate plans, their documents, clients linked to plans, and labelled queries."""
+    rng = np.random.default_rng(seed)
+    corpus = Corpus()
+    topics = list(TOPICS)
+
+    for i in range(plans):
+        company = f"{COMPANIES[i % len(COMPANIES)]} {i // len(COMPANIES)}"
+        plan_type = PLAN_TYPES[rng.integers(len(PLAN_TYPES))]
+        plan_topics = list(rng.choice(topics, size=min(documents_per_plan, len(topics)), replace=False))
+        corpus.plans.append({
+            "company_name": company,
+            "plan_type": plan_type,
+            "description": f"{company} offers a {plan_type} pension plan covering " + ", ".join(plan_topics) + ".",
+            "main_contact": f"contact{i}@example.com",
+            "participants_count": int(rng.integers(10, 5000)),
+            "tags": ",".join(plan_topics),
+            "topics": plan_topics,
+        })
+        for topic in plan_topics:
+            body = TOPICS[topic].format(
+                months=int(rng.integers(1, 12)), rate=int(rng.integers(2, 15)), employee_rate=int(rng.integers(1, 8)),
+                multiple=int(rng.integers(1, 5)), age=int(rng.integers(55, 64)), guarantee=round(float(rng.uniform(0, 3)), 1),
+            )
+            corpus.documents.append({
+                "plan": i,
+                "topic": topic,
+                "filename": f"{company.lower().replace(' ', '_')}_{topic}.pdf",
+                "content": f"{company} {plan_type} plan. Section on {topic}. {body} Policy PN-{2015 + i % 10}-{i:05d}.",
+            })
+
+    for i in range(clients if clients is not None else max(1, plans // 2)):
+        linked = sorted({int(p) for p in rng.integers(0, plans, size=int(rng.integers(1, 4)))})
+        corpus.clients.append({
+            "name": f"Client {i}",
+            "email": f"client{i}@example.com",
+            "phone": f"+45 {10000000 + i}",
+            "company": COMPANIES[i % len(COMPANIES)],
+            "status": "active",
+            "plans": linked,
+        })
+
+    for _ in range(queries):
+        doc_index = int(rng.integers(len(corpus.documents))) if corpus.documents else 0
+        document = corpus.documents[doc_index]
+        plan = corpus.plans[document["plan"]]
+        corpus.queries.append({
+            "query": f"{document['topic']} rules in the {plan['company_name']} {plan['plan_type']} plan",
+            "plans": [document["plan"]],
+            "documents": [doc_index],
+        })
+    return corpus
+
+
+class HashEncoder:
+    """Deterministic bag-of-words hashing encoder standing in for a transformer.
+
+    Texts sharing words get similar vectors, so retrieval still behaves like
+    retrieval, at a tiny fraction of the model's cost.
+    """
+
+    def __init__(self, dimension: int = 384, latency: float = 0.0):
+        self.dimension = dimension
+        self.latency = latency
+        self.device = "cpu"
+
+    def encode(self, texts: List[str], normalize: bool = False, batch_size: int = 32) -> np.ndarray:
+        if isinstance(texts, str):
+            texts = [texts]
+        if self.latency:
+            time.sleep(self.latency * max(1, len(texts) // batch_size))
+        embeddings = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in re.findall(r"\w+", text.lower()):
+                digest = hashlib.blake2b(token.encode(), digest_size=8).digest()
+                bucket = int.from_bytes(digest[:4], "little") % self.dimension
+                embeddings[row, bucket] += 1.0 if digest[4] & 1 else -1.0
+        if normalize:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.where(norms == 0, 1, norms)
+        return embeddings
+
+
+def _fake_answer(prompt: str) -> str:
+    words = re.findall(r"[A-Za-z]{5,}", prompt)
+    return "Based on the plan documents: " + " ".join(words[-40:])
+
+
+class FakeAnthropic:
+    """Stand-in for ``anthropic.AsyncAnthropic`` as used by llm_service.py (awaited messages.create).
+
+    A call takes ``latency`` (time to first token) plus ``token_delay`` per
+    generated token, like a streamed completion.
+    """
+
+    def __init__(self, latency: float = 0.5, token_delay: float = 0.0, **kwargs):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.messages = SimpleNamespace(create=self._create)
+
+    async def _create(self, model: str, max_tokens: int, messages: List[Dict], system: str = "", temperature: float = 0.0):
+        prompt = messages[-1]["content"]
+        text = _fake_answer(prompt)[:4 * max_tokens]
+        await asyncio.sleep(self.latency + self.token_delay * (len(text) // 4))
+        return SimpleNamespace(
+            content=[SimpleNamespace(text=f"Summary of the document.\n\n{text}")],
+            usage=SimpleNamespace(input_tokens=len(prompt) // 4, output_tokens=len(text) // 4),
+        )
+
+
+class FakeParser:
+    """Stand-in for LlamaParse: the uploaded bytes are the document text."""
+
+    def __init__(self, latency: float = 1.0, **kwargs):
+        self.latency = latency
+
+    async def parse_file(self, file):
+        await asyncio.sleep(self.latency)
+        data = file.read()
+        return SimpleNamespace(text=data.decode("utf-8", errors="replace") if isinstance(data, bytes) else data)
+
+
+def fake_ollama(latency: float = 0.5):
+    """Replacement for ``services.llm.LLMService._generate`` returning parseable output."""
+    async def _generate(self, prompt: str) -> str:
+        await asyncio.sleep(latency)
+        if "JSON format" in prompt:
+            companies = sorted({c for c in COMPANIES if c in prompt})
+            return "[" + ", ".join(
+                f'{{"name": "{c}", "type": "organization", "relationship": "mentioned_in", "properties": {{}}}}'
+                for c in companies
+            ) + "]"
+        return _fake_answer(prompt)
+    return _generate
+
+
+class InMemoryGraphStore:
+    """Dictionary-backed stand-in for storage.neo4j.Neo4jStore."""
+
+    def __init__(self, *args, **kwargs):
+        self.documents: Dict[str, Dict] = {}
+        self.entities: Dict[str, Dict] = {}
+        self.relationships: Dict[str, List[Dict]] = {}
+
+    def add_document(self, doc_id: str, title: str, content: str, metadata: Dict):
+        self.documents[doc_id] = {"id": doc_id, "title": title, "content": content, "metadata": metadata}
+
+    def add_entity(self, name: str, entity_type: str, properties: Dict = None):
+        self.entities[name] = {"name": name, "type": entity_type, "properties": properties or {}}
+
+    def add_relationship(self, from_id: str, to_name: str, relationship_type: str, properties: Dict = None):
+        self.relationships.setdefault(from_id, []).append(
+            {"name": to_name, "relationship": relationship_type, "properties": properties or {}}
+        )
+
+    def get_document_entities(self, doc_id: str) -> List[Dict]:
+        return [
+            {"name": r["name"], "type": self.entities.get(r["name"], {}).get("type"), "relationship": r["relationship"]}
+            for r in self.relationships.get(doc_id, [])
+        ]
+
+    def get_entity_documents(self, entity_name: str) -> List[Dict]:
+        return [
+            {"id": doc_id, "title": self.documents.get(doc_id, {}).get("title")}
+            for doc_id, rels in self.relationships.items()
+            if any(r["name"] == entity_name for r in rels)
+        ]
+
+    def delete_document(self, doc_id: str):
+        self.documents.pop(doc_id, None)
+        self.relationships.pop(doc_id, None)
+
+    def close(self):
+        pass
+
+
+class NoopDatabase:
+    """Stand-in for the ``databases.Database`` the legacy app connects at startup."""
+
+    async def connect(self):
+        pass
+
+    async def disconnect(self):
+        pass
+
+
+def fake_graph_llm(latency: float = 0.5):
+    """A LlamaIndex LLM producing triplets, keywords and answers from the prompt text."""
+    from llama_index.llms import CustomLLM, CompletionResponse, LLMMetadata
+    from llama_index.llms.base import llm_completion_callback
+
+    def respond(prompt: str) -> str:
+        if "triplets" in prompt:
+            text = prompt.rsplit("Text:", 1)[-1]
+            entities = [c for c in COMPANIES if c in text] + [t for t in PLAN_TYPES if t in text] + [t for t in TOPICS if t in text]
+            return "\n".join(f"({a}, related to, {b})" for a, b in zip(entities, entities[1:]))
+        if "KEYWORDS" in prompt:
+            question = prompt.rsplit("---------------------", 1)[0]
+            keywords = [c for c in COMPANIES if c in question] + [t for t in TOPICS if t in question]
+            return "KEYWORDS: " + ", ".join(keywords or re.findall(r"[A-Za-z]{6,}", question)[-5:])
+        return _fake_answer(prompt)
+
+    class FakeGraphLLM(CustomLLM):
+        delay: float = latency
+
+        @property
+        def metadata(self) -> LLMMetadata:
+            return LLMMetadata(context_window=8192, num_output=256, model_name="fake-graph-llm")
+
+        @llm_completion_callback()
+        def complete(self, prompt: str, **kwargs) -> CompletionResponse:
+            time.sleep(self.delay)
+            return CompletionResponse(text=respond(prompt))
+
+        @llm_completion_callback()
+        def stream_complete(self, prompt: str, **kwargs):
+            time.sleep(self.delay)
+            text = respond(prompt)
+            yield CompletionResponse(text=text, delta=text)
+
+    return FakeGraphLLM()
+
+
+def percentiles(latencies_s: List[float]) -> Dict[str, float]:
+    """p50/p95/p99 and mean in milliseconds."""
+    if not latencies_s:
+        return {"p50_ms": None, "p95_ms": None, "p99_ms": None, "mean_ms": None}
+    values = 1000 * np.asarray(latencies_s)
+    return {
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "mean_ms": round(float(values.mean()), 2),
+    }
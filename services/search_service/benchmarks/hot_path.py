@@ -0,0 +1,144 @@
+"""Microbenchmarks and allocation profiles for the embedding and similarity hot path.
+
+Run from services/search_service:
+
+    python -m benchmarks.hot_path --corpus 1000 10000 100000 --dims 384 1024
+    python -m benchmarks.hot_path --real-embeddings --corpus 10000 --output hot_path.json
+
+Every case runs the list-based API next to its NumPy-native counterpart
+(get_embedding / get_embedding_array, compute_similarity /
+compute_similarity_array, ...). Each call is timed with timeit (median of
+``--repeat`` rounds) and profiled once with tracemalloc for its peak
+allocation. The embedding model is replaced by the hashing encoder from
+benchmarks/fixtures.py unless --real-embeddings is given, so the embedding
+cases measure conversion overhead rather than inference.
+"""
+import argparse
+import json
+import timeit
+import tracemalloc
+from typing import Callable, Dict, List
+import numpy as np
+import services.embedding_engine as embedding_engine
+from storage.bm25 import reciprocal_rank_fusion
+from storage.vector_index import QuantizedVectorIndex
+from .fixtures import HashEncoder, synthetic_corpus
+
+# List inputs above this many floats are skipped: building them takes gigabytes
+MAX_LIST_FLOATS = 20_000_000
+
+
+def measure(fn: Callable, repeat: int) -> Dict[str, float]:
+    """Median time per call and tracemalloc peak of one call."""
+    timer = timeit.Timer(fn)
+    number, _ = timer.autorange()
+    per_call = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"us_per_call": round(1e6 * float(np.median(per_call)), 2), "peak_kb": round(peak / 1024, 1)}
+
+
+def unit_rows(n: int, dim: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((n, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def embedding_cases(engine, texts: List[str]) -> Dict[str, Dict[str, Callable]]:
+    batch = texts[:engine.config.batch_size]
+    return {
+        "get_embedding": {
+            "list": lambda: engine.get_embedding(texts[0]),
+            "array": lambda: engine.get_embedding_array(texts[0]),
+        },
+        "get_embeddings": {
+            "list": lambda: engine.get_embeddings(batch),
+            "array": lambda: engine.get_embeddings_array(batch),
+        },
+    }
+
+
+def similarity_cases(engine, matrix: np.ndarray) -> Dict[str, Dict[str, Callable]]:
+    query = matrix[0]
+    doc_norms = np.linalg.norm(matrix, axis=1)
+    cases = {"array": lambda: engine.compute_similarity_array(query, matrix, normalized=False, doc_norms=doc_norms)}
+    if matrix.size <= MAX_LIST_FLOATS:
+        # What callers holding lists (rows from the ARRAY column, JSON) paid before
+        query_list, matrix_list = query.tolist(), matrix.tolist()
+        cases["list"] = lambda: engine.compute_similarity(query_list, matrix_list, normalized=False)
+    return {"compute_similarity": cases}
+
+
+def search_cases(engine, matrix: np.ndarray, text: str, limit: int = 10) -> Dict[str, Dict[str, Callable]]:
+    """Query embedding, index search and result assembly, as in /search/."""
+    index = QuantizedVectorIndex("int8", binary_prefilter=False)
+    index.add_many(enumerate(matrix))
+    lexical = [str(i) for i in range(0, 5 * limit, 5)]
+
+    def assemble(query_embedding):
+        vector_ranking = [str(item_id) for item_id, _ in index.search(query_embedding, k=5 * limit)]
+        fused = reciprocal_rank_fusion([vector_ranking, lexical])
+        return [{"id": item_id, "score": score} for item_id, score in fused[:limit]]
+
+    return {
+        "search": {
+            "list": lambda: assemble(engine.get_embedding(text)),
+            "array": lambda: assemble(engine.get_embedding_array(text)),
+        }
+    }
+
+
+def run_cases(cases: Dict[str, Dict[str, Callable]], params: Dict, repeat: int) -> List[Dict]:
+    results = []
+    for name, variants in cases.items():
+        timings = {variant: measure(fn, repeat) for variant, fn in variants.items()}
+        result = {"case": name, **params}
+        for variant, timing in timings.items():
+            result.update({f"{variant}_{key}": value for key, value in timing.items()})
+        if "list" in timings:
+            result["speedup"] = round(timings["list"]["us_per_call"] / timings["array"]["us_per_call"], 2)
+        results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dims", type=int, nargs="+", default=[384, 1024])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--real-embeddings", action="store_true", help="Use the configured embedding model")
+    parser.add_argument("--output", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    texts = [d["content"] for d in synthetic_corpus(50, 3, queries=1).documents]
+    results = []
+    dims = args.dims
+    if args.real_embeddings:
+        engine = embedding_engine.get_engine(embedding_engine.EngineConfig.from_env())
+        dims = [engine.get_embedding_array(texts[0]).shape[0]]
+
+    for dim in dims:
+        if not args.real_embeddings:
+            embedding_engine.build_encoder = lambda *a, dim=dim, **kw: HashEncoder(dim)
+            engine = embedding_engine.EmbeddingEngine(embedding_engine.EngineConfig(model_name=f"hash-{dim}"))
+        results += run_cases(embedding_cases(engine, texts), {"dim": dim, "corpus": None}, args.repeat)
+        for n in args.corpus:
+            matrix = unit_rows(n, dim)
+            params = {"dim": dim, "corpus": n}
+            results += run_cases(similarity_cases(engine, matrix), params, args.repeat)
+            results += run_cases(search_cases(engine, matrix, texts[0]), params, args.repeat)
+
+    columns = ["case", "dim", "corpus", "list_us_per_call", "array_us_per_call", "speedup", "list_peak_kb", "array_peak_kb"]
+    print("\t".join(columns))
+    for result in results:
+        print("\t".join(str(result.get(column, "-")) for column in columns))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
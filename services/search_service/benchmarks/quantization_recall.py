@@ -0,0 +1,75 @@
+"""Recall and memory of the quantized vector index against exact float32 search.
+
+Run from services/search_service:
+
+    python -m benchmarks.quantization_recall --corpus 50000 --dim 1024
+"""
+import argparse
+import json
+import time
+import numpy as np
+from storage.quantization import normalize
+from storage.vector_index import QuantizedVectorIndex
+
+
+def synthetic_corpus(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    """Clustered unit vectors, closer to real embedding geometry than pure noise."""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype(np.float32)
+    assignments = rng.integers(0, clusters, n)
+    return normalize(centers[assignments] + 0.6 * rng.standard_normal((n, dim)).astype(np.float32))
+
+
+def recall_at_k(found, expected) -> float:
+    return len(set(found) & set(expected)) / len(expected)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--corpus", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=1024)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--shortlist", type=int, default=500)
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.corpus, args.dim, args.clusters)
+    queries = synthetic_corpus(args.queries, args.dim, args.clusters, seed=1)
+
+    # Exact ground truth with float32 brute force
+    truth = np.argsort(-(queries @ corpus.T), axis=1)[:, :args.k]
+
+    configs = [
+        ("float32", False),
+        ("float16", False),
+        ("int8", False),
+        ("float16", True),
+        ("int8", True),
+    ]
+    results = []
+    for fmt, prefilter in configs:
+        index = QuantizedVectorIndex(fmt, binary_prefilter=prefilter, shortlist=args.shortlist)
+        index.add_many(enumerate(corpus))
+
+        recalls = []
+        start = time.perf_counter()
+        for query, expected in zip(queries, truth):
+            found = [item_id for item_id, _ in index.search(query, k=args.k)]
+            recalls.append(recall_at_k(found, expected))
+        elapsed = time.perf_counter() - start
+
+        results.append({
+            "format": fmt,
+            "binary_prefilter": prefilter,
+            "bytes_per_vector": index.memory_bytes() / len(index),
+            "compression_vs_float64_list": (8 * args.dim) / (index.memory_bytes() / len(index)),
+            f"recall@{args.k}": float(np.mean(recalls)),
+            "mean_query_ms": 1000 * elapsed / len(queries),
+        })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,313 @@
+"""Retrieval quality against latency for every index, quantization and fusion setting.
+
+Run from services/search_service:
+
+    python -m benchmarks.retrieval_eval --documents 20000 --queries 300
+    python -m benchmarks.retrieval_eval --hash-embeddings --grid grid.json --output eval.json
+    python -m benchmarks.retrieval_eval --from-database --queries 500
+
+The query set is either the labelled synthetic queries from
+benchmarks/fixtures.py or, with --from-database, one query per stored
+document (its opening sentence, labelled with that document). Ground truth
+is exact brute-force cosine similarity through the embedding engine's
+compute_similarity. Each configuration reports recall@k against that
+ground truth, hit@k and MRR against the labels, query latency, build time
+and memory.
+
+``--grid`` takes a JSON list of configurations such as
+``{"backend": "quantized", "fmt": "int8", "binary_prefilter": true, "shortlist": 500}``.
+Available backends and their parameters:
+
+- quantized: fmt, binary_prefilter, shortlist, coarse_dim, dimension (Matryoshka)
+- chroma: search_ef, M (HNSW)
+- bm25: k1, b
+- hybrid: quantized parameters plus candidates (RRF of vectors and BM25)
+
+Add ``"rerank": true`` to any configuration to rerank its top candidates with
+the cross-encoder. There is no IVF index in the service, so there is no nprobe.
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+from services.embedding_engine import EngineConfig, cosine_similarity, get_engine, truncate_embeddings
+from storage.bm25 import BM25Index, reciprocal_rank_fusion
+from storage.vector_index import QuantizedVectorIndex
+from .fixtures import HashEncoder, percentiles, synthetic_corpus
+
+DEFAULT_GRID = [
+    {"backend": "quantized", "fmt": "float32"},
+    {"backend": "quantized", "fmt": "float16"},
+    {"backend": "quantized", "fmt": "int8"},
+    {"backend": "quantized", "fmt": "int8", "binary_prefilter": True, "shortlist": 200},
+    {"backend": "quantized", "fmt": "int8", "binary_prefilter": True, "shortlist": 1000},
+    {"backend": "quantized", "fmt": "int8", "coarse_dim": 128, "shortlist": 500},
+    {"backend": "quantized", "fmt": "int8", "dimension": 256},
+    {"backend": "chroma", "search_ef": 10},
+    {"backend": "chroma", "search_ef": 50},
+    {"backend": "chroma", "search_ef": 200},
+    {"backend": "bm25"},
+    {"backend": "hybrid", "fmt": "int8", "candidates": 50},
+]
+
+
+class Embedder:
+    """Embedding engine, or the hashing stand-in, with its similarity function."""
+
+    def __init__(self, hash_embeddings: bool, dim: int):
+        self.engine = None if hash_embeddings else get_engine(EngineConfig.from_env())
+        self.encoder = HashEncoder(dim) if hash_embeddings else None
+
+    def embed(self, texts: List[str], batch_size: int = 256) -> np.ndarray:
+        if self.engine is not None:
+            return np.concatenate([self.engine.embed(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)])
+        return self.encoder.encode(texts, normalize=True)
+
+    def similarity(self, query: np.ndarray, matrix: np.ndarray) -> np.ndarray:
+        if self.engine is not None:
+            return np.asarray(self.engine.compute_similarity(query, matrix, normalized=False))
+        return cosine_similarity(query, matrix, normalized=False)
+
+
+class QuantizedBackend:
+    def __init__(self, fmt: str = "int8", binary_prefilter: bool = False, shortlist: int = 500,
+                 coarse_dim: Optional[int] = None, dimension: Optional[int] = None, **_):
+        self.index = QuantizedVectorIndex(fmt, binary_prefilter, shortlist, coarse_dim)
+        self.dimension = dimension
+
+    def build(self, ids, vectors, texts):
+        self.index.add_many(zip(ids, truncate_embeddings(vectors, self.dimension)))
+
+    def search(self, vector, text, k) -> List[str]:
+        return [item_id for item_id, _ in self.index.search(truncate_embeddings(vector, self.dimension), k)]
+
+    def memory_bytes(self) -> int:
+        return self.index.memory_bytes()
+
+
+class ChromaBackend:
+    def __init__(self, search_ef: int = 10, M: int = 16, **_):
+        import chromadb
+
+        self.workdir = tempfile.TemporaryDirectory()
+        self.client = chromadb.PersistentClient(path=self.workdir.name)
+        self.collection = self.client.create_collection(
+            name="eval", metadata={"hnsw:space": "cosine", "hnsw:search_ef": search_ef, "hnsw:M": M}
+        )
+
+    def build(self, ids, vectors, texts):
+        batch = self.client.get_max_batch_size()
+        for start in range(0, len(ids), batch):
+            self.collection.add(ids=ids[start:start + batch], embeddings=vectors[start:start + batch].tolist())
+
+    def search(self, vector, text, k) -> List[str]:
+        return self.collection.query(query_embeddings=[vector.tolist()], n_results=k, include=[])["ids"][0]
+
+    def memory_bytes(self) -> Optional[int]:
+        return None
+
+
+class BM25Backend:
+    def __init__(self, k1: float = 1.5, b: float = 0.75, **_):
+        self.index = BM25Index(None, k1=k1, b=b)
+
+    def build(self, ids, vectors, texts):
+        self.index.add_many(zip(ids, texts))
+
+    def search(self, vector, text, k) -> List[str]:
+        return [doc_id for doc_id, _ in self.index.search(text, k)]
+
+    def memory_bytes(self) -> Optional[int]:
+        return None
+
+
+class HybridBackend:
+    """Vector and BM25 candidates fused by reciprocal rank fusion, as in /search/."""
+
+    def __init__(self, candidates: int = 50, **params):
+        self.vectors = QuantizedBackend(**params)
+        self.lexical = BM25Backend()
+        self.candidates = candidates
+
+    def build(self, ids, vectors, texts):
+        self.vectors.build(ids, vectors, texts)
+        self.lexical.build(ids, vectors, texts)
+
+    def search(self, vector, text, k) -> List[str]:
+        n = max(k, self.candidates)
+        fused = reciprocal_rank_fusion([self.vectors.search(vector, text, n), self.lexical.search(vector, text, n)])
+        return [doc_id for doc_id, _ in fused[:k]]
+
+    def memory_bytes(self) -> Optional[int]:
+        return self.vectors.memory_bytes()
+
+
+class RerankedBackend:
+    """Any backend followed by cross-encoder reranking of its top candidates."""
+
+    def __init__(self, inner, texts: Dict[str, str], candidates: int, budget_ms: float):
+        from services.reranker import Reranker
+
+        self.inner = inner
+        self.texts = texts
+        self.candidates = candidates
+        self.reranker = Reranker(
+            model_name=os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"), budget_ms=budget_ms
+        )
+
+    def build(self, ids, vectors, texts):
+        self.inner.build(ids, vectors, texts)
+
+    def search(self, vector, text, k) -> List[str]:
+        found = self.inner.search(vector, text, max(k, self.candidates))
+        order, _ = self.reranker.rerank(text, [self.texts[doc_id] for doc_id in found], top_k=k)
+        return [found[i] for i in order]
+
+    def memory_bytes(self) -> Optional[int]:
+        return self.inner.memory_bytes()
+
+
+BACKENDS = {"quantized": QuantizedBackend, "chroma": ChromaBackend, "bm25": BM25Backend, "hybrid": HybridBackend}
+
+
+def load_dataset(args) -> Tuple[List[str], List[str], List[str], List[str]]:
+    """Return document ids and texts, query texts and each query's labelled document id."""
+    if args.from_database:
+        import sys
+        from pathlib import Path
+
+        sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+        from sqlalchemy import or_
+        from sqlalchemy.orm import undefer
+        from search_service.database import SessionLocal
+        from search_service.models import Document
+        from search_service.document_content import get_content
+
+        db = SessionLocal()
+        try:
+            rows = (
+                db.query(Document)
+                .options(undefer(Document.content))
+                .filter(or_(Document.content_key.isnot(None), Document.content.isnot(None)))
+                .all()
+            )
+            ids = [str(row.id) for row in rows]
+            texts = [get_content(row) for row in rows]
+        finally:
+            db.close()
+        rng = np.random.default_rng(args.seed)
+        picked = rng.choice(len(ids), size=min(args.queries, len(ids)), replace=False)
+        # The opening sentence of a document is a query it should answer
+        queries = [re.split(r"(?<=[.!?])\s", texts[i], maxsplit=1)[0][:300] for i in picked]
+        return ids, texts, queries, [ids[i] for i in picked]
+
+    corpus = synthetic_corpus(max(1, args.documents // args.documents_per_plan), args.documents_per_plan,
+                              queries=args.queries, seed=args.seed)
+    ids = [str(i) for i in range(len(corpus.documents))]
+    texts = [document["content"] for document in corpus.documents]
+    return ids, texts, [q["query"] for q in corpus.queries], [str(q["documents"][0]) for q in corpus.queries]
+
+
+def evaluate(backend, ids, vectors, texts, query_vectors, queries, labels, truth, k: int) -> Dict:
+    start = time.perf_counter()
+    backend.build(ids, vectors, texts)
+    build_seconds = time.perf_counter() - start
+
+    recalls, hits, reciprocal_ranks, latencies = [], [], [], []
+    for vector, query, label, expected in zip(query_vectors, queries, labels, truth):
+        start = time.perf_counter()
+        found = backend.search(vector, query, k)
+        latencies.append(time.perf_counter() - start)
+
+        recalls.append(len(set(found) & set(expected)) / len(expected))
+        hits.append(label in found)
+        reciprocal_ranks.append(1 / (found.index(label) + 1) if label in found else 0.0)
+
+    memory = backend.memory_bytes()
+    latency = percentiles(latencies)
+    return {
+        f"recall@{k}": round(float(np.mean(recalls)), 4),
+        f"hit@{k}": round(float(np.mean(hits)), 4),
+        "mrr": round(float(np.mean(reciprocal_ranks)), 4),
+        "p50_ms": latency["p50_ms"],
+        "p95_ms": latency["p95_ms"],
+        "build_seconds": round(build_seconds, 2),
+        "memory_mb": None if memory is None else round(memory / 2 ** 20, 2),
+    }
+
+
+def format_table(results: List[Dict], k: int) -> str:
+    columns = ["backend", "params", f"recall@{k}", f"hit@{k}", "mrr", "p50_ms", "p95_ms", "build_seconds", "memory_mb"]
+    rows = [
+        [r["backend"], ", ".join(f"{key}={value}" for key, value in r["params"].items()) or "-"]
+        + ["-" if r[c] is None else str(r[c]) for c in columns[2:]]
+        for r in results
+    ]
+    widths = [max(len(c), *(len(row[i]) for row in rows)) for i, c in enumerate(columns)]
+    lines = [
+        "| " + " | ".join(c.ljust(w) for c, w in zip(columns, widths)) + " |",
+        "|" + "|".join("-" * (w + 2) for w in widths) + "|",
+    ]
+    lines += ["| " + " | ".join(v.ljust(w) for v, w in zip(row, widths)) + " |" for row in rows]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--documents", type=int, default=10000)
+    parser.add_argument("--documents-per-plan", type=int, default=3)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--grid", help="JSON file with a list of configurations")
+    parser.add_argument("--from-database", action="store_true", help="Evaluate over the documents in DATABASE_URL")
+    parser.add_argument("--hash-embeddings", action="store_true", help="Use the hashing encoder instead of the model")
+    parser.add_argument("--dim", type=int, default=384, help="Dimension of the hashing encoder")
+    parser.add_argument("--rerank-candidates", type=int, default=30)
+    parser.add_argument("--rerank-budget-ms", type=float, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Also write the results as JSON")
+    args = parser.parse_args()
+
+    grid = json.load(open(args.grid)) if args.grid else DEFAULT_GRID
+    ids, texts, queries, labels = load_dataset(args)
+    embedder = Embedder(args.hash_embeddings, args.dim)
+
+    start = time.perf_counter()
+    vectors = embedder.embed(texts)
+    query_vectors = embedder.embed(queries)
+    embed_seconds = time.perf_counter() - start
+
+    # Exact ground truth: brute-force cosine similarity over the full vectors
+    truth = []
+    for query_vector in query_vectors:
+        scores = embedder.similarity(query_vector, vectors)
+        top = np.argpartition(-scores, min(args.k, len(ids) - 1))[:args.k]
+        truth.append([ids[i] for i in top[np.argsort(-scores[top])]])
+
+    text_by_id = dict(zip(ids, texts))
+    results = []
+    for config in grid:
+        params = {key: value for key, value in config.items() if key not in ("backend", "rerank")}
+        if params.get("dimension") and params["dimension"] >= vectors.shape[1]:
+            continue
+        backend = BACKENDS[config["backend"]](**params)
+        if config.get("rerank"):
+            backend = RerankedBackend(backend, text_by_id, args.rerank_candidates, args.rerank_budget_ms)
+            params["rerank"] = True
+        metrics = evaluate(backend, ids, vectors, texts, query_vectors, queries, labels, truth, args.k)
+        results.append({"backend": config["backend"], "params": params, **metrics})
+
+    print(f"{len(ids)} documents, {len(queries)} queries, dimension {vectors.shape[1]}, "
+          f"embedded in {embed_seconds:.1f}s\n")
+    print(format_table(results, args.k))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"documents": len(ids), "queries": len(queries), "k": args.k, "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""Memory per worker and throughput as the number of gunicorn workers grows.
+
+Run from services/search_service (Linux; needs /proc):
+
+    python -m benchmarks.workers --workers 1 2 4 --duration 20
+    python -m benchmarks.workers --no-preload --workers 1 2 4
+
+For each worker count the script starts gunicorn with gunicorn.conf.py, waits
+for /health/ready, warms every worker, drives concurrent requests at
+``--path`` for ``--duration`` seconds and reads RSS and PSS (proportional set
+size, which splits shared pages between the processes mapping them) of the
+master and every worker from /proc.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import aiohttp
+import numpy as np
+
+
+def memory_mb(pid: int) -> dict:
+    """RSS and PSS of one process in MiB, from /proc/<pid>/smaps_rollup."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            key, _, rest = line.partition(":")
+            if key in ("Rss", "Pss"):
+                values[key.lower()] = int(rest.split()[0]) / 1024
+    return values
+
+
+def worker_pids(master_pid: int) -> list:
+    with open(f"/proc/{master_pid}/task/{master_pid}/children") as f:
+        return [int(pid) for pid in f.read().split()]
+
+
+async def wait_ready(session, base_url: str, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base_url}/health/ready") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.5)
+    raise TimeoutError("Server did not become ready")
+
+
+async def drive(session, url: str, method: str, body, concurrency: int, duration: float):
+    """Send requests from ``concurrency`` loops; returns (latencies, errors)."""
+    latencies, errors = [], 0
+    deadline = time.monotonic() + duration
+
+    async def loop():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            try:
+                async with session.request(method, url, json=body) as response:
+                    await response.read()
+                    if response.status >= 400:
+                        errors += 1
+            except aiohttp.ClientError:
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    await asyncio.gather(*(loop() for _ in range(concurrency)))
+    return latencies, errors
+
+
+async def run_once(args, workers: int) -> dict:
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{args.port}",
+               PRELOAD_MODELS="false" if args.no_preload else "true")
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", args.app],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    try:
+        async with aiohttp.ClientSession() as session:
+            await wait_ready(session, base_url, args.startup_timeout)
+            # Warm each worker; without preload this is where every worker loads its models
+            for _ in range(workers * 4):
+                async with session.post(f"{base_url}/warmup") as response:
+                    await response.read()
+
+            latencies, errors = await drive(
+                session, base_url + args.path, args.method, args.body, args.concurrency, args.duration
+            )
+
+        master = memory_mb(server.pid)
+        per_worker = [memory_mb(pid) for pid in worker_pids(server.pid)]
+        latencies_ms = 1000 * np.array(latencies)
+        return {
+            "workers": workers,
+            "requests_per_second": round(len(latencies) / args.duration, 1),
+            "errors": errors,
+            "p50_ms": round(float(np.percentile(latencies_ms, 50)), 1),
+            "p95_ms": round(float(np.percentile(latencies_ms, 95)), 1),
+            "master_rss_mb": round(master["rss"], 1),
+            "worker_rss_mb": round(float(np.mean([m["rss"] for m in per_worker])), 1),
+            "worker_pss_mb": round(float(np.mean([m["pss"] for m in per_worker])), 1),
+            "total_pss_mb": round(master["pss"] + sum(m["pss"] for m in per_worker), 1),
+        }
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--app", default="app.main:app")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--path", default="/api/v1/search")
+    parser.add_argument("--method", default="POST")
+    parser.add_argument("--body", type=json.loads, default={"query": "early retirement pension transfer", "limit": 5})
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--no-preload", action="store_true", help="Let every worker load its own models")
+    args = parser.parse_args()
+
+    results = [asyncio.run(run_once(args, workers)) for workers in args.workers]
+    baseline = results[0]["requests_per_second"] / results[0]["workers"]
+    for result in results:
+        result["scaling_efficiency"] = round(result["requests_per_second"] / (baseline * result["workers"]), 2)
+
+    print(json.dumps({"app": args.app, "preload": not args.no_preload, "results": results}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
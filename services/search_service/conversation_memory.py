@@ -0,0 +1,161 @@
+"""Per-client conversation memory: a rolling summary plus the most recent turns.
+
+The chat prompt gets the stored summary and every message the summary does
+not cover yet: the last CHAT_RECENT_MESSAGES plus those waiting to be folded
+in, at most CHAT_RECENT_MESSAGES + CHAT_SUMMARY_BATCH in all, so its size stays
+bounded however long the conversation runs. After each exchange a background
+task folds messages that have left the recent window into the summary, once
+CHAT_SUMMARY_BATCH of them are pending.
+"""
+import asyncio
+import logging
+import os
+import weakref
+from datetime import datetime
+from typing import List, Optional, Set, Tuple
+from dotenv import load_dotenv
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from .database import SessionLocal
+from .models import ChatMessage, ConversationSummary
+from .llm_service import llm_service
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Messages pasted verbatim into the prompt
+CHAT_RECENT_MESSAGES = int(os.getenv("CHAT_RECENT_MESSAGES", "6"))
+# Longer recent messages are cut to this many characters
+CHAT_MESSAGE_MAX_CHARS = int(os.getenv("CHAT_MESSAGE_MAX_CHARS", "1500"))
+# Messages outside the recent window that trigger a summary update
+CHAT_SUMMARY_BATCH = int(os.getenv("CHAT_SUMMARY_BATCH", "6"))
+# Most messages folded in one update, bounding the summarisation prompt when catching up
+CHAT_SUMMARY_MAX_FOLD = int(os.getenv("CHAT_SUMMARY_MAX_FOLD", "40"))
+# Upper bound on the summary, in tokens
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "300"))
+
+# One summariser per client at a time in this process; an entry lives only while a
+# task holds its lock. Across processes, update_summary relies on a row lock.
+_locks: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+# Background tasks are kept referenced until done
+_tasks: Set[asyncio.Task] = set()
+
+
+def format_turn(message: ChatMessage, max_chars: Optional[int] = None) -> str:
+    content = message.content or ""
+    if max_chars and len(content) > max_chars:
+        content = content[:max_chars] + " [...]"
+    return f"{'User' if message.role == 'user' else 'Assistant'}: {content}"
+
+
+def load_memory(db: Session, client_id: int) -> Tuple[Optional[str], List[str]]:
+    """Return the client's conversation summary and the turns it does not cover, oldest first."""
+    row = (
+        db.query(ConversationSummary.summary, ConversationSummary.summarized_until_id)
+        .filter(ConversationSummary.client_id == client_id)
+        .first()
+    )
+    summary, summarized_until = (row.summary, row.summarized_until_id or 0) if row else (None, 0)
+    # Messages that left the recent window but are not summarised yet must not drop out of context
+    messages = (
+        db.query(ChatMessage)
+        .filter(ChatMessage.client_id == client_id, ChatMessage.id > summarized_until)
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+        .limit(CHAT_RECENT_MESSAGES + CHAT_SUMMARY_BATCH)
+        .all()
+    )
+    return summary, [format_turn(message, CHAT_MESSAGE_MAX_CHARS) for message in reversed(messages)]
+
+
+async def update_summary(client_id: int) -> bool:
+    """Fold pending messages older than the recent window into the summary; True if it changed."""
+    lock = _locks.setdefault(client_id, asyncio.Lock())
+    async with lock:
+        db = SessionLocal()
+        try:
+            row = db.query(ConversationSummary).filter(ConversationSummary.client_id == client_id).first()
+            summarized_until = row.summarized_until_id if row else 0
+
+            # The recent window stays verbatim; only older messages are folded in
+            recent_ids = [
+                message_id for message_id, in db.query(ChatMessage.id)
+                .filter(ChatMessage.client_id == client_id)
+                .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
+                .limit(CHAT_RECENT_MESSAGES)
+            ]
+            if len(recent_ids) < CHAT_RECENT_MESSAGES:
+                return False
+            pending = (
+                db.query(ChatMessage)
+                .filter(
+                    ChatMessage.client_id == client_id,
+                    ChatMessage.id > summarized_until,
+                    ChatMessage.id < min(recent_ids)
+                )
+                .order_by(ChatMessage.id)
+                .limit(CHAT_SUMMARY_MAX_FOLD)
+                .all()
+            )
+            if len(pending) < CHAT_SUMMARY_BATCH:
+                return False
+
+            previous_summary = row.summary if row else None
+            turns = [format_turn(message, CHAT_MESSAGE_MAX_CHARS) for message in pending]
+            last_id = max(message.id for message in pending)
+            # No transaction stays open while the model runs
+            db.rollback()
+
+            summary = await (await llm_service.get_async()).summarize_conversation(
+                previous_summary, turns, max_tokens=CHAT_SUMMARY_MAX_TOKENS
+            )
+
+            # Another worker process may have folded the same messages meanwhile:
+            # re-read the row locked and only write if it has not moved on
+            row = (
+                db.query(ConversationSummary)
+                .filter(ConversationSummary.client_id == client_id)
+                .populate_existing()
+                .with_for_update()
+                .first()
+            )
+            if (row.summarized_until_id if row else 0) != summarized_until:
+                db.rollback()
+                return False
+            if row is None:
+                row = ConversationSummary(client_id=client_id)
+                db.add(row)
+            row.summary = summary
+            row.summarized_until_id = last_id
+            row.updated_at = datetime.utcnow()
+            try:
+                db.commit()
+            except IntegrityError:
+                # Another worker inserted the client's first summary concurrently
+                db.rollback()
+                return False
+            return True
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+
+def schedule_summary(client_id: int):
+    """Update the client's summary in the background after an exchange."""
+    task = asyncio.create_task(update_summary(client_id))
+    _tasks.add(task)
+    task.add_done_callback(_finished)
+
+
+def _finished(task: asyncio.Task):
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error(f"Error updating conversation summary: {task.exception()}")
+
+
+async def drain():
+    """Wait for pending summary updates, e.g. at shutdown."""
+    if _tasks:
+        await asyncio.gather(*_tasks, return_exceptions=True)
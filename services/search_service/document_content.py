@@ -0,0 +1,63 @@
+"""Document bodies, kept out of the documents table in a content-addressed blob store.
+
+A document row only holds ``content_key`` (SHA-256 of the UTF-8 text) and
+``content_size``; scans over documents stay small and the text is read,
+or streamed, only when a caller asks for it. Rows written before the move
+still have their text in the legacy ``content`` column until
+``python -m search_service.backfill move-content`` has run; reads fall back
+to it.
+"""
+import os
+from typing import Iterator, Optional
+from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from .models import Document
+from .storage.blob_store import BlobStore
+
+load_dotenv()
+
+DOCUMENT_BLOB_DIR = os.getenv("DOCUMENT_BLOB_DIR", "./document_blobs")
+# zstd, zlib or none; zstd falls back to zlib when zstandard is not installed
+DOCUMENT_BLOB_COMPRESSION = os.getenv("DOCUMENT_BLOB_COMPRESSION", "zstd")
+DOCUMENT_BLOB_LEVEL = int(os.getenv("DOCUMENT_BLOB_LEVEL", "3"))
+
+blob_store = BlobStore(DOCUMENT_BLOB_DIR, DOCUMENT_BLOB_COMPRESSION, DOCUMENT_BLOB_LEVEL)
+
+
+def set_content(document: Document, text: Optional[str]):
+    """Store ``text`` as the document's body; the row keeps only its key and size."""
+    if text is None:
+        document.content_key = None
+        document.content_size = None
+        return
+    data = text.encode("utf-8")
+    document.content_key = blob_store.put(data)
+    document.content_size = len(data)
+    document.content = None
+
+
+def has_content(document: Document) -> bool:
+    return document.content_key is not None or document.content is not None
+
+
+def get_content(document: Document) -> Optional[str]:
+    """The full document text, from the blob store or the legacy column."""
+    if document.content_key is not None:
+        return blob_store.get(document.content_key).decode("utf-8")
+    return document.content
+
+
+def stream_content(document: Document, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """The document text as UTF-8 chunks, without loading it whole from the blob store."""
+    if document.content_key is not None:
+        yield from blob_store.stream(document.content_key, chunk_size)
+    elif document.content is not None:
+        data = document.content.encode("utf-8")
+        for start in range(0, len(data), chunk_size):
+            yield data[start:start + chunk_size]
+
+
+def prune_blobs(db: Session, min_age: float = 3600.0) -> int:
+    """Delete blobs no document references any more; returns how many were removed."""
+    live = (key for key, in db.query(Document.content_key).filter(Document.content_key.isnot(None)).yield_per(5000))
+    return blob_store.prune(live, min_age)
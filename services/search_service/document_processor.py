@@ -1,8 +1,10 @@
 import os
 from typing import BinaryIO
 from llamaparse import LlamaParse
-from .embeddings import embeddings_service
+from .embeddings import embed_text
 from .llm_service import llm_service
+from .services.lazy import Lazy
+from .services.tracing import span
 
 class DocumentProcessor:
     def __init__(self):
@@ -14,18 +16,19 @@ class DocumentProcessor:
     async def process_pdf(self, file: BinaryIO) -> tuple[str, list[float], dict]:
         """Process a PDF file and return its content, embedding, and analysis."""
         # Parse PDF using LlamaParse
-        doc = await self.llama_parse.parse_file(file)
+        with span("llamaparse.parse"):
+            doc = await self.llama_parse.parse_file(file)
         
         # Extract text content
         content = doc.text
         
         # Generate embedding for the content
-        embedding = embeddings_service.get_embedding(content)
+        embedding = await embed_text(content)
         
         # Process with LlamaIndex
-        analysis = await llm_service.process_document(content)
+        analysis = await (await llm_service.get_async()).process_document(content)
         
         return content, embedding, analysis
 
-# Initialize the document processor
-document_processor = DocumentProcessor() 
\ No newline at end of file
+# Initialize the document processor on first use
+document_processor = Lazy("document_processor", DocumentProcessor, "legacy")
\ No newline at end of file
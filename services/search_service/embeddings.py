@@ -1,38 +1,21 @@
-from sentence_transformers import SentenceTransformer
-import numpy as np
 from typing import List
-import torch
-
-class EmbeddingsService:
-    def __init__(self):
-        self.model = SentenceTransformer('jinaai/jina-embeddings-v3-base-en')
-        self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-        self.model.to(self.device)
+import numpy as np
+from .services.embedding_engine import EngineConfig, get_engine, embed_async
+from .services.lazy import Lazy
 
-    def get_embedding(self, text: str) -> List[float]:
-        """Generate embedding for a single text."""
-        with torch.no_grad():
-            embedding = self.model.encode(text)
-            return embedding.tolist()
+# Model, backend, normalisation and output dimension come from the EMBEDDING_*
+# environment variables shared with app/main.py. EMBEDDING_DIM prefixes are
+# only usable embeddings for Matryoshka-trained models such as jina-embeddings-v3.
+ENGINE_CONFIG = EngineConfig.from_env()
+EMBEDDING_DIM = ENGINE_CONFIG.dimension
 
-    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate embeddings for multiple texts."""
-        with torch.no_grad():
-            embeddings = self.model.encode(texts)
-            return embeddings.tolist()
+# The model loads on first use (one instance per process)
+embeddings_service = Lazy("embeddings", lambda: get_engine(ENGINE_CONFIG), "legacy")
 
-    def compute_similarity(self, query_embedding: List[float], document_embeddings: List[List[float]]) -> List[float]:
-        """Compute cosine similarity between query and documents."""
-        query_embedding = np.array(query_embedding)
-        document_embeddings = np.array(document_embeddings)
-        
-        # Normalize the embeddings
-        query_norm = np.linalg.norm(query_embedding)
-        doc_norms = np.linalg.norm(document_embeddings, axis=1)
-        
-        # Compute cosine similarity
-        similarities = np.dot(document_embeddings, query_embedding) / (doc_norms * query_norm)
-        return similarities.tolist()
+async def embed_text(text: str) -> List[float]:
+    """Embed one text off the event loop (see EMBED_IN_PROCESS_POOL)."""
+    return (await embed_async([text], ENGINE_CONFIG))[0].tolist()
 
-# Initialize the embeddings service
-embeddings_service = EmbeddingsService() 
\ No newline at end of file
+async def embed_text_array(text: str) -> np.ndarray:
+    """Like ``embed_text`` but returns the float32 vector, for callers that stay in NumPy."""
+    return (await embed_async([text], ENGINE_CONFIG))[0]
@@ -4,15 +4,48 @@ from llama_index.storage.storage_context import StorageContext
 from llama_index.indices.knowledge_graph import KnowledgeGraphIndex
 from llama_index.llms import Anthropic
 from llama_index.embeddings import HuggingFaceEmbedding
-from typing import List, Dict, Any, Optional
+from llama_index.query_engine import RetrieverQueryEngine
+from typing import List, Dict, Any, Optional, Tuple
 import networkx as nx
-from networkx.algorithms import community
+import numpy as np
+import asyncio
+import contextvars
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+import threading
 import json
 import os
 from dotenv import load_dotenv
+from .services.lazy import Lazy
+from .services.process_pool import process_pool
+from .services.graph_layout import spring_layout, detect_communities
+from .services.tracing import traced, span
 
 load_dotenv()
 
+# Seconds a single graph query may take before it is abandoned
+GRAPH_QUERY_TIMEOUT = float(os.getenv("GRAPH_QUERY_TIMEOUT", "60"))
+# Upper bound on the timeout a client may ask for
+GRAPH_QUERY_MAX_TIMEOUT = float(os.getenv("GRAPH_QUERY_MAX_TIMEOUT", "300"))
+# Threads available to graph queries; bounds how many can run at once
+GRAPH_QUERY_WORKERS = int(os.getenv("GRAPH_QUERY_WORKERS", "4"))
+# Tasks allowed to wait for a thread; further queries are rejected
+GRAPH_QUERY_MAX_QUEUED = int(os.getenv("GRAPH_QUERY_MAX_QUEUED", "4"))
+# Default synthesis mode; "compact" answers faster, "tree_summarize" goes deeper
+GRAPH_RESPONSE_MODE = os.getenv("GRAPH_RESPONSE_MODE", "tree_summarize")
+GRAPH_QUERY_VERBOSE = os.getenv("GRAPH_QUERY_VERBOSE", "false").lower() == "true"
+
+RESPONSE_MODES = ("compact", "tree_summarize", "simple_summarize", "refine", "accumulate")
+
+
+class GraphBusy(Exception):
+    """The graph executor is saturated; the query was not started."""
+
+
+class InvalidGraphQuery(Exception):
+    """The query's parameters are invalid, e.g. an unknown response mode."""
+
+
 class GraphService:
     def __init__(self):
         # Initialize Anthropic
@@ -40,8 +73,57 @@ class GraphService:
         # Initialize the knowledge graph index
         self.kg_index = None
 
+        # Cached layout of the full graph, rebuilt whenever the graph changes
+        self._layout: Optional[Dict[str, Any]] = None
+
+        # Objects derived from the graph, reused until the graph changes
+        self._cache_lock = threading.Lock()
+        # Serialises the slow node embedding batch without holding _cache_lock,
+        # which the event loop also takes
+        self._embedding_lock = threading.Lock()
+        self._reset_caches()
+
+        # Blocking LlamaIndex and networkx work runs here, off the event loop
+        self._executor = ThreadPoolExecutor(
+            max_workers=GRAPH_QUERY_WORKERS, thread_name_prefix="graph-query"
+        )
+        # Tasks submitted and not finished, including those abandoned after a timeout
+        self._in_flight = 0
+        self._in_flight_lock = threading.Lock()
+
+    def _reserve(self, tasks: int, limit: Optional[int] = None):
+        """Count ``tasks`` as in flight; raises GraphBusy if that would exceed ``limit``."""
+        with self._in_flight_lock:
+            if limit is not None and self._in_flight + tasks > limit:
+                raise GraphBusy(f"{self._in_flight} graph tasks in flight")
+            self._in_flight += tasks
+
+    def _release(self, _future: Optional[Future] = None):
+        with self._in_flight_lock:
+            self._in_flight -= 1
+
+    def _run(self, fn, *args) -> asyncio.Future:
+        """Run ``fn`` on the graph executor after ``_reserve``.
+
+        The slot is released when the thread finishes (or the task is
+        cancelled before it starts), not when the caller stops waiting.
+        """
+        # Run in a copy of the caller's context, so stage spans reach its Server-Timing header
+        context = contextvars.copy_context()
+        try:
+            future = self._executor.submit(context.run, fn, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(self._release)
+        return asyncio.wrap_future(future)
+
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    @traced("graph.process_documents")
     async def process_documents(
-        self, documents: List[Dict[str, Any]]
+        self, documents: List[Dict[str, Any]], include_graph_data: bool = False
     ) -> Dict[str, Any]:
         """Process documents and create a knowledge graph."""
         # Convert documents to LlamaIndex format
@@ -58,104 +140,230 @@ class GraphService:
             for doc in documents
         ]
 
-        # Create or update knowledge graph index
-        self.kg_index = KnowledgeGraphIndex.from_documents(
-            llama_docs,
-            service_context=self.service_context,
-            storage_context=self.storage_context,
-            max_triplets_per_chunk=10,
-            include_embeddings=True,
+        # Create or update knowledge graph index; LLM extraction blocks, so run it off the loop
+        self._reserve(1)
+        self.kg_index = await self._run(
+            partial(
+                traced("graph.extract")(KnowledgeGraphIndex.from_documents),
+                llama_docs,
+                service_context=self.service_context,
+                storage_context=self.storage_context,
+                max_triplets_per_chunk=10,
+                include_embeddings=True,
+            ),
         )
 
-        # Get graph data for visualization
-        graph_data = self._get_graph_visualization_data()
+        # Invalidate everything derived from the previous graph
+        with self._cache_lock:
+            self._reset_caches()
+
+        # Compute the layout once in the process pool; graph reads are served from the cache
+        graph = self._get_graph()
+        k = 1 / pow(graph.number_of_nodes(), 0.3) if graph.number_of_nodes() else None
+        with span("graph.layout"):
+            communities, pos = await asyncio.gather(
+                process_pool.run(detect_communities, graph),
+                process_pool.run(spring_layout, graph, k),
+            )
+            self._layout = self._build_layout(graph, communities, pos)
 
-        return {
-            "graph_data": graph_data,
+        result = {
+            "metadata": self._layout["metadata"],
             "message": f"Successfully processed {len(documents)} documents",
         }
-
-    def _get_graph_visualization_data(self) -> Dict[str, Any]:
-        """Convert the knowledge graph to a format suitable for visualization."""
-        graph: nx.Graph = self.graph_store.get_networkx_graph()
-
-        # Detect communities for node clustering
-        communities = community.greedy_modularity_communities(graph)
+        if include_graph_data:
+            result["graph_data"] = self._get_graph_visualization_data()
+        return result
+
+    def _reset_caches(self):
+        """Drop the query engines, retriever and graph projections of the current graph."""
+        self._retriever = None
+        self._query_engines: Dict[str, Any] = {}
+        self._graph: Optional[nx.Graph] = None
+        self._node_embeddings: Optional[Tuple[List[Any], np.ndarray]] = None
+
+    def _get_query_engine(self, response_mode: Optional[str] = None):
+        """Return the query engine for ``response_mode``, built once per graph."""
+        response_mode = response_mode or GRAPH_RESPONSE_MODE
+        if response_mode not in RESPONSE_MODES:
+            raise InvalidGraphQuery(f"Unsupported response mode: {response_mode}")
+
+        with self._cache_lock:
+            if self._retriever is None:
+                self._retriever = self.kg_index.as_retriever()
+            query_engine = self._query_engines.get(response_mode)
+            if query_engine is None:
+                # All response modes share a single retriever
+                query_engine = RetrieverQueryEngine.from_args(
+                    self._retriever,
+                    service_context=self.service_context,
+                    response_mode=response_mode,
+                    verbose=GRAPH_QUERY_VERBOSE,
+                )
+                self._query_engines[response_mode] = query_engine
+            return query_engine
+
+    def _get_graph(self) -> nx.Graph:
+        """Return the networkx projection of the graph store, built once per graph."""
+        with self._cache_lock:
+            if self._graph is None:
+                self._graph = self.graph_store.get_networkx_graph()
+            return self._graph
+
+    @traced("graph.node_embeddings")
+    def _get_node_embeddings(self) -> Tuple[List[Any], np.ndarray]:
+        """Return graph nodes with their unit-normalised embeddings, computed in one batch."""
+        graph = self._get_graph()
+        with self._embedding_lock:
+            with self._cache_lock:
+                if self._node_embeddings is not None:
+                    return self._node_embeddings
+
+            nodes = list(graph.nodes())
+            if nodes:
+                matrix = np.array(
+                    self.embed_model.get_text_embedding_batch([str(n) for n in nodes]),
+                    dtype=np.float32,
+                )
+                norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+                matrix /= np.where(norms == 0, 1, norms)
+            else:
+                matrix = np.zeros((0, 0), dtype=np.float32)
+
+            with self._cache_lock:
+                # Only cache it if the graph was not replaced while embedding
+                if self._graph is graph:
+                    self._node_embeddings = (nodes, matrix)
+            return nodes, matrix
+
+    def _build_layout(self, graph: nx.Graph, communities: List[set], pos: Dict[Any, Tuple[float, float]]) -> Dict[str, Any]:
+        """Arrange positions, communities and degrees for the whole graph as columns."""
         community_map = {}
         for i, comm in enumerate(communities):
             for node in comm:
                 community_map[node] = i
 
-        # Calculate node positions using force-directed layout
-        pos = nx.spring_layout(graph, k=1 / pow(len(graph.nodes()), 0.3))
+        # Order nodes by degree so the first pages hold the most connected nodes
+        node_ids = sorted(graph.nodes(), key=lambda n: graph.degree(n), reverse=True)
+        index = {node_id: i for i, node_id in enumerate(node_ids)}
 
-        nodes = []
-        edges = []
-
-        # Process nodes with community information
-        for node_id in graph.nodes():
-            community_id = community_map.get(node_id, 0)
-            position = pos[node_id]
-            nodes.append(
-                {
-                    "id": str(node_id),
-                    "data": {
-                        "label": str(node_id),
-                        "community": community_id,
-                        "degree": graph.degree(node_id),
-                    },
-                    "position": {
-                        "x": float(position[0] * 1000),
-                        "y": float(position[1] * 1000),
-                    },
-                }
-            )
-
-        # Process edges with relationship types
+        edge_source = []
+        edge_target = []
+        relationships = []
+        weights = []
         for source, target, data in graph.edges(data=True):
-            relationship = data.get("relationship", "related_to")
+            edge_source.append(index[source])
+            edge_target.append(index[target])
+            relationships.append(data.get("relationship", "related_to"))
             # Calculate edge weight based on relationship frequency
-            weight = data.get("weight", 1.0)
-            edges.append(
-                {
-                    "id": f"e{source}-{target}",
-                    "source": str(source),
-                    "target": str(target),
-                    "animated": True,
-                    "data": {"relationship": relationship, "weight": weight},
-                    "label": relationship,
-                }
-            )
+            weights.append(float(data.get("weight", 1.0)))
 
         return {
-            "nodes": nodes,
-            "edges": edges,
+            "ids": [str(node_id) for node_id in node_ids],
+            "x": np.array([pos[n][0] * 1000 for n in node_ids], dtype=np.float32),
+            "y": np.array([pos[n][1] * 1000 for n in node_ids], dtype=np.float32),
+            "community": np.array([community_map.get(n, 0) for n in node_ids], dtype=np.int32),
+            "degree": np.array([graph.degree(n) for n in node_ids], dtype=np.int32),
+            "edge_source": np.array(edge_source, dtype=np.int64),
+            "edge_target": np.array(edge_target, dtype=np.int64),
+            "relationship": relationships,
+            "weight": np.array(weights, dtype=np.float32),
             "metadata": {
                 "communities": len(communities),
-                "total_nodes": len(nodes),
-                "total_edges": len(edges),
+                "total_nodes": len(node_ids),
+                "total_edges": len(edge_source),
             },
         }
 
+    @traced("graph.view")
+    def get_graph_view(
+        self,
+        offset: int = 0,
+        limit: int = 500,
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        min_degree: Optional[int] = None,
+        max_degree: Optional[int] = None,
+        communities: Optional[List[int]] = None,
+    ) -> Dict[str, Any]:
+        """Return one page of the cached layout as parallel arrays.
+
+        Nodes are filtered by viewport (``bbox`` as min_x, min_y, max_x, max_y),
+        degree range and community, then paginated in descending degree order.
+        Only edges whose endpoints are both on the page are included.
+        """
+        layout = self._layout
+        if layout is None:
+            return _empty_graph_view(offset, limit)
+
+        mask = np.ones(len(layout["ids"]), dtype=bool)
+        if bbox is not None:
+            min_x, min_y, max_x, max_y = bbox
+            mask &= (layout["x"] >= min_x) & (layout["x"] <= max_x)
+            mask &= (layout["y"] >= min_y) & (layout["y"] <= max_y)
+        if min_degree is not None:
+            mask &= layout["degree"] >= min_degree
+        if max_degree is not None:
+            mask &= layout["degree"] <= max_degree
+        if communities:
+            mask &= np.isin(layout["community"], communities)
+
+        matched = np.flatnonzero(mask)
+        page = matched[offset:offset + limit]
+
+        # Keep edges with both endpoints on the page
+        on_page = np.zeros(len(layout["ids"]), dtype=bool)
+        on_page[page] = True
+        edge_idx = np.flatnonzero(on_page[layout["edge_source"]] & on_page[layout["edge_target"]])
+
+        ids = layout["ids"]
+        next_offset = offset + limit if offset + limit < len(matched) else None
+        return {
+            "nodes": {
+                "id": [ids[i] for i in page],
+                "x": layout["x"][page].tolist(),
+                "y": layout["y"][page].tolist(),
+                "community": layout["community"][page].tolist(),
+                "degree": layout["degree"][page].tolist(),
+            },
+            "edges": {
+                "source": [ids[i] for i in layout["edge_source"][edge_idx]],
+                "target": [ids[i] for i in layout["edge_target"][edge_idx]],
+                "relationship": [layout["relationship"][i] for i in edge_idx],
+                "weight": layout["weight"][edge_idx].tolist(),
+            },
+            "metadata": {
+                **layout["metadata"],
+                "matched_nodes": int(len(matched)),
+                "offset": offset,
+                "limit": limit,
+                "next_offset": next_offset,
+            },
+        }
+
+    def _get_graph_visualization_data(self) -> Dict[str, Any]:
+        """Convert the whole cached layout to the React Flow node/edge format."""
+        if self._layout is None:
+            return {"nodes": [], "edges": [], "metadata": {}}
+        view = self.get_graph_view(limit=len(self._layout["ids"]))
+        return graph_view_to_rows(view)
+
+    @traced("graph.subgraph")
     def _get_relevant_subgraph(self, query: str, max_nodes: int = 20) -> Dict[str, Any]:
         """Get a relevant subgraph based on the query."""
         if not self.kg_index:
             return {"nodes": [], "edges": [], "metadata": {}}
 
-        # Get the full graph
-        graph = self.graph_store.get_networkx_graph()
+        # Get the full graph and its cached node embeddings
+        graph = self._get_graph()
+        node_list, node_matrix = self._get_node_embeddings()
 
         # Get query embedding
-        query_embedding = self.embed_model.get_text_embedding(query)
+        query_embedding = np.array(self.embed_model.get_text_embedding(query), dtype=np.float32)
+        query_embedding /= np.linalg.norm(query_embedding) or 1
 
         # Calculate relevance scores for nodes
-        node_scores = {}
-        for node in graph.nodes():
-            # Get node embedding from the index (simplified)
-            node_embedding = self.embed_model.get_text_embedding(str(node))
-            # Calculate cosine similarity
-            similarity = self._cosine_similarity(query_embedding, node_embedding)
-            node_scores[node] = similarity
+        scores = node_matrix @ query_embedding if len(node_list) else np.zeros(0)
+        node_scores = dict(zip(node_list, scores.tolist()))
 
         # Get top-k most relevant nodes
         relevant_nodes = sorted(node_scores.items(), key=lambda x: x[1], reverse=True)[
@@ -220,29 +428,41 @@ class GraphService:
             },
         }
 
-    def _cosine_similarity(self, v1: List[float], v2: List[float]) -> float:
-        """Calculate cosine similarity between two vectors."""
-        import numpy as np
-
-        v1_n = np.array(v1)
-        v2_n = np.array(v2)
-        return np.dot(v1_n, v2_n) / (np.linalg.norm(v1_n) * np.linalg.norm(v2_n))
+    @traced("graph.query")
+    async def query_graph(
+        self,
+        query: str,
+        timeout: Optional[float] = None,
+        response_mode: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Query the knowledge graph.
 
-    async def query_graph(self, query: str) -> Dict[str, Any]:
-        """Query the knowledge graph."""
+        Answer generation and subgraph extraction run concurrently on the
+        bounded graph executor. Raises ``asyncio.TimeoutError`` when the
+        query takes longer than ``timeout`` (default ``GRAPH_QUERY_TIMEOUT``)
+        and GraphBusy when the executor already has too much work.
+        """
         if not self.kg_index:
             return {"error": "Knowledge graph not initialized"}
 
-        # Create query engine
-        query_engine = self.kg_index.as_query_engine(
-            response_mode="tree_summarize", verbose=True
-        )
+        # Reuse the query engine built for the current graph
+        query_engine = self._get_query_engine(response_mode)
 
-        # Get response
-        response = query_engine.query(query)
+        # Timed-out queries keep their threads until they finish; refuse new ones rather than queue without bound
+        self._reserve(2, GRAPH_QUERY_WORKERS + GRAPH_QUERY_MAX_QUEUED)
+        answer = self._run(traced("graph.answer")(query_engine.query), query)
+        subgraph = self._run(self._get_relevant_subgraph, query)
 
-        # Get relevant subgraph
-        subgraph = self._get_relevant_subgraph(query)
+        try:
+            response, subgraph = await asyncio.wait_for(
+                asyncio.gather(answer, subgraph),
+                timeout=timeout or GRAPH_QUERY_TIMEOUT,
+            )
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            # Drop work that has not started yet; running threads finish on their own
+            answer.cancel()
+            subgraph.cancel()
+            raise
 
         return {
             "answer": str(response),
@@ -257,6 +477,61 @@ class GraphService:
             ],
         }
 
+    def close(self):
+        """Stop accepting graph work and discard queued queries."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+def _empty_graph_view(offset: int, limit: int) -> Dict[str, Any]:
+    """Columnar view of an empty graph."""
+    return {
+        "nodes": {"id": [], "x": [], "y": [], "community": [], "degree": []},
+        "edges": {"source": [], "target": [], "relationship": [], "weight": []},
+        "metadata": {
+            "communities": 0,
+            "total_nodes": 0,
+            "total_edges": 0,
+            "matched_nodes": 0,
+            "offset": offset,
+            "limit": limit,
+            "next_offset": None,
+        },
+    }
+
+
+def graph_view_to_rows(view: Dict[str, Any]) -> Dict[str, Any]:
+    """Expand a columnar graph view into React Flow style node and edge objects."""
+    nodes = [
+        {
+            "id": node_id,
+            "data": {"label": node_id, "community": community_id, "degree": degree},
+            "position": {"x": x, "y": y},
+        }
+        for node_id, x, y, community_id, degree in zip(
+            view["nodes"]["id"],
+            view["nodes"]["x"],
+            view["nodes"]["y"],
+            view["nodes"]["community"],
+            view["nodes"]["degree"],
+        )
+    ]
+    edges = [
+        {
+            "id": f"e{source}-{target}",
+            "source": source,
+            "target": target,
+            "animated": True,
+            "data": {"relationship": relationship, "weight": weight},
+            "label": relationship,
+        }
+        for source, target, relationship, weight in zip(
+            view["edges"]["source"],
+            view["edges"]["target"],
+            view["edges"]["relationship"],
+            view["edges"]["weight"],
+        )
+    ]
+    return {"nodes": nodes, "edges": edges, "metadata": view["metadata"]}
+
 
-# Initialize the graph service
-graph_service = GraphService()
+# Initialize the graph service on first use
+graph_service = Lazy("graph", GraphService, "legacy")
@@ -0,0 +1,58 @@
+"""Gunicorn settings for running the search service with several workers.
+
+    gunicorn -c gunicorn.conf.py app.main:app
+    (from services/) gunicorn -c search_service/gunicorn.conf.py search_service.main:app
+
+The app is imported once in the master, which loads the models (and, for the
+legacy app, the vector indexes) through the app module's ``preload()`` before
+forking. Workers share those pages copy-on-write instead of each loading its
+own copy. Database pools and network clients are created in each worker.
+
+Both apps keep mutable in-process indexes (BM25, and the legacy vector
+indexes) that each worker updates on its own: with several workers a write
+is only visible in the worker that handled it, and BM25 journal compaction
+in one worker truncates entries appended by the others. The server therefore
+runs one worker unless WEB_CONCURRENCY asks for more, which is only safe for
+read-only traffic (e.g. benchmarks/workers.py). Set PROMETHEUS_MULTIPROC_DIR
+so /metrics reports all workers rather than the one answering the scrape.
+"""
+import gc
+import glob
+import importlib
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = os.getenv("PRELOAD_MODELS", "true").lower() == "true"
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = 30
+keepalive = 5
+# Recycle workers periodically; replacements fork from the preloaded master
+max_requests = int(os.getenv("MAX_REQUESTS", "0"))
+max_requests_jitter = max_requests // 10
+
+
+def on_starting(server):
+    # Worker metrics files from a previous run would be added to this run's totals
+    metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        for path in glob.glob(os.path.join(metrics_dir, "metrics_*.json")):
+            os.remove(path)
+    if workers > 1:
+        server.log.warning(
+            f"Running {workers} workers: in-process search indexes are per worker, so writes "
+            "are not visible across workers and the BM25 journal has several writers"
+        )
+
+
+def when_ready(server):
+    """Runs in the master after the app is imported and before any worker forks."""
+    if not preload_app:
+        return
+    module = importlib.import_module(server.app.app_uri.split(":")[0])
+    if hasattr(module, "preload"):
+        module.preload()
+    # Keep objects created so far out of the collector so its bookkeeping
+    # writes do not copy the shared pages into every worker
+    gc.freeze()
@@ -0,0 +1,78 @@
+import os
+from typing import List, Optional
+from sqlalchemy.orm import Session, undefer
+from dotenv import load_dotenv
+from .storage.bm25 import BM25Index
+from .models import PensionPlan, Document
+from . import document_content
+
+load_dotenv()
+
+BM25_INDEX_DIR = os.getenv("BM25_INDEX_DIR", "./bm25_index")
+
+# Separate indexes so plans and documents are ranked against their own statistics
+plan_index = BM25Index(os.path.join(BM25_INDEX_DIR, "plans"))
+document_index = BM25Index(os.path.join(BM25_INDEX_DIR, "documents"))
+
+
+def plan_text(plan: PensionPlan) -> str:
+    """Text of the plan fields that lexical search matches against."""
+    return " ".join(
+        str(value)
+        for value in (plan.company_name, plan.plan_type, plan.description, plan.main_contact, plan.tags)
+        if value
+    )
+
+
+def document_text(document: Document, content: Optional[str] = None) -> str:
+    """Text of the document fields that lexical search matches against.
+
+    Pass ``content`` when the body is already at hand, saving a blob store read.
+    """
+    if content is None:
+        content = document_content.get_content(document)
+    return " ".join(value for value in (document.filename, content) if value)
+
+
+def index_plan(plan: PensionPlan):
+    """Add or refresh a pension plan in the lexical index."""
+    plan_index.add(str(plan.id), plan_text(plan))
+
+
+def index_document(document: Document, content: Optional[str] = None):
+    """Add or refresh a document in the lexical index."""
+    document_index.add(str(document.id), document_text(document, content))
+
+
+def remove_plan(plan_id: int, document_ids: List[int]):
+    """Remove a pension plan and its documents from the lexical index."""
+    plan_index.remove(str(plan_id))
+    for document_id in document_ids:
+        document_index.remove(str(document_id))
+
+
+def _sync(index: BM25Index, db: Session, model, text, options=()):
+    indexed = index.ids()
+    stored = {str(row_id) for row_id, in db.query(model.id)}
+    if indexed == stored:
+        return
+    for doc_id in indexed - stored:
+        index.remove(doc_id)
+    missing = sorted(int(doc_id) for doc_id in stored - indexed)
+
+    def rows():
+        for start in range(0, len(missing), 500):
+            yield from db.query(model).options(*options).filter(model.id.in_(missing[start:start + 500]))
+
+    index.add_many((str(row.id), text(row)) for row in rows())
+
+
+def sync_with_database(db: Session):
+    """Bring the lexical indexes in line with the database at startup.
+
+    The on-disk snapshot can miss rows (e.g. written while another process
+    compacted the journal) or keep deleted ones; missing rows are indexed and
+    stale ids removed.
+    """
+    _sync(plan_index, db, PensionPlan, plan_text)
+    _sync(document_index, db, Document, document_text, (undefer(Document.content),))
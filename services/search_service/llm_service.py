@@ -1,16 +1,22 @@
 import os
-from typing import Optional
-from anthropic import Anthropic
+from typing import List, Optional
+from anthropic import AsyncAnthropic
 from dotenv import load_dotenv
+from .services.lazy import Lazy
+from .services.tracing import traced, record_size, record_error
 
 load_dotenv()
 
+class LLMError(Exception):
+    """The model call failed; there is no answer."""
+
 class LLMService:
     def __init__(self):
-        self.client = Anthropic(
+        self.client = AsyncAnthropic(
             api_key=os.getenv("ANTHROPIC_API_KEY"),
         )
 
+    @traced("llm.query")
     async def process_query(
         self,
         query: str,
@@ -55,11 +61,14 @@ If you need more specific information about particular pension plans or document
                 ]
             )
 
+            record_size("llm.query", "tokens", response.usage.input_tokens + response.usage.output_tokens)
             return response.content[0].text
 
         except Exception as e:
-            return f"I apologize, but I encountered an error while processing your request: {str(e)}"
+            # Callers must not mistake a failure for an answer (and e.g. store it as a chat turn)
+            raise LLMError(f"Error processing query: {str(e)}") from e
 
+    @traced("llm.process_document")
     async def process_document(self, content: str) -> dict:
         """Process a document and extract key information."""
         try:
@@ -88,6 +97,8 @@ Document content:
                 ]
             )
 
+            record_size("llm.process_document", "tokens", response.usage.input_tokens + response.usage.output_tokens)
+
             # Parse the response into sections
             text = response.content[0].text
             sections = text.split("\n\n")
@@ -98,10 +109,40 @@ Document content:
             }
 
         except Exception as e:
+            record_error("llm.process_document", e)
             return {
                 "summary": "Error processing document",
                 "key_information": str(e)
             }
 
-# Initialize the LLM service
-llm_service = LLMService() 
\ No newline at end of file
+    @traced("llm.summarize")
+    async def summarize_conversation(self, previous_summary: Optional[str], turns: List[str], max_tokens: int = 300) -> str:
+        """Fold older chat turns into a running conversation summary."""
+        prompt = f"""Current summary of the conversation so far:
+{previous_summary or "(none)"}
+
+New messages to add to it:
+{chr(10).join(turns)}
+
+Write an updated summary of the whole conversation in at most {max_tokens // 2} words. Keep the
+client's goals, questions that were answered, facts about their pension plans, figures,
+dates and any open follow-ups. Leave out greetings and repetition."""
+
+        response = await self.client.messages.create(
+            model=os.getenv("ANTHROPIC_SUMMARY_MODEL", os.getenv("ANTHROPIC_MODEL", "claude-3-sonnet-20240229")),
+            max_tokens=max_tokens,
+            temperature=0.0,
+            system="You maintain concise running summaries of conversations between pension advisors and their clients.",
+            messages=[
+                {
+                    "role": "user",
+                    "content": prompt
+                }
+            ]
+        )
+
+        record_size("llm.summarize", "tokens", response.usage.input_tokens + response.usage.output_tokens)
+        return response.content[0].text.strip()
+
+# Initialize the LLM service on first use
+llm_service = Lazy("llm", LLMService, "legacy")
\ No newline at end of file
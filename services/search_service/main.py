@@ -1,24 +1,49 @@
-from fastapi import FastAPI, HTTPException, Depends, Query, UploadFile, File
+import asyncio
+import logging
+import os
+import time
+from fastapi import FastAPI, HTTPException, Depends, Query, UploadFile, File, Response, Header
+from fastapi.responses import StreamingResponse
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 from typing import List, Optional, Dict, Any
 import numpy as np
 from datetime import datetime
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
-from .database import get_db, engine, database
+from .database import get_db, engine, database, SessionLocal
 from .models import Base, PensionPlan, Document, SearchQuery, SearchResponse, ProcessResponse, Client, ChatMessage, Upload
 from .schemas import PensionPlanCreate, PensionPlan as PensionPlanSchema
-from .schemas import PensionPlanUpdate, SearchQuery, SearchResult, DocumentCreate, Document as DocumentSchema
+from .schemas import PensionPlanUpdate, SearchQuery, SearchResult, DocumentCreate, Document as DocumentSchema, DocumentInfo
 from .schemas import ClientCreate, ClientUpdate, Client as ClientSchema
 from .schemas import ChatMessageCreate, ChatMessage as ChatMessageSchema, UploadCreate, Upload as UploadSchema
-from .embeddings import embeddings_service
+from .schemas import ChatMessagePage, UploadPage
+from .embeddings import embed_text, embed_text_array, embeddings_service
 from .document_processor import document_processor
-from .llm_service import llm_service
-from .graph_service import graph_service
-
-# Create tables
-Base.metadata.create_all(bind=engine)
+from .llm_service import llm_service, LLMError
+from .graph_service import graph_service, graph_view_to_rows, GraphBusy, InvalidGraphQuery, GRAPH_QUERY_MAX_TIMEOUT
+from .storage.bm25 import reciprocal_rank_fusion
+from .pagination import keyset_page
+from .migrate import prepare_schema
+from . import conversation_memory, document_content, lexical_index, semantic_index
+from .rerank_service import rerank_service, RERANK_CANDIDATES, CHAT_CONTEXT_DOCUMENTS, CHAT_CONTEXT_PLANS
+from .services.lazy import warm_up, component_status, record_timing, startup_timings
+from .services.process_pool import process_pool
+from .services.uploads import UploadTooLarge, spool_upload
+from .services.tracing import instrument_app
+
+try:
+    import msgpack
+except ImportError:  # msgpack encoding for graph reads is optional
+    msgpack = None
+
+# Load every model in the background at startup instead of on first use
+WARMUP_ON_STARTUP = os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true"
+# Namespace of this app's lazily loaded components in services.lazy
+COMPONENTS = "legacy"
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="PensionOS Search Service")
 
@@ -31,26 +56,149 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Stage timing middleware and the Prometheus /metrics endpoint
+instrument_app(app)
+
+# Candidates taken from each ranking before reciprocal rank fusion
+HYBRID_CANDIDATES = 50
+# Documents considered when attaching documents to search results
+DOCUMENT_CANDIDATES = 100
+
 class GraphQuery(BaseModel):
     query: str
+    timeout: Optional[float] = Field(None, gt=0, le=GRAPH_QUERY_MAX_TIMEOUT)
+    response_mode: Optional[str] = None
 
 class GraphDocuments(BaseModel):
     documents: List[Dict[str, Any]]
+    include_graph_data: bool = False
 
 class ChatQuery(BaseModel):
     query: str
     client_id: int
     include_history: bool = True
+    # Store the user message and the reply as chat history
+    persist: bool = True
     max_tokens: int = 500
     temperature: float = 0.7
 
-@app.lifespan("startup")
+# Set once startup has connected the database and loaded the indexes
+startup_complete = False
+# Set by preload() when a pre-forking server already loaded models and indexes
+preloaded = False
+warmup_task: Optional[asyncio.Task] = None
+
+def _timed(name: str, step, *args):
+    start = time.perf_counter()
+    result = step(*args)
+    record_timing(name, time.perf_counter() - start, COMPONENTS)
+    return result
+
+def _load_indexes():
+    db = SessionLocal()
+    try:
+        _timed("lexical_index", lexical_index.sync_with_database, db)
+        _timed("semantic_index", semantic_index.load, db)
+    finally:
+        db.close()
+    if len(semantic_index.plan_index) or len(semantic_index.document_index):
+        # Refuse to serve vectors written by another model; this loads the model early
+        _timed("embedding_check", lambda: semantic_index.check_dimension(embeddings_service.output_dimension()))
+
+def _map_indexes():
+    semantic_index.save_snapshot()
+    _timed("semantic_index_mmap", semantic_index.load_snapshot)
+
+# Components holding only model weights, which forked workers can share. The
+# graph, LLM and parser services open network clients, so each worker builds its own.
+FORK_SAFE_COMPONENTS = ("embeddings", "reranker")
+
+def preload():
+    """Load models and indexes in a pre-forking server's master process.
+
+    Called from gunicorn.conf.py before workers are forked. Workers inherit
+    the loaded models copy-on-write, and the vector indexes are re-mapped from
+    a snapshot on disk so every worker shares the same page-cache pages.
+    """
+    global preloaded
+    _timed("schema", prepare_schema, engine, Base.metadata)
+    _load_indexes()
+    _map_indexes()
+    warm_up(COMPONENTS, [name for name in FORK_SAFE_COMPONENTS if name in component_status(COMPONENTS)])
+    # Workers must not inherit the master's pooled connections
+    engine.dispose()
+    preloaded = True
+    logger.info(f"Preloaded models and indexes: {startup_timings(COMPONENTS)}")
+
+@app.on_event("startup")
 async def startup():
+    global startup_complete, warmup_task
+    start = time.perf_counter()
+    # A preloading master already migrated; workers must not race each other doing it
+    if not preloaded:
+        await asyncio.to_thread(_timed, "schema", prepare_schema, engine, Base.metadata)
     await database.connect()
-
-@app.lifespan("shutdown")
+    record_timing("database", time.perf_counter() - start, COMPONENTS)
+    if not preloaded:
+        await asyncio.to_thread(_load_indexes)
+        if semantic_index.EMBEDDING_EXACT_RESCORE:
+            # Keep the float32 rescoring vectors in the page cache rather than the heap
+            await asyncio.to_thread(_map_indexes)
+    startup_complete = True
+    logger.info(f"Startup finished in {time.perf_counter() - start:.2f}s: {startup_timings(COMPONENTS)}")
+
+    if WARMUP_ON_STARTUP:
+        warmup_task = asyncio.create_task(asyncio.to_thread(warm_up, COMPONENTS))
+
+@app.on_event("shutdown")
 async def shutdown():
+    await conversation_memory.drain()
     await database.disconnect()
+    if graph_service.loaded:
+        graph_service.close()
+    process_pool.shutdown()
+
+# Health and warm-up
+@app.get("/health/live")
+async def liveness():
+    """The process is up and the event loop is responding."""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def readiness(response: Response):
+    """Ready once startup finished and, with WARMUP_ON_STARTUP, every model is loaded."""
+    components = component_status(COMPONENTS)
+    ready = startup_complete and (not WARMUP_ON_STARTUP or all(components.values()))
+    if not ready:
+        response.status_code = 503
+    return {
+        "status": "ready" if ready else "starting",
+        "components": components,
+        "timings": startup_timings(COMPONENTS),
+    }
+
+@app.get("/health/rerank")
+async def rerank_health():
+    """Cross-encoder latency and budget statistics since the model loaded."""
+    if rerank_service is None:
+        return {"enabled": False}
+    if not rerank_service.loaded:
+        return {"enabled": True, "loaded": False}
+    return {"enabled": True, "loaded": True, **rerank_service.stats()}
+
+@app.get("/health/pool")
+async def pool_health():
+    """Process pool queue depth and task latency."""
+    return process_pool.stats()
+
+@app.post("/warmup")
+async def warmup(components: Optional[List[str]] = Query(None)):
+    """Load the given components (all by default) so no request pays for it."""
+    try:
+        timings = await asyncio.to_thread(warm_up, COMPONENTS, components)
+    except KeyError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    return {"components": component_status(COMPONENTS), "timings": timings}
 
 # Document Operations
 @app.post("/documents/", response_model=DocumentSchema)
@@ -65,52 +213,79 @@ async def upload_document(
         raise HTTPException(status_code=404, detail="Pension plan not found")
     
     try:
-        # Process PDF file
-        content, embedding, analysis = await document_processor.process_pdf(file.file)
+        # Spool the upload with bounded memory before handing it to the parser
+        with await spool_upload(file) as upload:
+            content, embedding, analysis = await (await document_processor.get_async()).process_pdf(upload.open())
         
         # Create document record
         db_document = Document(
             pension_plan_id=pension_plan_id,
             filename=file.filename,
-            content=content,
-            embedding=embedding,
             summary=analysis["summary"],
             key_information=analysis["key_information"],
             created_at=datetime.utcnow(),
             updated_at=datetime.utcnow()
         )
+        document_content.set_content(db_document, content)
+        semantic_index.set_embedding(db_document, embedding)
         
         db.add(db_document)
         db.commit()
         db.refresh(db_document)
-        return db_document
+        lexical_index.index_document(db_document, content)
+        semantic_index.index_document(db_document.id, embedding)
+        return _document_response(db_document)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+def _document_response(db_document: Document, content: Optional[str] = None) -> DocumentSchema:
+    # Validated as DocumentInfo: reading the ORM object's content would load the deferred legacy column
+    return DocumentSchema(**DocumentInfo.model_validate(db_document).model_dump(), content=content)
+
 @app.get("/documents/{document_id}", response_model=DocumentSchema)
-async def read_document(document_id: int, db: Session = Depends(get_db)):
+async def read_document(document_id: int, include_content: bool = False, db: Session = Depends(get_db)):
+    """Document metadata; the body is included only when asked for (see /documents/{id}/content)."""
     db_document = db.query(Document).filter(Document.id == document_id).first()
     if db_document is None:
         raise HTTPException(status_code=404, detail="Document not found")
-    return db_document
+    return _document_response(db_document, document_content.get_content(db_document) if include_content else None)
+
+@app.get("/documents/{document_id}/content")
+async def read_document_content(document_id: int, db: Session = Depends(get_db)):
+    """Stream the document text from the blob store in chunks."""
+    db_document = db.query(Document).filter(Document.id == document_id).first()
+    if db_document is None or not document_content.has_content(db_document):
+        raise HTTPException(status_code=404, detail="Document not found")
+    if db_document.content_key is not None and db_document.content_key not in document_content.blob_store:
+        raise HTTPException(status_code=404, detail="Document content not found")
+    headers = {"Content-Length": str(db_document.content_size)} if db_document.content_size is not None else None
+    return StreamingResponse(
+        document_content.stream_content(db_document),
+        media_type="text/plain; charset=utf-8",
+        headers=headers
+    )
 
 # CRUD Operations
 @app.post("/pension-plans/", response_model=PensionPlanSchema)
 async def create_pension_plan(plan: PensionPlanCreate, db: Session = Depends(get_db)):
     try:
         # Generate embedding for the plan description
-        embedding = embeddings_service.get_embedding(plan.description)
+        embedding = await embed_text(plan.description)
         
         db_plan = PensionPlan(
             **plan.dict(),
-            embedding=embedding,
             created_at=datetime.utcnow(),
             updated_at=datetime.utcnow()
         )
+        semantic_index.set_embedding(db_plan, embedding)
         db.add(db_plan)
         db.commit()
         db.refresh(db_plan)
+        lexical_index.index_plan(db_plan)
+        semantic_index.index_plan(db_plan.id, embedding)
         return db_plan
     except Exception as e:
         db.rollback()
@@ -145,16 +320,21 @@ async def update_pension_plan(
         
         update_data = plan_update.dict(exclude_unset=True)
         
-        # If description is updated, update the embedding
-        if "description" in update_data:
-            update_data["embedding"] = embeddings_service.get_embedding(update_data["description"])
-        
         for key, value in update_data.items():
             setattr(db_plan, key, value)
         
+        # If description is updated, update the embedding
+        embedding = None
+        if "description" in update_data:
+            embedding = await embed_text(update_data["description"])
+            semantic_index.set_embedding(db_plan, embedding)
+        
         db_plan.updated_at = datetime.utcnow()
         db.commit()
         db.refresh(db_plan)
+        lexical_index.index_plan(db_plan)
+        if embedding is not None:
+            semantic_index.index_plan(db_plan.id, embedding)
         return db_plan
     except Exception as e:
         db.rollback()
@@ -168,11 +348,14 @@ async def delete_pension_plan(plan_id: int, db: Session = Depends(get_db)):
             raise HTTPException(status_code=404, detail="Pension plan not found")
         
         # Delete associated documents first
+        document_ids = [doc.id for doc in db_plan.documents]
         for doc in db_plan.documents:
             db.delete(doc)
         
         db.delete(db_plan)
         db.commit()
+        lexical_index.remove_plan(plan_id, document_ids)
+        semantic_index.remove_plan(plan_id, document_ids)
         return {"message": "Pension plan and associated documents deleted successfully"}
     except Exception as e:
         db.rollback()
@@ -184,49 +367,86 @@ async def search_pension_plans(
     query: SearchQuery,
     db: Session = Depends(get_db)
 ):
-    # Get query embedding
-    query_embedding = embeddings_service.get_embedding(query.query)
-    
-    # Get all plans and their embeddings
-    plans = db.query(PensionPlan).all()
-    if not plans:
+    # Get query embedding; the indexes take the float32 vector as is
+    query_embedding = await embed_text_array(query.query)
+
+    # Nearest plans from the in-memory quantized index
+    n_candidates = max(query.limit, HYBRID_CANDIDATES, RERANK_CANDIDATES)
+    # Index scans are CPU-bound, so they run in a worker thread
+    vector_hits = await asyncio.to_thread(semantic_index.plan_index.search, query_embedding, n_candidates)
+    vector_ranking = [str(plan_id) for plan_id, _ in vector_hits]
+
+    # Lexical matches catch exact tokens such as policy and CVR numbers
+    plan_ranking = []
+    lexical_docs = []
+    doc_plan_ranking = []
+    if query.hybrid:
+        plan_ranking = [doc_id for doc_id, _ in lexical_index.plan_index.search(query.query, limit=HYBRID_CANDIDATES)]
+        lexical_docs = [int(doc_id) for doc_id, _ in lexical_index.document_index.search(query.query, limit=HYBRID_CANDIDATES)]
+        if lexical_docs:
+            doc_plans = dict(
+                db.query(Document.id, Document.pension_plan_id).filter(Document.id.in_(lexical_docs)).all()
+            )
+            for doc_id in lexical_docs:
+                plan_id = doc_plans.get(doc_id)
+                if plan_id is not None and str(plan_id) not in doc_plan_ranking:
+                    doc_plan_ranking.append(str(plan_id))
+
+    # Only the candidate plans are loaded from the database
+    candidate_ids = {int(plan_id) for plan_id in vector_ranking + plan_ranking + doc_plan_ranking}
+    if not candidate_ids:
         return SearchResult(plans=[], total=0)
-    
-    # Get all documents if requested
+    plans_by_id = {
+        plan.id: plan
+        for plan in db.query(PensionPlan).filter(PensionPlan.id.in_(candidate_ids)).all()
+    }
+
+    if query.hybrid:
+        # Fuse vector order with lexical order over plan fields and plan documents
+        fused = reciprocal_rank_fusion([vector_ranking, plan_ranking, doc_plan_ranking])
+        ranked_plans = [plans_by_id[int(plan_id)] for plan_id, _ in fused if int(plan_id) in plans_by_id]
+    else:
+        ranked_plans = [plans_by_id[int(plan_id)] for plan_id in vector_ranking if int(plan_id) in plans_by_id]
+
+    # Get relevant documents if requested
     if query.include_documents:
-        # Get all documents and their embeddings
-        documents = db.query(Document).all()
-        if documents:
-            doc_embeddings = [doc.embedding for doc in documents]
-            doc_similarities = embeddings_service.compute_similarity(query_embedding, doc_embeddings)
+        # Only include highly relevant or lexically matching documents
+        doc_hits = await asyncio.to_thread(
+            semantic_index.document_index.search, query_embedding, DOCUMENT_CANDIDATES, 0.7
+        )
+        doc_ids = {doc_id for doc_id, _ in doc_hits}
+        doc_ids.update(lexical_docs)
+        if doc_ids:
+            documents = db.query(Document).filter(Document.id.in_(doc_ids)).all()
             
             # Group documents by pension plan and add to relevant plans
-            for doc, similarity in zip(documents, doc_similarities):
-                if similarity > 0.7:  # Only include highly relevant documents
-                    for plan in plans:
-                        if plan.id == doc.pension_plan_id:
-                            plan.documents.append(doc)
-    
-    # Compute similarities for plans
-    plan_embeddings = [plan.embedding for plan in plans]
-    similarities = embeddings_service.compute_similarity(query_embedding, plan_embeddings)
-    
-    # Sort plans by similarity
-    plans_with_scores = list(zip(plans, similarities))
-    plans_with_scores.sort(key=lambda x: x[1], reverse=True)
+            for doc in documents:
+                plan = plans_by_id.get(doc.pension_plan_id)
+                if plan is not None:
+                    plan.documents.append(doc)
+
+    rerank_ms = None
+    if rerank_service is not None and query.rerank:
+        # Rescore the head of the ranking with the cross-encoder
+        candidates = ranked_plans[:max(query.limit, RERANK_CANDIDATES)]
+        order, rerank_ms = await (await rerank_service.get_async()).rerank_async(
+            query.query, [lexical_index.plan_text(plan) for plan in candidates], top_k=query.limit
+        )
+        ranked_plans = [candidates[i] for i in order]
     
     # Return top-k results
-    top_k_plans = [plan for plan, _ in plans_with_scores[:query.limit]]
+    top_k_plans = ranked_plans[:query.limit]
     
     return SearchResult(
         plans=top_k_plans,
-        total=len(top_k_plans)
+        total=len(top_k_plans),
+        rerank_ms=rerank_ms
     )
 
 @app.post("/process", response_model=ProcessResponse)
 async def process_document(file: UploadFile = File(...)):
     try:
-        result = await document_processor.process(file)
+        result = await (await document_processor.get_async()).process(file)
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -235,33 +455,55 @@ async def process_document(file: UploadFile = File(...)):
 async def search(query: SearchQuery):
     try:
         # Get query embedding
-        query_embedding = embeddings_service.get_embedding(query.query)
+        query_embedding = await embed_text(query.query)
         
         # Search for similar documents
-        results = document_processor.search(query_embedding)
+        results = (await document_processor.get_async()).search(query_embedding)
         
         return SearchResponse(results=results)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _stored_turn(db: Session, client_id: int, idempotency_key: str) -> Optional[Dict[str, Any]]:
+    """The response already stored for a /chat turn, if this key was seen before."""
+    messages = {
+        message.role: message
+        for message in db.query(ChatMessage).filter(
+            ChatMessage.client_id == client_id, ChatMessage.idempotency_key == idempotency_key
+        )
+    }
+    if "assistant" not in messages:
+        return None
+    return {
+        "response": messages["assistant"].content,
+        "context_used": None,
+        "message_ids": [message.id for message in (messages.get("user"), messages["assistant"]) if message],
+        "replayed": True
+    }
+
 @app.post("/chat")
-async def chat(query: ChatQuery, db: Session = Depends(get_db)):
-    """Process a chat message and return an AI response."""
+async def chat(
+    query: ChatQuery,
+    db: Session = Depends(get_db),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+):
+    """Process a chat message and return an AI response.
+
+    Both turns are stored in one insert after the reply, so clients no longer
+    post them to /chat-messages/. Retrying with the same ``Idempotency-Key``
+    header returns the stored reply instead of answering (and storing) again.
+    """
     try:
-        # Get chat history for context
-        chat_history = []
+        received_at = datetime.utcnow()
+        if query.persist and idempotency_key:
+            stored = _stored_turn(db, query.client_id, idempotency_key)
+            if stored is not None:
+                return stored
+
+        # Conversation memory: rolling summary of older turns plus the latest ones verbatim
+        conversation_summary, chat_history = None, []
         if query.include_history:
-            messages = (
-                db.query(ChatMessage)
-                .filter(ChatMessage.client_id == query.client_id)
-                .order_by(ChatMessage.created_at.desc())
-                .limit(10)  # Get last 10 messages
-                .all()
-            )
-            chat_history = [
-                f"{'User' if msg.role == 'user' else 'Assistant'}: {msg.content}"
-                for msg in reversed(messages)  # Reverse to get chronological order
-            ]
+            conversation_summary, chat_history = conversation_memory.load_memory(db, query.client_id)
 
         # Get client's pension plans
         client = db.query(Client).filter(Client.id == query.client_id).first()
@@ -275,62 +517,120 @@ async def chat(query: ChatQuery, db: Session = Depends(get_db)):
         full_context = ""
         if context:
             full_context += f"Relevant Information:\n{context}\n\n"
+        if conversation_summary:
+            full_context += f"Earlier Conversation (summary):\n{conversation_summary}\n\n"
         if chat_history:
             full_context += f"Recent Conversation:\n" + "\n".join(chat_history)
         
         # Process query with context
-        response = await llm_service.process_query(
+        response = await (await llm_service.get_async()).process_query(
             query=query.query,
             context=full_context if full_context else None,
             max_tokens=query.max_tokens,
             temperature=query.temperature
         )
         
-        return {
+        result = {
             "response": response,
             "context_used": bool(full_context)
         }
+        if query.persist:
+            # Both turns in a single batched insert and commit
+            messages = [
+                ChatMessage(client_id=query.client_id, role="user", content=query.query,
+                            idempotency_key=idempotency_key, created_at=received_at),
+                ChatMessage(client_id=query.client_id, role="assistant", content=response,
+                            idempotency_key=idempotency_key, created_at=datetime.utcnow()),
+            ]
+            db.add_all(messages)
+            try:
+                db.commit()
+            except IntegrityError:
+                db.rollback()
+                if not idempotency_key:
+                    raise
+                # A concurrent retry with the same key stored its turn first
+                stored = _stored_turn(db, query.client_id, idempotency_key)
+                if stored is None:
+                    raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is in progress")
+                return stored
+            result["message_ids"] = [message.id for message in messages]
+
+            # Fold turns that left the recent window into the summary, off the request path
+            conversation_memory.schedule_summary(query.client_id)
+
+        return result
+    except HTTPException:
+        raise
+    except LLMError as e:
+        # Nothing was stored, so a retry with the same key asks the model again
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 async def get_chat_context(query: str, db: Session, client: Client) -> str:
     """Get relevant context for the chat query."""
     try:
-        # Get query embedding
-        query_embedding = embeddings_service.get_embedding(query)
+        # Get query embedding; the indexes take the float32 vector as is
+        query_embedding = await embed_text_array(query)
         
         relevant_docs = []
         relevant_plans = []
 
         # Get client's pension plans
         if client.pension_plans:
-            # Search in documents related to client's pension plans
-            for plan in client.pension_plans:
-                # Get documents for this plan
-                if plan.documents:
-                    doc_embeddings = [doc.embedding for doc in plan.documents]
-                    doc_similarities = embeddings_service.compute_similarity(query_embedding, doc_embeddings)
-                    
-                    # Get relevant documents
-                    for doc, similarity in zip(plan.documents, doc_similarities):
-                        if similarity > 0.7:  # Only include highly relevant documents
-                            relevant_docs.append(
-                                f"Document '{doc.filename}' from plan '{plan.company_name}':\n"
-                                f"Summary: {doc.summary}\n"
-                                f"Key Information: {doc.key_information}"
-                            )
-                
-                # Add plan information if relevant
-                plan_embedding = embeddings_service.get_embedding(plan.description)
-                plan_similarity = embeddings_service.compute_similarity(query_embedding, [plan_embedding])[0]
-                if plan_similarity > 0.7:
-                    relevant_plans.append(
-                        f"Pension Plan: {plan.company_name}\n"
-                        f"Type: {plan.plan_type}\n"
-                        f"Description: {plan.description}\n"
-                        f"Contact: {plan.main_contact}\n"
-                        f"Participants: {plan.participants_count}"
+            plans = client.pension_plans
+            documents = [(plan, doc) for plan in plans for doc in plan.documents]
+
+            # Score against the in-memory index instead of loading embeddings per row,
+            # in worker threads so the scoring does not hold up the event loop
+            doc_scores, plan_scores = await asyncio.gather(
+                asyncio.to_thread(semantic_index.document_index.score, query_embedding, [doc.id for _, doc in documents]),
+                asyncio.to_thread(semantic_index.plan_index.score, query_embedding, [plan.id for plan in plans])
+            )
+            doc_similarities = [-1.0 if similarity is None else similarity for similarity in doc_scores]
+            plan_similarities = [-1.0 if similarity is None else similarity for similarity in plan_scores]
+
+            if rerank_service is not None:
+                # Let the cross-encoder pick the context instead of a fixed cutoff
+                doc_candidates = sorted(zip(documents, doc_similarities), key=lambda x: x[1], reverse=True)
+                doc_candidates = [item for item, _ in doc_candidates[:RERANK_CANDIDATES]]
+                plan_candidates = sorted(zip(plans, plan_similarities), key=lambda x: x[1], reverse=True)
+                plan_candidates = [plan for plan, _ in plan_candidates[:RERANK_CANDIDATES]]
+                reranker = await rerank_service.get_async()
+                (doc_order, _), (plan_order, _) = await asyncio.gather(
+                    reranker.rerank_async(
+                        query,
+                        [f"{doc.summary}\n{doc.key_information}" for _, doc in doc_candidates],
+                        top_k=CHAT_CONTEXT_DOCUMENTS
+                    ),
+                    reranker.rerank_async(
+                        query,
+                        [lexical_index.plan_text(plan) for plan in plan_candidates],
+                        top_k=CHAT_CONTEXT_PLANS
                     )
+                )
+                selected_docs = [doc_candidates[i] for i in doc_order]
+                selected_plans = [plan_candidates[i] for i in plan_order]
+            else:
+                # Only include highly relevant documents and plans
+                selected_docs = [item for item, similarity in zip(documents, doc_similarities) if similarity > 0.7]
+                selected_plans = [plan for plan, similarity in zip(plans, plan_similarities) if similarity > 0.7]
+
+            for plan, doc in selected_docs:
+                relevant_docs.append(
+                    f"Document '{doc.filename}' from plan '{plan.company_name}':\n"
+                    f"Summary: {doc.summary}\n"
+                    f"Key Information: {doc.key_information}"
+                )
+            for plan in selected_plans:
+                relevant_plans.append(
+                    f"Pension Plan: {plan.company_name}\n"
+                    f"Type: {plan.plan_type}\n"
+                    f"Description: {plan.description}\n"
+                    f"Contact: {plan.main_contact}\n"
+                    f"Participants: {plan.participants_count}"
+                )
         
         # Combine context
         context_parts = []
@@ -348,17 +648,68 @@ async def get_chat_context(query: str, db: Session, client: Client) -> str:
 async def process_graph_documents(documents: GraphDocuments):
     """Process documents and create a knowledge graph."""
     try:
-        result = await graph_service.process_documents(documents.documents)
+        result = await (await graph_service.get_async()).process_documents(
+            documents.documents, include_graph_data=documents.include_graph_data
+        )
         return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/graph/")
+async def read_graph(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(500, ge=1, le=5000),
+    min_x: Optional[float] = None,
+    min_y: Optional[float] = None,
+    max_x: Optional[float] = None,
+    max_y: Optional[float] = None,
+    min_degree: Optional[int] = None,
+    max_degree: Optional[int] = None,
+    community: Optional[List[int]] = Query(None),
+    encoding: str = Query("json", pattern="^(json|columnar|msgpack)$"),
+):
+    """Read a page of the knowledge graph, optionally restricted to a viewport.
+
+    ``json`` returns React Flow style objects, ``columnar`` returns parallel
+    arrays and ``msgpack`` returns the columnar view as a msgpack body.
+    """
+    bbox = None
+    if None not in (min_x, min_y, max_x, max_y):
+        bbox = (min_x, min_y, max_x, max_y)
+    elif any(v is not None for v in (min_x, min_y, max_x, max_y)):
+        raise HTTPException(status_code=422, detail="Viewport needs min_x, min_y, max_x and max_y")
+
+    view = (await graph_service.get_async()).get_graph_view(
+        offset=offset,
+        limit=limit,
+        bbox=bbox,
+        min_degree=min_degree,
+        max_degree=max_degree,
+        communities=community,
+    )
+
+    if encoding == "columnar":
+        return view
+    if encoding == "msgpack":
+        if msgpack is None:
+            raise HTTPException(status_code=406, detail="msgpack encoding is not available")
+        return Response(content=msgpack.packb(view), media_type="application/x-msgpack")
+    return graph_view_to_rows(view)
+
 @app.post("/graph/query")
 async def query_graph(query: GraphQuery):
     """Query the knowledge graph."""
     try:
-        result = await graph_service.query_graph(query.query)
+        result = await (await graph_service.get_async()).query_graph(
+            query.query, timeout=query.timeout, response_mode=query.response_mode
+        )
         return result
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=504, detail="Graph query timed out")
+    except GraphBusy:
+        raise HTTPException(status_code=503, detail="Too many graph queries in progress", headers={"Retry-After": "5"})
+    except InvalidGraphQuery as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -501,6 +852,9 @@ async def create_chat_message(message: ChatMessageCreate, db: Session = Depends(
     db.add(db_message)
     db.commit()
     db.refresh(db_message)
+    # An assistant reply completes an exchange
+    if db_message.role == "assistant":
+        conversation_memory.schedule_summary(db_message.client_id)
     return db_message
 
 @app.get("/chat-messages/{client_id}", response_model=List[ChatMessage])
@@ -510,16 +864,33 @@ async def get_chat_history(
     limit: int = 50,
     db: Session = Depends(get_db)
 ):
+    """Offset-paginated history; deep pages scan every skipped row, prefer the /page endpoint."""
     messages = (
         db.query(ChatMessage)
         .filter(ChatMessage.client_id == client_id)
-        .order_by(ChatMessage.created_at.desc())
+        .order_by(ChatMessage.created_at.desc(), ChatMessage.id.desc())
         .offset(skip)
         .limit(limit)
         .all()
     )
     return messages
 
+@app.get("/chat-messages/{client_id}/page", response_model=ChatMessagePage)
+async def get_chat_history_page(
+    client_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Newest-first history page; pass ``next_cursor`` back as ``cursor`` for older messages."""
+    try:
+        messages, next_cursor = keyset_page(
+            db.query(ChatMessage).filter(ChatMessage.client_id == client_id), ChatMessage, cursor, limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": messages, "next_cursor": next_cursor}
+
 # Upload Operations
 @app.post("/uploads/", response_model=Upload)
 async def create_upload(
@@ -527,49 +898,76 @@ async def create_upload(
     file: UploadFile = File(...),
     db: Session = Depends(get_db)
 ):
-    # Create upload record
-    db_upload = Upload(
-        client_id=client_id,
-        filename=file.filename,
-        file_type=file.content_type,
-        status="pending",
-        created_at=datetime.utcnow(),
-        updated_at=datetime.utcnow()
-    )
-    db.add(db_upload)
-    db.commit()
-    db.refresh(db_upload)
-
+    """Store and process an uploaded file; a file the client already processed is linked to its document, not parsed again."""
     try:
-        # Process the document
-        content, embedding, analysis = await document_processor.process_pdf(file.file)
-        
-        # Create document record
-        db_document = Document(
+        spooled = await spool_upload(file)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+
+    with spooled:
+        # Create upload record
+        db_upload = Upload(
+            client_id=client_id,
             filename=file.filename,
-            content=content,
-            embedding=embedding,
-            summary=analysis["summary"],
-            key_information=analysis["key_information"],
+            file_type=file.content_type,
+            content_sha256=spooled.sha256,
+            size=spooled.size,
+            status="pending",
             created_at=datetime.utcnow(),
             updated_at=datetime.utcnow()
         )
-        db.add(db_document)
-        db.commit()
-        db.refresh(db_document)
-
-        # Update upload record with document_id
-        db_upload.document_id = db_document.id
-        db_upload.status = "processed"
-        db_upload.updated_at = datetime.utcnow()
+        previous = (
+            db.query(Upload)
+            .filter(
+                Upload.content_sha256 == spooled.sha256,
+                # Only reuse this client's own processed documents
+                Upload.client_id == client_id,
+                Upload.status == "processed",
+                Upload.document_id.isnot(None)
+            )
+            .first()
+        )
+        if previous is not None:
+            db_upload.document_id = previous.document_id
+            db_upload.status = "processed"
+        db.add(db_upload)
         db.commit()
         db.refresh(db_upload)
+        if previous is not None:
+            return db_upload
 
-    except Exception as e:
-        db_upload.status = "failed"
-        db_upload.updated_at = datetime.utcnow()
-        db.commit()
-        raise HTTPException(status_code=500, detail=str(e))
+        try:
+            # Process the document
+            content, embedding, analysis = await (await document_processor.get_async()).process_pdf(spooled.open())
+            
+            # Create document record
+            db_document = Document(
+                filename=file.filename,
+                summary=analysis["summary"],
+                key_information=analysis["key_information"],
+                created_at=datetime.utcnow(),
+                updated_at=datetime.utcnow()
+            )
+            document_content.set_content(db_document, content)
+            semantic_index.set_embedding(db_document, embedding)
+            db.add(db_document)
+            db.commit()
+            db.refresh(db_document)
+            lexical_index.index_document(db_document, content)
+            semantic_index.index_document(db_document.id, embedding)
+
+            # Update upload record with document_id
+            db_upload.document_id = db_document.id
+            db_upload.status = "processed"
+            db_upload.updated_at = datetime.utcnow()
+            db.commit()
+            db.refresh(db_upload)
+
+        except Exception as e:
+            db_upload.status = "failed"
+            db_upload.updated_at = datetime.utcnow()
+            db.commit()
+            raise HTTPException(status_code=500, detail=str(e))
 
     return db_upload
 
@@ -580,16 +978,33 @@ async def get_client_uploads(
     limit: int = 50,
     db: Session = Depends(get_db)
 ):
+    """Offset-paginated uploads; deep pages scan every skipped row, prefer the /page endpoint."""
     uploads = (
         db.query(Upload)
         .filter(Upload.client_id == client_id)
-        .order_by(Upload.created_at.desc())
+        .order_by(Upload.created_at.desc(), Upload.id.desc())
         .offset(skip)
         .limit(limit)
         .all()
     )
     return uploads
 
+@app.get("/uploads/{client_id}/page", response_model=UploadPage)
+async def get_client_uploads_page(
+    client_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db)
+):
+    """Newest-first uploads page; pass ``next_cursor`` back as ``cursor`` for older uploads."""
+    try:
+        uploads, next_cursor = keyset_page(
+            db.query(Upload).filter(Upload.client_id == client_id), Upload, cursor, limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"items": uploads, "next_cursor": next_cursor}
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
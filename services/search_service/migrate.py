@@ -0,0 +1,144 @@
+"""Schema migrations (Alembic) and helpers for online schema changes.
+
+Apply migrations from services/search_service before starting a new release:
+
+    alembic upgrade head
+    alembic revision -m "add something"     # new file under migrations/versions
+
+Migrations must be safe against a live database: build indexes with
+``create_index_concurrently``, add columns nullable (or with a constant
+default), and fill existing rows with a resumable job from backfill.py
+instead of a single UPDATE.
+
+At startup the service runs ``alembic upgrade head`` itself when
+DB_AUTO_MIGRATE is set. Otherwise it only creates missing tables, as before,
+and logs a warning when the database is behind the latest migration.
+"""
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional, Sequence
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DB_AUTO_MIGRATE = os.getenv("DB_AUTO_MIGRATE", "false").lower() == "true"
+
+ALEMBIC_INI = Path(__file__).resolve().parent / "alembic.ini"
+
+
+def _config():
+    from alembic.config import Config
+
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "migrations"))
+    # Running inside the app: fileConfig would reset the app's logging setup
+    config.attributes["configure_logger"] = False
+    return config
+
+
+def upgrade(revision: str = "head"):
+    """Apply migrations up to ``revision``."""
+    from alembic import command
+
+    command.upgrade(_config(), revision)
+
+
+def pending_revisions(engine) -> List[str]:
+    """Revisions not yet applied to the database behind ``engine``."""
+    from alembic.runtime.migration import MigrationContext
+    from alembic.script import ScriptDirectory
+
+    script = ScriptDirectory.from_config(_config())
+    with engine.connect() as connection:
+        current = MigrationContext.configure(connection).get_current_heads()
+    # From the latest revision down to (excluding) the applied ones, reported oldest first
+    return [revision.revision for revision in script.iterate_revisions("heads", current or "base")][::-1]
+
+
+def stamp(revision: str = "head"):
+    """Record ``revision`` as applied without running it."""
+    from alembic import command
+
+    command.stamp(_config(), revision)
+
+
+def prepare_schema(engine, metadata):
+    """Bring the schema up to date at startup (see DB_AUTO_MIGRATE)."""
+    if DB_AUTO_MIGRATE:
+        upgrade()
+        return
+    from sqlalchemy import inspect
+
+    fresh = not any(inspect(engine).has_table(table) for table in metadata.tables)
+    metadata.create_all(bind=engine)
+    try:
+        if fresh:
+            # create_all just built the latest schema; nothing to migrate
+            stamp()
+            return
+        pending = pending_revisions(engine)
+    except Exception as e:
+        logger.warning(f"Could not check schema migrations: {str(e)}")
+        return
+    if pending:
+        logger.warning(f"Database schema is behind: run 'alembic upgrade head' ({len(pending)} pending: {', '.join(pending)})")
+
+
+def create_index_concurrently(name: str, table: str, columns: Sequence[str], unique: bool = False):
+    """Create an index without blocking writes (PostgreSQL); a plain CREATE INDEX elsewhere.
+
+    CONCURRENTLY cannot run inside a transaction, so the statement runs in an
+    autocommit block. If an earlier attempt was interrupted it can leave an
+    INVALID index behind; it is dropped and rebuilt.
+    """
+    from alembic import op
+
+    bind = op.get_bind()
+    if bind.dialect.name != "postgresql":
+        op.create_index(name, table, list(columns), unique=unique, if_not_exists=True)
+        return
+    with op.get_context().autocommit_block():
+        invalid = bind.exec_driver_sql(
+            "SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = %(name)s AND NOT i.indisvalid",
+            {"name": name},
+        ).first()
+        if invalid:
+            op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+        op.create_index(name, table, list(columns), unique=unique, postgresql_concurrently=True, if_not_exists=True)
+
+
+def drop_index_concurrently(name: str, table: str):
+    """Drop an index without blocking writes (PostgreSQL)."""
+    from alembic import op
+
+    if op.get_bind().dialect.name != "postgresql":
+        op.drop_index(name, table_name=table, if_exists=True)
+        return
+    with op.get_context().autocommit_block():
+        op.drop_index(name, table_name=table, postgresql_concurrently=True, if_exists=True)
+
+
+def has_table(name: str) -> bool:
+    from alembic import op
+    from sqlalchemy import inspect
+
+    return inspect(op.get_bind()).has_table(name)
+
+
+def has_column(table: str, column: str) -> bool:
+    from alembic import op
+    from sqlalchemy import inspect
+
+    return column in {c["name"] for c in inspect(op.get_bind()).get_columns(table)}
+
+
+def set_lock_timeout(milliseconds: Optional[int] = 5000):
+    """Fail fast instead of queueing live queries behind a migration's table lock (PostgreSQL)."""
+    from alembic import op
+
+    if milliseconds and op.get_bind().dialect.name == "postgresql":
+        op.execute(f"SET LOCAL lock_timeout = '{int(milliseconds)}ms'")
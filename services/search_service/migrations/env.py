@@ -0,0 +1,52 @@
+"""Alembic environment: migrates the database in DATABASE_URL against search_service.models."""
+import sys
+from logging.config import fileConfig
+from pathlib import Path
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+
+# The search_service package lives one level above this directory's parent
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+
+from search_service.database import DATABASE_URL  # noqa: E402
+from search_service.models import Base  # noqa: E402
+
+config = context.config
+if config.config_file_name is not None and config.attributes.get("configure_logger", True):
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
+
+target_metadata = Base.metadata
+
+
+def run_migrations_offline():
+    """Emit the SQL to stdout (``alembic upgrade head --sql``) for review or a DBA."""
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def run_migrations_online():
+    # A dedicated connection, not the service's pool
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+    with connectable.connect() as connection:
+        # One transaction per revision, so autocommit blocks (CREATE INDEX
+        # CONCURRENTLY) only commit their own revision's earlier steps
+        context.configure(connection=connection, target_metadata=target_metadata, transaction_per_migration=True)
+        with context.begin_transaction():
+            context.run_migrations()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,93 @@
+"""Baseline: the schema as created by Base.metadata.create_all before migrations
+
+Databases that were created by the service before Alembic was introduced
+already have these tables; they are left untouched and only stamped.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from search_service import migrate
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    embedding = sa.ARRAY(sa.Float).with_variant(sa.JSON, "sqlite")
+
+    if not migrate.has_table("pension_plans"):
+        op.create_table(
+            "pension_plans",
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("company_name", sa.String, index=True),
+            sa.Column("plan_type", sa.String),
+            sa.Column("description", sa.String),
+            sa.Column("main_contact", sa.String),
+            sa.Column("participants_count", sa.Integer),
+            sa.Column("tags", sa.String),
+            sa.Column("embedding", embedding),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("updated_at", sa.DateTime),
+        )
+    if not migrate.has_table("documents"):
+        op.create_table(
+            "documents",
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("pension_plan_id", sa.Integer, sa.ForeignKey("pension_plans.id")),
+            sa.Column("filename", sa.String),
+            sa.Column("content", sa.String),
+            sa.Column("embedding", embedding),
+            sa.Column("summary", sa.String),
+            sa.Column("key_information", sa.String),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("updated_at", sa.DateTime),
+        )
+    if not migrate.has_table("clients"):
+        op.create_table(
+            "clients",
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("name", sa.String, index=True),
+            sa.Column("email", sa.String),
+            sa.Column("phone", sa.String),
+            sa.Column("company", sa.String),
+            sa.Column("status", sa.String),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("updated_at", sa.DateTime),
+        )
+    if not migrate.has_table("client_pension_plans"):
+        op.create_table(
+            "client_pension_plans",
+            sa.Column("client_id", sa.Integer, sa.ForeignKey("clients.id")),
+            sa.Column("pension_plan_id", sa.Integer, sa.ForeignKey("pension_plans.id")),
+        )
+    if not migrate.has_table("chat_messages"):
+        op.create_table(
+            "chat_messages",
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("client_id", sa.Integer, sa.ForeignKey("clients.id")),
+            sa.Column("content", sa.String),
+            sa.Column("role", sa.String),
+            sa.Column("created_at", sa.DateTime),
+        )
+    if not migrate.has_table("uploads"):
+        op.create_table(
+            "uploads",
+            sa.Column("id", sa.Integer, primary_key=True, index=True),
+            sa.Column("client_id", sa.Integer, sa.ForeignKey("clients.id")),
+            sa.Column("document_id", sa.Integer, sa.ForeignKey("documents.id")),
+            sa.Column("filename", sa.String),
+            sa.Column("file_type", sa.String),
+            sa.Column("status", sa.String),
+            sa.Column("created_at", sa.DateTime),
+            sa.Column("updated_at", sa.DateTime),
+        )
+
+
+def downgrade():
+    for table in ("uploads", "chat_messages", "client_pension_plans", "clients", "documents", "pension_plans"):
+        op.drop_table(table)
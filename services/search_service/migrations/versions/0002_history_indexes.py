@@ -0,0 +1,25 @@
+"""Composite (client_id, created_at, id) indexes for chat history and uploads
+
+Serve WHERE client_id = ? ORDER BY created_at DESC, id DESC and the keyset
+pages in pagination.py. Built CONCURRENTLY so writes continue meanwhile.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-19
+"""
+from search_service import migrate
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    migrate.create_index_concurrently("ix_chat_messages_client_created", "chat_messages", ["client_id", "created_at", "id"])
+    migrate.create_index_concurrently("ix_uploads_client_created", "uploads", ["client_id", "created_at", "id"])
+
+
+def downgrade():
+    migrate.drop_index_concurrently("ix_uploads_client_created", "uploads")
+    migrate.drop_index_concurrently("ix_chat_messages_client_created", "chat_messages")
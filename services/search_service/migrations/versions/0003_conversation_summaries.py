@@ -0,0 +1,31 @@
+"""Rolling per-client conversation summaries
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from search_service import migrate
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if migrate.has_table("conversation_summaries"):
+        return
+    op.create_table(
+        "conversation_summaries",
+        sa.Column("id", sa.Integer, primary_key=True, index=True),
+        sa.Column("client_id", sa.Integer, sa.ForeignKey("clients.id"), unique=True, nullable=False),
+        sa.Column("summary", sa.String),
+        sa.Column("summarized_until_id", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime),
+    )
+
+
+def downgrade():
+    op.drop_table("conversation_summaries")
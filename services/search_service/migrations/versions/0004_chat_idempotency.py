@@ -0,0 +1,31 @@
+"""Idempotency keys for chat turns persisted by /chat
+
+A nullable column without a default is a catalogue-only change; the unique
+index is built CONCURRENTLY.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from search_service import migrate
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if not migrate.has_column("chat_messages", "idempotency_key"):
+        migrate.set_lock_timeout()
+        op.add_column("chat_messages", sa.Column("idempotency_key", sa.String, nullable=True))
+    migrate.create_index_concurrently(
+        "uq_chat_messages_idempotency", "chat_messages", ["client_id", "idempotency_key", "role"], unique=True
+    )
+
+
+def downgrade():
+    migrate.drop_index_concurrently("uq_chat_messages_idempotency", "chat_messages")
+    op.drop_column("chat_messages", "idempotency_key")
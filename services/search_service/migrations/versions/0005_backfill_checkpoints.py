@@ -0,0 +1,32 @@
+"""Checkpoints of resumable batched backfills
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from search_service import migrate
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    if migrate.has_table("backfill_checkpoints"):
+        return
+    op.create_table(
+        "backfill_checkpoints",
+        sa.Column("name", sa.String, primary_key=True),
+        sa.Column("last_id", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("rows_done", sa.Integer, nullable=False, server_default="0"),
+        sa.Column("started_at", sa.DateTime),
+        sa.Column("updated_at", sa.DateTime),
+        sa.Column("finished_at", sa.DateTime),
+    )
+
+
+def downgrade():
+    op.drop_table("backfill_checkpoints")
@@ -0,0 +1,32 @@
+"""Document bodies in the blob store: content_key and content_size
+
+Both columns are nullable without a default, so adding them is a
+catalogue-only change. Existing bodies stay in documents.content until
+``python -m search_service.backfill move-content`` moves them.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from search_service import migrate
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    migrate.set_lock_timeout()
+    if not migrate.has_column("documents", "content_key"):
+        op.add_column("documents", sa.Column("content_key", sa.String, nullable=True))
+    if not migrate.has_column("documents", "content_size"):
+        op.add_column("documents", sa.Column("content_size", sa.Integer, nullable=True))
+
+
+def downgrade():
+    # Rows moved by move-content lose their body reference; the blobs themselves stay on disk
+    op.drop_column("documents", "content_size")
+    op.drop_column("documents", "content_key")
@@ -0,0 +1,32 @@
+"""Content hash and size of uploads, for reusing already processed files
+
+Nullable columns without a default are a catalogue-only change; the hash
+index is built CONCURRENTLY. Earlier uploads keep NULL and are never matched.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from search_service import migrate
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    migrate.set_lock_timeout()
+    if not migrate.has_column("uploads", "content_sha256"):
+        op.add_column("uploads", sa.Column("content_sha256", sa.String, nullable=True))
+    if not migrate.has_column("uploads", "size"):
+        op.add_column("uploads", sa.Column("size", sa.Integer, nullable=True))
+    migrate.create_index_concurrently("ix_uploads_content_sha256", "uploads", ["content_sha256"])
+
+
+def downgrade():
+    migrate.drop_index_concurrently("ix_uploads_content_sha256", "uploads")
+    op.drop_column("uploads", "size")
+    op.drop_column("uploads", "content_sha256")
@@ -0,0 +1,33 @@
+"""Packed embedding columns on pension plans and documents
+
+Databases created before compact embedding storage only have the JSON
+``embedding`` column. Nullable columns without a default are a
+catalogue-only change; rows keep NULL until the backfill packs them.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-19
+"""
+from alembic import op
+import sqlalchemy as sa
+from search_service import migrate
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    migrate.set_lock_timeout()
+    for table in ("pension_plans", "documents"):
+        if not migrate.has_column(table, "embedding_packed"):
+            op.add_column(table, sa.Column("embedding_packed", sa.LargeBinary, nullable=True))
+        if not migrate.has_column(table, "embedding_format"):
+            op.add_column(table, sa.Column("embedding_format", sa.String, nullable=True))
+
+
+def downgrade():
+    for table in ("documents", "pension_plans"):
+        op.drop_column(table, "embedding_format")
+        op.drop_column(table, "embedding_packed")
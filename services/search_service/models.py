@@ -1,5 +1,5 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, ARRAY, Float, Table
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, JSON, ARRAY, Float, Table, LargeBinary, Index
+from sqlalchemy.orm import relationship, deferred
 from sqlalchemy.ext.declarative import declarative_base
 
 Base = declarative_base()
@@ -22,7 +22,11 @@ class PensionPlan(Base):
     main_contact = Column(String)
     participants_count = Column(Integer)
     tags = Column(String)
-    embedding = Column(ARRAY(Float))
+    # Legacy float embedding; deferred so plan queries don't load it; JSON on SQLite (benchmarks)
+    embedding = deferred(Column(ARRAY(Float).with_variant(JSON, "sqlite")))
+    # Compact embedding (see storage/quantization.py) and its format
+    embedding_packed = deferred(Column(LargeBinary))
+    embedding_format = Column(String)
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
 
@@ -36,8 +40,16 @@ class Document(Base):
     id = Column(Integer, primary_key=True, index=True)
     pension_plan_id = Column(Integer, ForeignKey("pension_plans.id"))
     filename = Column(String)
-    content = Column(String)
-    embedding = Column(ARRAY(Float))
+    # Legacy inline body; new documents keep it in the blob store (see document_content.py)
+    content = deferred(Column(String))
+    # SHA-256 of the body in the blob store and its size in bytes
+    content_key = Column(String)
+    content_size = Column(Integer)
+    # Legacy float embedding; deferred so document queries don't load it; JSON on SQLite (benchmarks)
+    embedding = deferred(Column(ARRAY(Float).with_variant(JSON, "sqlite")))
+    # Compact embedding (see storage/quantization.py) and its format
+    embedding_packed = deferred(Column(LargeBinary))
+    embedding_format = Column(String)
     summary = Column(String)
     key_information = Column(String)
     created_at = Column(DateTime)
@@ -62,6 +74,7 @@ class Client(Base):
     # Relationships
     pension_plans = relationship("PensionPlan", secondary=client_pension_plans, back_populates="clients")
     chat_messages = relationship("ChatMessage", back_populates="client")
+    conversation_summary = relationship("ConversationSummary", back_populates="client", uselist=False)
     uploads = relationship("Upload", back_populates="client")
 
 class ChatMessage(Base):
@@ -71,11 +84,34 @@ class ChatMessage(Base):
     client_id = Column(Integer, ForeignKey("clients.id"))
     content = Column(String)
     role = Column(String)  # 'user' or 'assistant'
+    # Client-supplied key of the /chat turn that wrote this message; retries reuse it
+    idempotency_key = Column(String)
     created_at = Column(DateTime)
 
     # Relationships
     client = relationship("Client", back_populates="chat_messages")
 
+    # Serves a client's history newest first, including keyset pages (see pagination.py)
+    __table_args__ = (
+        Index("ix_chat_messages_client_created", "client_id", "created_at", "id"),
+        # One user and one assistant message per turn; NULL keys never conflict
+        Index("uq_chat_messages_idempotency", "client_id", "idempotency_key", "role", unique=True),
+    )
+
+class ConversationSummary(Base):
+    """Rolling summary of a client's chat history up to ``summarized_until_id``."""
+    __tablename__ = "conversation_summaries"
+
+    id = Column(Integer, primary_key=True, index=True)
+    client_id = Column(Integer, ForeignKey("clients.id"), unique=True, nullable=False)
+    summary = Column(String)
+    # Last ChatMessage folded into the summary; newer messages are still pending
+    summarized_until_id = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime)
+
+    # Relationships
+    client = relationship("Client", back_populates="conversation_summary")
+
 class Upload(Base):
     __tablename__ = "uploads"
 
@@ -84,10 +120,30 @@ class Upload(Base):
     document_id = Column(Integer, ForeignKey("documents.id"))
     filename = Column(String)
     file_type = Column(String)
+    # SHA-256 and size of the uploaded bytes; a re-uploaded file reuses the processed document
+    content_sha256 = Column(String, index=True)
+    size = Column(Integer)
     status = Column(String)  # 'pending', 'processed', 'failed'
     created_at = Column(DateTime)
     updated_at = Column(DateTime)
 
     # Relationships
     client = relationship("Client", back_populates="uploads")
-    document = relationship("Document", back_populates="uploads") 
\ No newline at end of file
+    document = relationship("Document", back_populates="uploads")
+
+    # Serves a client's uploads newest first, including keyset pages (see pagination.py)
+    __table_args__ = (
+        Index("ix_uploads_client_created", "client_id", "created_at", "id"),
+    )
+ 
+class BackfillCheckpoint(Base):
+    """Progress of a resumable batched backfill (see backfill.py)."""
+    __tablename__ = "backfill_checkpoints"
+
+    name = Column(String, primary_key=True)
+    # Rows are processed in primary-key order; everything up to last_id is done
+    last_id = Column(Integer, nullable=False, default=0)
+    rows_done = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    finished_at = Column(DateTime)
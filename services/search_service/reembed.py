@@ -0,0 +1,72 @@
+"""Migrate stored plan and document embeddings to the current embedding settings.
+
+Run from services/ as a module:
+
+    python -m search_service.reembed --mode truncate
+    python -m search_service.reembed --mode reencode --batch-size 32 --rows-per-second 50
+
+``truncate`` cuts existing vectors to EMBEDDING_DIM (valid for Matryoshka
+models such as jina-embeddings-v3) and repacks them in
+EMBEDDING_STORAGE_FORMAT without running the model. ``reencode`` embeds the
+source text again, which is required after changing the model.
+
+Runs as a resumable backfill (see backfill.py): progress is checkpointed per
+batch, so rerunning the same command continues where it stopped.
+"""
+import argparse
+from typing import List
+from sqlalchemy.orm import Session, undefer
+from .backfill import Backfill, add_run_arguments, run_with_arguments
+from .models import PensionPlan, Document
+from . import document_content, semantic_index
+
+
+def _source_text(row) -> str:
+    # Moved document bodies live in the blob store, not the content column
+    return row.description if isinstance(row, PensionPlan) else document_content.get_content(row)
+
+
+def reembed_job(model, mode: str) -> Backfill:
+    """Rewrite embeddings for one table in primary-key order."""
+    def process(db: Session, rows: List) -> int:
+        if mode == "reencode":
+            # Loading the model is only needed when re-encoding
+            from .embeddings import embeddings_service
+
+            vectors = embeddings_service.embed([_source_text(row) or "" for row in rows])
+        else:
+            vectors = [semantic_index.get_embedding(row) for row in rows]
+
+        updated = 0
+        for row, vector in zip(rows, vectors):
+            if vector is not None:
+                semantic_index.set_embedding(row, list(vector))
+                updated += 1
+        return updated
+
+    return Backfill(
+        name=f"reembed-{mode}:{model.__tablename__}",
+        model=model,
+        process=process,
+        options=(undefer(model.embedding_packed), undefer(model.embedding))
+        + ((undefer(Document.content),) if model is Document else ()),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate stored embeddings to the current settings.")
+    parser.add_argument("--mode", choices=["truncate", "reencode"], default="truncate")
+    parser.add_argument("--table", choices=["plans", "documents", "all"], default="all")
+    add_run_arguments(parser)
+    args = parser.parse_args()
+    if args.table == "all" and args.start_after is not None:
+        # Primary keys of one table mean nothing in the other
+        parser.error("--start-after needs --table plans or --table documents")
+
+    models = {"plans": [PensionPlan], "documents": [Document], "all": [PensionPlan, Document]}[args.table]
+    for model in models:
+        run_with_arguments(reembed_job(model, args.mode), args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+import os
+from dotenv import load_dotenv
+from .services.reranker import Reranker
+from .services.lazy import Lazy
+
+load_dotenv()
+
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "false").lower() == "true"
+# Vector candidates handed to the cross-encoder
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
+# Documents and plans kept in the chat context after reranking
+CHAT_CONTEXT_DOCUMENTS = int(os.getenv("CHAT_CONTEXT_DOCUMENTS", "5"))
+CHAT_CONTEXT_PLANS = int(os.getenv("CHAT_CONTEXT_PLANS", "3"))
+
+# Initialize the reranker on first use when enabled
+rerank_service = Lazy("reranker", lambda: Reranker(
+    model_name=os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+    batch_size=int(os.getenv("RERANK_BATCH_SIZE", "16")),
+    budget_ms=float(os.getenv("RERANK_BUDGET_MS", "200")),
+), "legacy") if RERANK_ENABLED else None
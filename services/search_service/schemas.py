@@ -12,9 +12,13 @@ class DocumentCreate(DocumentBase):
     pension_plan_id: int
 
 
-class Document(DocumentBase):
+class DocumentInfo(BaseModel):
+    """Document metadata; the body is served by GET /documents/{id}/content."""
     id: int
-    pension_plan_id: int
+    filename: str
+    pension_plan_id: Optional[int] = None
+    summary: Optional[str] = None
+    content_size: Optional[int] = None
     created_at: datetime
     updated_at: datetime
 
@@ -22,6 +26,11 @@ class Document(DocumentBase):
         from_attributes = True
 
 
+class Document(DocumentInfo):
+    # Only filled when requested with include_content
+    content: Optional[str] = None
+
+
 class PensionPlanBase(BaseModel):
     company_name: str
     plan_type: str
@@ -48,7 +57,7 @@ class PensionPlan(PensionPlanBase):
     id: int
     created_at: datetime
     updated_at: datetime
-    documents: List[Document] = []
+    documents: List[DocumentInfo] = []
 
     class Config:
         from_attributes = True
@@ -58,11 +67,14 @@ class SearchQuery(BaseModel):
     query: str
     limit: int = 10
     include_documents: bool = False
+    hybrid: bool = True
+    rerank: bool = True
 
 
 class SearchResult(BaseModel):
     plans: List[PensionPlan]
     total: int
+    rerank_ms: Optional[float] = None
 
 
 class ClientBase(BaseModel):
@@ -113,6 +125,12 @@ class ChatMessage(ChatMessageBase):
         from_attributes = True
 
 
+class ChatMessagePage(BaseModel):
+    items: List[ChatMessage]
+    # Pass as ``cursor`` to fetch the next (older) page; None on the last page
+    next_cursor: Optional[str] = None
+
+
 class UploadBase(BaseModel):
     filename: str
     file_type: str
@@ -127,8 +145,15 @@ class Upload(UploadBase):
     id: int
     client_id: int
     document_id: Optional[int]
+    content_sha256: Optional[str] = None
+    size: Optional[int] = None
     created_at: datetime
     updated_at: datetime
 
     class Config:
         from_attributes = True
+
+
+class UploadPage(BaseModel):
+    items: List[Upload]
+    next_cursor: Optional[str] = None
@@ -0,0 +1,119 @@
+import os
+from typing import List, Optional
+import numpy as np
+from sqlalchemy.orm import Session
+from dotenv import load_dotenv
+from .storage.quantization import FORMATS, pack_embedding, unpack_embedding
+from .storage.vector_index import QuantizedVectorIndex
+from .models import PensionPlan, Document
+from .embeddings import EMBEDDING_DIM
+
+load_dotenv()
+
+# Format of embeddings persisted in the embedding_packed columns
+EMBEDDING_STORAGE_FORMAT = os.getenv("EMBEDDING_STORAGE_FORMAT", "float16")
+# Also write the legacy float ARRAY column (8 bytes per dimension)
+EMBEDDING_STORE_FLOAT = os.getenv("EMBEDDING_STORE_FLOAT", "false").lower() == "true"
+# Format of vectors held in memory for search
+EMBEDDING_INDEX_FORMAT = os.getenv("EMBEDDING_INDEX_FORMAT", "int8")
+BINARY_PREFILTER = os.getenv("BINARY_PREFILTER", "false").lower() == "true"
+RESCORE_SHORTLIST = int(os.getenv("RESCORE_SHORTLIST", "500"))
+# Rescore the shortlist against float32 vectors kept in a memory-mapped snapshot
+EMBEDDING_EXACT_RESCORE = os.getenv("EMBEDDING_EXACT_RESCORE", "false").lower() == "true"
+# Leading dimensions used for the coarse Matryoshka pass; unset scans at full width.
+# Cannot be combined with BINARY_PREFILTER.
+EMBEDDING_COARSE_DIM = int(os.getenv("EMBEDDING_COARSE_DIM")) if os.getenv("EMBEDDING_COARSE_DIM") else None
+# Snapshot written by the preloading server so forked workers can mmap the indexes
+EMBEDDING_INDEX_DIR = os.getenv("EMBEDDING_INDEX_DIR", "./vector_index")
+
+if EMBEDDING_STORAGE_FORMAT not in FORMATS:
+    raise ValueError(f"EMBEDDING_STORAGE_FORMAT must be one of {', '.join(FORMATS)}, got {EMBEDDING_STORAGE_FORMAT}")
+
+plan_index = QuantizedVectorIndex(
+    EMBEDDING_INDEX_FORMAT, BINARY_PREFILTER, RESCORE_SHORTLIST, EMBEDDING_COARSE_DIM, EMBEDDING_EXACT_RESCORE
+)
+document_index = QuantizedVectorIndex(
+    EMBEDDING_INDEX_FORMAT, BINARY_PREFILTER, RESCORE_SHORTLIST, EMBEDDING_COARSE_DIM, EMBEDDING_EXACT_RESCORE
+)
+
+
+def _fit(vector) -> Optional[np.ndarray]:
+    """Truncate stored vectors wider than EMBEDDING_DIM to its Matryoshka prefix."""
+    if vector is None:
+        return None
+    return np.asarray(vector, dtype=np.float32)[:EMBEDDING_DIM]
+
+
+def set_embedding(row, vector: List[float]):
+    """Store an embedding on a plan or document row in the compact format."""
+    row.embedding_packed = pack_embedding(vector, EMBEDDING_STORAGE_FORMAT)
+    row.embedding_format = EMBEDDING_STORAGE_FORMAT
+    row.embedding = list(vector) if EMBEDDING_STORE_FLOAT else None
+
+
+def get_embedding(row) -> Optional[np.ndarray]:
+    """Read a row's embedding, falling back to the float column for unmigrated rows."""
+    if row.embedding_packed is not None:
+        return _fit(unpack_embedding(row.embedding_packed, row.embedding_format))
+    return _fit(row.embedding)
+
+
+def index_plan(plan_id: int, vector: List[float]):
+    """Add or refresh a pension plan in the vector index."""
+    plan_index.add(plan_id, _fit(vector))
+
+
+def index_document(document_id: int, vector: List[float]):
+    """Add or refresh a document in the vector index."""
+    document_index.add(document_id, _fit(vector))
+
+
+def remove_plan(plan_id: int, document_ids: List[int]):
+    """Remove a pension plan and its documents from the vector index."""
+    plan_index.remove(plan_id)
+    for document_id in document_ids:
+        document_index.remove(document_id)
+
+
+def load(db: Session):
+    """Load all stored embeddings into the in-memory indexes."""
+    for model, index in ((PensionPlan, plan_index), (Document, document_index)):
+        rows = db.query(model.id, model.embedding_packed, model.embedding_format).yield_per(1000)
+        index.add_many(
+            (row.id, _fit(unpack_embedding(row.embedding_packed, row.embedding_format)))
+            for row in rows
+            if row.embedding_packed is not None
+        )
+        # Rows written before compact storage only have the float column
+        legacy = db.query(model.id, model.embedding).filter(
+            model.embedding_packed.is_(None), model.embedding.isnot(None)
+        ).yield_per(1000)
+        index.add_many((row.id, _fit(row.embedding)) for row in legacy)
+
+
+def check_dimension(expected: int):
+    """Raise if the loaded vectors do not have the embedding model's output width.
+
+    Query vectors of another width cannot be scored against them, so serving
+    would fail on every search and on every new plan or document.
+    """
+    for name, index in (("plan", plan_index), ("document", document_index)):
+        if index.dimension is not None and index.dimension != expected:
+            raise RuntimeError(
+                f"Stored {name} embeddings are {index.dimension}-dimensional but the embedding model "
+                f"produces {expected}: set EMBEDDING_MODEL (and EMBEDDING_DIM) to the settings that wrote "
+                f"them, or run 'python -m search_service.reembed --mode reencode'"
+            )
+
+
+def save_snapshot(path: str = EMBEDDING_INDEX_DIR):
+    """Write both indexes to disk."""
+    plan_index.save(os.path.join(path, "plans"))
+    document_index.save(os.path.join(path, "documents"))
+
+
+def load_snapshot(path: str = EMBEDDING_INDEX_DIR) -> bool:
+    """Map both indexes from a snapshot copy-on-write; False if none exists."""
+    plans = plan_index.load(os.path.join(path, "plans"))
+    documents = document_index.load(os.path.join(path, "documents"))
+    return plans and documents
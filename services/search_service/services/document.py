@@ -1,36 +1,63 @@
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
+import asyncio
 import uuid
 from app.core.config import settings
+from storage.bm25 import reciprocal_rank_fusion
+from storage.chroma import build_where
+from services.lazy import resolve
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Chroma can neither store nor match None, so unset metadata fields are stored
+# as this value; a duplicate lookup can then require them to be unset too
+UNSET = ""
+
 class DocumentProcessor:
-    def __init__(self, embeddings_service, llm_service, chroma_store, neo4j_store):
+    def __init__(self, embeddings_service, llm_service, chroma_store, neo4j_store, lexical_index=None, reranker=None):
         self.embeddings_service = embeddings_service
         self.llm_service = llm_service
         self.chroma_store = chroma_store
         self.neo4j_store = neo4j_store
-
-    async def process_document(self, content: str, title: str) -> Dict:
-        """Process a document through the pipeline."""
+        self.lexical_index = lexical_index
+        self.reranker = reranker
+
+    async def process_document(
+        self,
+        content: str,
+        title: str,
+        metadata: Optional[Dict[str, Any]] = None,
+        content_sha256: Optional[str] = None
+    ) -> Dict:
+        """Process a document through the pipeline.
+
+        ``metadata`` (e.g. plan_id, client_id, document_type) is stored with the
+        vector so searches can be filtered on it, as is ``content_sha256``, the
+        hash of the uploaded file that ``find_duplicate`` looks up.
+        """
         try:
+            if content_sha256 is not None:
+                metadata = {**(metadata or {}), "content_sha256": content_sha256}
+
             # Generate document ID
             doc_id = str(uuid.uuid4())
 
             # Get document embedding
-            doc_embedding = self.embeddings_service.get_embedding(content)
+            doc_embedding = await (await resolve(self.embeddings_service)).get_embedding_async(content)
 
             # Process with LLM for summary and entities
             llm_results = await self.llm_service.process_document(content)
             summary = llm_results["summary"]
             entities = llm_results["entities"]
 
-            # Store in ChromaDB
-            self.chroma_store.add_documents(
+            # Queue for ChromaDB; writes are flushed in batches. Chroma calls are
+            # blocking (a full buffer flushes inline), so they run in worker threads.
+            await asyncio.to_thread(
+                self.chroma_store.buffer_upsert,
                 documents=[content],
                 embeddings=[doc_embedding],
                 metadatas=[{
+                    **{key: UNSET if value is None else value for key, value in (metadata or {}).items()},
                     "id": doc_id,
                     "title": title,
                     "summary": summary
@@ -38,6 +65,10 @@ class DocumentProcessor:
                 ids=[doc_id]
             )
 
+            # Keep the lexical index in step with the vectors
+            if self.lexical_index is not None:
+                self.lexical_index.add(doc_id, f"{title} {content}")
+
             # Store in Neo4j
             self.neo4j_store.add_document(
                 doc_id=doc_id,
@@ -63,34 +94,106 @@ class DocumentProcessor:
             return {
                 "document_id": doc_id,
                 "summary": summary,
-                "entities": entities
+                "entities": entities,
+                "duplicate": False
             }
 
         except Exception as e:
             logger.error(f"Error processing document: {str(e)}")
             raise
 
-    async def search(self, query: str, limit: int = 5) -> List[Dict]:
+    async def find_duplicate(self, content_sha256: str, metadata: Optional[Dict[str, Any]] = None) -> Optional[Dict]:
+        """The processing result of an earlier upload with this hash and matching metadata, if any.
+
+        Fields that are None must be unset on the earlier upload as well, so a
+        document is never reused across clients or plans.
+        """
+        equals = {key: UNSET if value is None else value for key, value in (metadata or {}).items()}
+        ids = await asyncio.to_thread(
+            self.chroma_store.find_ids, build_where({**equals, "content_sha256": content_sha256}), limit=1
+        )
+        if not ids:
+            return None
+        doc = await asyncio.to_thread(self.chroma_store.get_document, ids[0])
+        if not doc:
+            return None
+        return {
+            "document_id": ids[0],
+            "summary": doc["metadata"].get("summary", ""),
+            "entities": self.neo4j_store.get_document_entities(ids[0]),
+            "duplicate": True
+        }
+
+    async def search(
+        self,
+        query: str,
+        limit: int = 5,
+        where: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None
+    ) -> List[Dict]:
         """Search for documents using both vector and graph databases."""
         try:
             # Get query embedding
-            query_embedding = self.embeddings_service.get_embedding(query)
-
-            # Search in ChromaDB
-            chroma_results = self.chroma_store.search(
+            query_embedding = await (await resolve(self.embeddings_service)).get_embedding_async(query)
+
+            # Search in ChromaDB, filtering inside the index
+            hybrid = self.lexical_index is not None and len(self.lexical_index) > 0
+            n_candidates = limit
+            if hybrid:
+                n_candidates = max(n_candidates, settings.HYBRID_CANDIDATES)
+            if self.reranker is not None:
+                n_candidates = max(n_candidates, settings.RERANK_CANDIDATES)
+            chroma_results = await asyncio.to_thread(
+                self.chroma_store.search,
                 query_embedding=query_embedding,
-                n_results=limit
+                n_results=n_candidates,
+                where=where,
+                where_document=where_document
             )
 
-            # Enhance results with graph information
-            enhanced_results = []
+            documents = {}
             for i, doc_id in enumerate(chroma_results["ids"][0]):
-                document = {
+                documents[doc_id] = {
                     "id": doc_id,
                     "content": chroma_results["documents"][0][i],
                     "metadata": chroma_results["metadatas"][0][i],
                     "similarity": 1 - chroma_results["distances"][0][i]  # Convert distance to similarity
                 }
+            vector_ids = list(documents)
+            ranked_ids = vector_ids
+
+            if hybrid:
+                # Fuse vector order with BM25 order via reciprocal rank fusion
+                lexical_ids = [
+                    doc_id for doc_id, _ in self.lexical_index.search(query, limit=settings.HYBRID_CANDIDATES)
+                ]
+                missing = [doc_id for doc_id in lexical_ids if doc_id not in documents]
+                # Lexical-only hits still have to pass the metadata filters
+                lexical_docs = await asyncio.to_thread(self.chroma_store.get_documents, missing, where, where_document)
+                for doc_id, doc in lexical_docs.items():
+                    documents[doc_id] = {
+                        "id": doc_id,
+                        "content": doc["document"],
+                        "metadata": doc["metadata"],
+                        "similarity": None
+                    }
+                lexical_ids = [doc_id for doc_id in lexical_ids if doc_id in documents]
+                fused = reciprocal_rank_fusion([vector_ids, lexical_ids])
+                ranked_ids = [doc_id for doc_id, _ in fused]
+
+            if self.reranker is not None:
+                # Rescore the head of the ranking with the cross-encoder
+                candidates = ranked_ids[:max(limit, settings.RERANK_CANDIDATES)]
+                order, _ = await (await resolve(self.reranker)).rerank_async(
+                    query, [documents[doc_id]["content"] for doc_id in candidates], top_k=limit
+                )
+                ranked_ids = [candidates[i] for i in order]
+            ranked_ids = ranked_ids[:limit]
+
+            # Enhance results with graph information
+            enhanced_results = []
+            for doc_id in ranked_ids:
+                document = documents[doc_id]
 
                 # Get related entities from Neo4j
                 entities = self.neo4j_store.get_document_entities(doc_id)
@@ -108,7 +211,7 @@ class DocumentProcessor:
         """Get a document by its ID."""
         try:
             # Get document from ChromaDB
-            doc = self.chroma_store.get_document(document_id)
+            doc = await asyncio.to_thread(self.chroma_store.get_document, document_id)
             if not doc:
                 return None
 
@@ -137,8 +240,10 @@ class DocumentProcessor:
     async def delete_document(self, document_id: str):
         """Delete a document from all stores."""
         try:
-            self.chroma_store.delete_document(document_id)
+            await asyncio.to_thread(self.chroma_store.delete_document, document_id)
             self.neo4j_store.delete_document(document_id)
+            if self.lexical_index is not None:
+                self.lexical_index.remove(document_id)
         except Exception as e:
             logger.error(f"Error deleting document: {str(e)}")
             raise 
\ No newline at end of file
@@ -0,0 +1,193 @@
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+import asyncio
+import logging
+import os
+import sys
+import threading
+import numpy as np
+from dotenv import load_dotenv
+from .inference import build_encoder
+from .process_pool import process_pool
+from .tracing import traced
+
+load_dotenv()
+
+# Run the model in the process pool (one model copy per pool worker) instead of
+# a thread of the serving process
+EMBED_IN_PROCESS_POOL = os.getenv("EMBED_IN_PROCESS_POOL", "false").lower() == "true"
+# Similarity over at least this many rows is sent to the process pool
+SIMILARITY_OFFLOAD_ROWS = int(os.getenv("SIMILARITY_OFFLOAD_ROWS", "20000"))
+
+logger = logging.getLogger(__name__)
+
+def _optional_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+@dataclass(frozen=True)
+class EngineConfig:
+    """Everything that determines which model is loaded and how its output is shaped."""
+    # 384-dimensional, as used by the app's existing Chroma collections. The
+    # legacy app stored jina-embeddings-v3 vectors (1024-d) in Postgres and
+    # refuses to start until EMBEDDING_MODEL matches them or reembed.py ran.
+    model_name: str = "BAAI/bge-small-en-v1.5"
+    normalize: bool = True
+    device: Optional[str] = None
+    batch_size: int = 32
+    max_seq_length: int = 512
+    # Matryoshka output dimension; None keeps the full model width
+    dimension: Optional[int] = None
+    backend: str = "torch"
+    threads: Optional[int] = None
+    onnx_cache_dir: str = "./onnx_models"
+
+    @classmethod
+    def from_env(cls) -> "EngineConfig":
+        """Read the engine configuration from EMBEDDING_* environment variables."""
+        return cls(
+            model_name=os.getenv("EMBEDDING_MODEL", cls.model_name),
+            normalize=os.getenv("EMBEDDING_NORMALIZE", "true").lower() == "true",
+            device=os.getenv("EMBEDDING_DEVICE") or None,
+            batch_size=int(os.getenv("EMBEDDING_BATCH_SIZE", str(cls.batch_size))),
+            max_seq_length=int(os.getenv("EMBEDDING_MAX_SEQ_LENGTH", str(cls.max_seq_length))),
+            dimension=_optional_int("EMBEDDING_DIM"),
+            backend=os.getenv("EMBEDDING_BACKEND", cls.backend),
+            threads=_optional_int("EMBEDDING_THREADS"),
+            onnx_cache_dir=os.getenv("ONNX_CACHE_DIR", cls.onnx_cache_dir),
+        )
+
+def truncate_embeddings(embeddings: np.ndarray, dim: Optional[int]) -> np.ndarray:
+    """Keep the first ``dim`` components and rescale each vector to unit length."""
+    if dim is None or embeddings.shape[-1] <= dim:
+        return embeddings
+    embeddings = embeddings[..., :dim]
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return embeddings / np.where(norms == 0, 1, norms)
+
+def cosine_similarity(query_embedding, document_embeddings, normalized: bool = False, doc_norms=None) -> np.ndarray:
+    """Cosine similarity of one query to every row; skips the norms for unit vectors.
+
+    float32 arrays are used without copying. ``doc_norms`` lets callers that
+    score the same matrix repeatedly compute its row norms once.
+    """
+    query_embedding = np.asarray(query_embedding, dtype=np.float32)
+    document_embeddings = np.asarray(document_embeddings, dtype=np.float32)
+
+    similarities = document_embeddings @ query_embedding
+    if not normalized:
+        if doc_norms is None:
+            doc_norms = np.linalg.norm(document_embeddings, axis=1)
+        similarities /= doc_norms * np.linalg.norm(query_embedding)
+    return similarities
+
+class EmbeddingEngine:
+    """A single loaded embedding model with configurable output shaping."""
+
+    def __init__(self, config: EngineConfig):
+        self.config = config
+        self.encoder = build_encoder(
+            config.model_name,
+            backend=config.backend,
+            device=config.device,
+            threads=config.threads,
+            cache_dir=config.onnx_cache_dir,
+            max_seq_length=config.max_seq_length
+        )
+        self.device = self.encoder.device
+        self.dimension = config.dimension
+        self._output_dimension: Optional[int] = None
+        logger.info(f"Embedding model {config.model_name} loaded on {self.device} ({config.backend})")
+
+    @traced("embedding.encode", size=("vectors", len))
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into a float32 matrix shaped by the engine config."""
+        embeddings = self.encoder.encode(
+            texts, normalize=self.config.normalize, batch_size=self.config.batch_size
+        )
+        return truncate_embeddings(embeddings, self.config.dimension)
+
+    def output_dimension(self) -> int:
+        """Width of the vectors ``embed`` returns, after any Matryoshka truncation."""
+        if self._output_dimension is None:
+            self._output_dimension = int(self.embed(["dimension probe"]).shape[1])
+        return self._output_dimension
+
+    def get_embedding(self, text: str) -> List[float]:
+        """Generate embedding for a single text."""
+        return self.get_embedding_array(text).tolist()
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Generate embeddings for multiple texts."""
+        return self.embed(texts).tolist()
+
+    def get_embedding_array(self, text: str) -> np.ndarray:
+        """Embedding of a single text as a float32 vector (a view of the model output)."""
+        return self.embed([text])[0]
+
+    def get_embeddings_array(self, texts: List[str]) -> np.ndarray:
+        """Embeddings of multiple texts as a float32 matrix."""
+        return self.embed(texts)
+
+    def compute_similarity(
+        self,
+        query_embedding: List[float],
+        document_embeddings: List[List[float]],
+        normalized: Optional[bool] = None
+    ) -> List[float]:
+        """Compute cosine similarity between query and documents.
+
+        When the vectors are unit length (the default for a normalising engine)
+        the norms are skipped and the dot product is returned directly.
+        """
+        return self.compute_similarity_array(query_embedding, document_embeddings, normalized).tolist()
+
+    @traced("embedding.similarity", size=("vectors", len))
+    def compute_similarity_array(
+        self,
+        query_embedding: np.ndarray,
+        document_embeddings: np.ndarray,
+        normalized: Optional[bool] = None,
+        doc_norms: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Cosine similarity as a float32 array; float32 inputs are not copied."""
+        normalized = self.config.normalize if normalized is None else normalized
+        return cosine_similarity(query_embedding, document_embeddings, normalized, doc_norms)
+
+# One engine per distinct configuration, shared by everything in the process
+_engines: Dict[EngineConfig, EmbeddingEngine] = {}
+_engines_lock = threading.Lock()
+
+def get_engine(config: Optional[EngineConfig] = None) -> EmbeddingEngine:
+    """Return the process-wide engine for ``config`` (default: from the environment)."""
+    config = config or EngineConfig.from_env()
+    with _engines_lock:
+        engine = _engines.get(config)
+        if engine is None:
+            engine = EmbeddingEngine(config)
+            _engines[config] = engine
+        return engine
+
+def embed_texts(config: EngineConfig, texts: List[str]) -> np.ndarray:
+    """Embed texts with the engine for ``config``; the entry point for pool workers."""
+    return get_engine(config).embed(texts)
+
+async def embed_async(texts: List[str], config: Optional[EngineConfig] = None) -> np.ndarray:
+    """Embed texts without blocking the event loop."""
+    config = config or EngineConfig.from_env()
+    if EMBED_IN_PROCESS_POOL:
+        return await process_pool.run(embed_texts, config, texts)
+    # get_engine may load the model, so it runs in the thread as well
+    return await asyncio.to_thread(embed_texts, config, texts)
+
+async def similarity_async(query_embedding, document_embeddings, normalized: bool = False) -> np.ndarray:
+    """Cosine similarity, computed in the process pool for large matrices."""
+    if len(document_embeddings) >= SIMILARITY_OFFLOAD_ROWS:
+        return await process_pool.run(cosine_similarity, query_embedding, document_embeddings, normalized)
+    return cosine_similarity(query_embedding, document_embeddings, normalized)
+
+# The app imports this module as services.embedding_engine and the legacy app
+# as search_service.services.embedding_engine. Registering it under both names
+# makes a process hosting both apps share one module, and so one _engines.
+for _name in ("services.embedding_engine", "search_service.services.embedding_engine"):
+    sys.modules.setdefault(_name, sys.modules[__name__])
@@ -1,20 +1,16 @@
-from sentence_transformers import SentenceTransformer
-import numpy as np
-from typing import List, Dict
-import torch
+from typing import List, Optional
 import logging
-from app.core.config import settings
+import numpy as np
+from services.embedding_engine import EngineConfig, get_engine, embed_async, similarity_async
 
 logger = logging.getLogger(__name__)
 
 class EmbeddingsService:
-    def __init__(self):
-        """Initialize the embeddings service with a sentence transformer model."""
+    def __init__(self, config: Optional[EngineConfig] = None):
+        """Attach to the process-wide embedding engine for ``config``."""
         try:
-            self.model = SentenceTransformer('BAAI/bge-small-en-v1.5')
-            self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
-            self.model.to(self.device)
-            logger.info(f"Embeddings model loaded successfully on {self.device}")
+            self.engine = get_engine(config)
+            self.device = self.engine.device
         except Exception as e:
             logger.error(f"Failed to initialize embeddings model: {str(e)}")
             raise
@@ -22,9 +18,7 @@ class EmbeddingsService:
     def get_embedding(self, text: str) -> List[float]:
         """Generate embedding for a single text."""
         try:
-            with torch.no_grad():
-                embedding = self.model.encode(text, normalize_embeddings=True)
-                return embedding.tolist()
+            return self.engine.get_embedding(text)
         except Exception as e:
             logger.error(f"Error generating embedding: {str(e)}")
             raise
@@ -32,26 +26,56 @@ class EmbeddingsService:
     def get_embeddings(self, texts: List[str]) -> List[List[float]]:
         """Generate embeddings for multiple texts."""
         try:
-            with torch.no_grad():
-                embeddings = self.model.encode(texts, normalize_embeddings=True)
-                return embeddings.tolist()
+            return self.engine.get_embeddings(texts)
         except Exception as e:
             logger.error(f"Error generating embeddings: {str(e)}")
             raise
 
+    def get_embedding_array(self, text: str) -> np.ndarray:
+        """Generate a float32 embedding without converting it to a list."""
+        try:
+            return self.engine.get_embedding_array(text)
+        except Exception as e:
+            logger.error(f"Error generating embedding: {str(e)}")
+            raise
+
+    def get_embeddings_array(self, texts: List[str]) -> np.ndarray:
+        """Generate a float32 embedding matrix without converting it to lists."""
+        try:
+            return self.engine.get_embeddings_array(texts)
+        except Exception as e:
+            logger.error(f"Error generating embeddings: {str(e)}")
+            raise
+
+    async def get_embedding_async(self, text: str) -> List[float]:
+        """Generate embedding for a single text without blocking the event loop."""
+        try:
+            return (await embed_async([text], self.engine.config))[0].tolist()
+        except Exception as e:
+            logger.error(f"Error generating embedding: {str(e)}")
+            raise
+
+    async def compute_similarity_async(self, query_embedding: List[float], document_embeddings: List[List[float]]) -> List[float]:
+        """Compute cosine similarity, in the process pool for large matrices."""
+        try:
+            similarities = await similarity_async(query_embedding, document_embeddings, self.engine.config.normalize)
+            return similarities.tolist()
+        except Exception as e:
+            logger.error(f"Error computing similarity: {str(e)}")
+            raise
+
     def compute_similarity(self, query_embedding: List[float], document_embeddings: List[List[float]]) -> List[float]:
         """Compute cosine similarity between query and documents."""
         try:
-            query_embedding = np.array(query_embedding)
-            document_embeddings = np.array(document_embeddings)
-            
-            # Normalize the embeddings
-            query_norm = np.linalg.norm(query_embedding)
-            doc_norms = np.linalg.norm(document_embeddings, axis=1)
-            
-            # Compute cosine similarity
-            similarities = np.dot(document_embeddings, query_embedding) / (doc_norms * query_norm)
-            return similarities.tolist()
+            return self.engine.compute_similarity(query_embedding, document_embeddings)
         except Exception as e:
             logger.error(f"Error computing similarity: {str(e)}")
-            raise 
\ No newline at end of file
+            raise
+
+    def compute_similarity_array(self, query_embedding: np.ndarray, document_embeddings: np.ndarray, doc_norms: Optional[np.ndarray] = None) -> np.ndarray:
+        """Compute cosine similarity as a float32 array, without copying float32 inputs."""
+        try:
+            return self.engine.compute_similarity_array(query_embedding, document_embeddings, doc_norms=doc_norms)
+        except Exception as e:
+            logger.error(f"Error computing similarity: {str(e)}")
+            raise
@@ -0,0 +1,18 @@
+"""CPU-bound graph computations, kept free of LlamaIndex so process-pool workers import them cheaply."""
+from typing import Dict, List, Optional, Set, Tuple
+import networkx as nx
+from networkx.algorithms import community
+
+
+def spring_layout(graph: nx.Graph, k: Optional[float] = None) -> Dict[str, Tuple[float, float]]:
+    """Force-directed node positions as plain tuples."""
+    if graph.number_of_nodes() == 0:
+        return {}
+    return {node: (float(x), float(y)) for node, (x, y) in nx.spring_layout(graph, k=k).items()}
+
+
+def detect_communities(graph: nx.Graph) -> List[Set[str]]:
+    """Greedy modularity communities, largest first."""
+    if graph.number_of_nodes() == 0:
+        return []
+    return [set(c) for c in community.greedy_modularity_communities(graph)]
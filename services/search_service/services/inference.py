@@ -0,0 +1,162 @@
+from typing import List, Optional
+import json
+import logging
+import os
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+class TorchEncoder:
+    """Sentence-transformers model running in PyTorch eager mode."""
+
+    def __init__(
+        self,
+        model_name: str,
+        device: Optional[str] = None,
+        threads: Optional[int] = None,
+        max_seq_length: Optional[int] = None
+    ):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads:
+            torch.set_num_threads(threads)
+        self.device = device or ('cuda' if torch.cuda.is_available() else 'cpu')
+        self.model = SentenceTransformer(model_name, device=self.device)
+        if max_seq_length:
+            self.model.max_seq_length = max_seq_length
+
+    def encode(self, texts: List[str], normalize: bool = False, batch_size: int = 32) -> np.ndarray:
+        """Embed texts into a float32 matrix with one row per text."""
+        import torch
+
+        with torch.no_grad():
+            embeddings = self.model.encode(
+                texts,
+                batch_size=batch_size,
+                normalize_embeddings=normalize,
+                convert_to_numpy=True
+            )
+        return embeddings.astype(np.float32, copy=False)
+
+class OnnxEncoder:
+    """The same model exported to ONNX and run with ONNX Runtime on CPU.
+
+    The export (and, with ``quantize``, dynamic int8 weight quantization) is
+    done once and cached under ``cache_dir``. Pooling follows the model's
+    sentence-transformers pooling config.
+    """
+
+    def __init__(
+        self,
+        model_name: str,
+        cache_dir: str = "./onnx_models",
+        quantize: bool = False,
+        threads: Optional[int] = None,
+        max_seq_length: int = 512
+    ):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.max_seq_length = max_seq_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name, trust_remote_code=True)
+        self.pooling = self._pooling_mode(model_name)
+
+        model_path = self._export(model_name, cache_dir, quantize)
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.device = "cpu"
+
+    def encode(self, texts: List[str], normalize: bool = False, batch_size: int = 32) -> np.ndarray:
+        """Embed texts into a float32 matrix with one row per text."""
+        if isinstance(texts, str):
+            texts = [texts]
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            tokens = self.tokenizer(
+                texts[start:start + batch_size],
+                padding=True,
+                truncation=True,
+                max_length=self.max_seq_length,
+                return_tensors="np"
+            )
+            inputs = {name: value for name, value in tokens.items() if name in self.input_names}
+            hidden = self.session.run(None, inputs)[0]
+
+            if self.pooling == "cls":
+                pooled = hidden[:, 0]
+            else:
+                mask = tokens["attention_mask"][..., None].astype(np.float32)
+                pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+            batches.append(pooled.astype(np.float32))
+
+        embeddings = np.concatenate(batches) if batches else np.zeros((0, 0), dtype=np.float32)
+        if normalize:
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            embeddings /= np.where(norms == 0, 1, norms)
+        return embeddings
+
+    @staticmethod
+    def _pooling_mode(model_name: str) -> str:
+        """Read CLS or mean pooling from the sentence-transformers config, defaulting to mean."""
+        try:
+            from huggingface_hub import hf_hub_download
+
+            with open(hf_hub_download(model_name, "1_Pooling/config.json")) as f:
+                config = json.load(f)
+            return "cls" if config.get("pooling_mode_cls_token") else "mean"
+        except Exception:
+            return "mean"
+
+    @staticmethod
+    def _export(model_name: str, cache_dir: str, quantize: bool) -> str:
+        """Export the model to ONNX once, optionally quantizing it; returns the model path."""
+        export_dir = os.path.join(cache_dir, model_name.replace("/", "__"))
+        model_path = os.path.join(export_dir, "model.onnx")
+        if not os.path.exists(model_path):
+            from optimum.onnxruntime import ORTModelForFeatureExtraction
+
+            logger.info(f"Exporting {model_name} to ONNX in {export_dir}")
+            ORTModelForFeatureExtraction.from_pretrained(
+                model_name, export=True, trust_remote_code=True
+            ).save_pretrained(export_dir)
+
+        if not quantize:
+            return model_path
+
+        quantized_path = os.path.join(export_dir, "model.int8.onnx")
+        if not os.path.exists(quantized_path):
+            from onnxruntime.quantization import quantize_dynamic, QuantType
+
+            logger.info(f"Quantizing {model_path} to int8")
+            quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+        return quantized_path
+
+def build_encoder(
+    model_name: str,
+    backend: str = "torch",
+    device: Optional[str] = None,
+    threads: Optional[int] = None,
+    cache_dir: str = "./onnx_models",
+    max_seq_length: int = 512
+):
+    """Create the encoder for ``backend``: torch, onnx or onnx-int8."""
+    if backend == "torch":
+        return TorchEncoder(model_name, device=device, threads=threads, max_seq_length=max_seq_length)
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEncoder(
+            model_name,
+            cache_dir=cache_dir,
+            quantize=backend == "onnx-int8",
+            threads=threads,
+            max_seq_length=max_seq_length
+        )
+    raise ValueError(f"Unknown embedding backend: {backend} (expected one of {', '.join(BACKENDS)})")
@@ -0,0 +1,94 @@
+from typing import Any, Callable, Dict, Iterable, Optional
+import asyncio
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Per namespace (one per app), seconds each component took to initialise, in load order
+_timings: Dict[str, Dict[str, float]] = {}
+_registry: Dict[str, Dict[str, "Lazy"]] = {}
+
+
+class Lazy:
+    """Proxy that builds its target on first attribute access.
+
+    Module-level services are wrapped in ``Lazy`` so importing the app stays
+    cheap; heavy models load on first use or through ``warm_up``. Components
+    are registered under the ``namespace`` of the app that owns them, so two
+    apps in one process do not replace each other's entries. Coroutines load
+    through ``get_async`` so a first use does not block the event loop.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Any], namespace: str):
+        self._name = name
+        self._namespace = namespace
+        self._factory = factory
+        self._target = None
+        self._lock = threading.Lock()
+        components = _registry.setdefault(namespace, {})
+        if name in components:
+            raise ValueError(f"Component {name} is already registered in {namespace}")
+        components[name] = self
+
+    @property
+    def loaded(self) -> bool:
+        return self._target is not None
+
+    def get(self) -> Any:
+        """Return the target, initialising it once across threads."""
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    start = time.perf_counter()
+                    target = self._factory()
+                    seconds = time.perf_counter() - start
+                    record_timing(self._name, seconds, self._namespace)
+                    logger.info(f"Initialised {self._namespace}.{self._name} in {seconds:.2f}s")
+                    self._target = target
+        return self._target
+
+    async def get_async(self) -> Any:
+        """Like ``get``, but an initialisation runs in a worker thread."""
+        if self._target is not None:
+            return self._target
+        return await asyncio.to_thread(self.get)
+
+    def __getattr__(self, attr: str) -> Any:
+        return getattr(self.get(), attr)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self.loaded else "not loaded"
+        return f"<Lazy {self._namespace}.{self._name} ({state})>"
+
+
+async def resolve(component: Any) -> Any:
+    """The target of a ``Lazy`` proxy, loaded off the event loop; anything else as is."""
+    if isinstance(component, Lazy):
+        return await component.get_async()
+    return component
+
+
+def record_timing(name: str, seconds: float, namespace: str):
+    """Record the duration of a startup step that is not a lazy component."""
+    _timings.setdefault(namespace, {})[name] = seconds
+
+
+def warm_up(namespace: str, names: Optional[Iterable[str]] = None) -> Dict[str, float]:
+    """Initialise the named components of ``namespace`` (all registered ones by default)."""
+    components = _registry.get(namespace, {})
+    for name in names or list(components):
+        if name not in components:
+            raise KeyError(f"Unknown component: {name}")
+        components[name].get()
+    return startup_timings(namespace)
+
+
+def component_status(namespace: str) -> Dict[str, bool]:
+    """Whether each component registered in ``namespace`` has been initialised."""
+    return {name: proxy.loaded for name, proxy in _registry.get(namespace, {}).items()}
+
+
+def startup_timings(namespace: str) -> Dict[str, float]:
+    return {name: round(seconds, 3) for name, seconds in _timings.get(namespace, {}).items()}
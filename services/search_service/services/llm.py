@@ -3,6 +3,7 @@ import json
 from typing import Dict, List
 import logging
 from app.core.config import settings
+from services.tracing import traced
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +12,7 @@ class LLMService:
         self.base_url = settings.OLLAMA_BASE_URL
         self.model = settings.OLLAMA_MODEL
 
+    @traced("llm.generate")
     async def _generate(self, prompt: str) -> str:
         """Generate text using Ollama."""
         async with aiohttp.ClientSession() as session:
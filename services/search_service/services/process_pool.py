@@ -0,0 +1,134 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Worker processes for CPU-bound work; defaults to all cores but one
+PROCESS_POOL_WORKERS = int(os.getenv("PROCESS_POOL_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+# Tasks per worker before the pool is replaced, bounding leaks and fragmentation
+PROCESS_POOL_MAX_TASKS = int(os.getenv("PROCESS_POOL_MAX_TASKS", "200"))
+
+
+def _call(fn: Callable, args: tuple, kwargs: dict, submitted: float):
+    """Run ``fn`` in a worker and report how long the task waited in the queue."""
+    return time.time() - submitted, fn(*args, **kwargs)
+
+
+class ProcessPool:
+    """Process pool with an async API for CPU-bound work that would block the event loop.
+
+    Workers are started with ``spawn`` on first use in each process, so a
+    pre-forking server never shares a pool between workers. After
+    ``max_tasks_per_child`` tasks per worker the whole pool is replaced; tasks
+    already submitted finish on the old workers. (The executor's own
+    ``max_tasks_per_child`` deadlocks under load on Python 3.11.) Arguments and
+    results are pickled, so only work that outweighs the copy is worth sending here.
+    """
+
+    def __init__(self, max_workers: int = PROCESS_POOL_WORKERS, max_tasks_per_child: Optional[int] = PROCESS_POOL_MAX_TASKS):
+        self.max_workers = max_workers
+        self.max_tasks_per_child = max_tasks_per_child
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._pid: Optional[int] = None
+        self._generation_tasks = 0
+        self._recycled = 0
+        self._lock = threading.Lock()
+
+        self._in_flight = 0
+        self._max_in_flight = 0
+        self._tasks = 0
+        self._errors = 0
+        self._total_ms = 0.0
+        self._max_ms = 0.0
+        self._wait_ms = 0.0
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid() and self.max_tasks_per_child \
+                    and self._generation_tasks >= self.max_tasks_per_child * self.max_workers:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+                self._recycled += 1
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.max_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+                self._pid = os.getpid()
+                self._generation_tasks = 0
+            self._generation_tasks += 1
+            return self._executor
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a picklable module-level function in a worker process."""
+        executor = self._get_executor()
+        with self._lock:
+            self._in_flight += 1
+            self._max_in_flight = max(self._max_in_flight, self._in_flight)
+
+        start = time.perf_counter()
+        try:
+            wait, result = await asyncio.get_running_loop().run_in_executor(
+                executor, _call, fn, args, kwargs, time.time()
+            )
+        except BrokenProcessPool:
+            # A worker died; start a fresh pool for the next task
+            logger.error("Process pool broke; restarting it")
+            with self._lock:
+                self._errors += 1
+                if self._executor is executor:
+                    self._executor = None
+            raise
+        except Exception:
+            with self._lock:
+                self._errors += 1
+            raise
+        finally:
+            elapsed = 1000 * (time.perf_counter() - start)
+            with self._lock:
+                self._in_flight -= 1
+                self._total_ms += elapsed
+                self._max_ms = max(self._max_ms, elapsed)
+
+        with self._lock:
+            self._tasks += 1
+            self._wait_ms += 1000 * wait
+        return result
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth and task latency; ``queued`` above zero means the pool is saturated."""
+        with self._lock:
+            finished = self._tasks + self._errors
+            return {
+                "workers": self.max_workers,
+                "in_flight": self._in_flight,
+                "queued": max(0, self._in_flight - self.max_workers),
+                "max_in_flight": self._max_in_flight,
+                "tasks": self._tasks,
+                "errors": self._errors,
+                "avg_ms": round(self._total_ms / finished, 2) if finished else 0.0,
+                "max_ms": round(self._max_ms, 2),
+                "avg_wait_ms": round(self._wait_ms / self._tasks, 2) if self._tasks else 0.0,
+                "recycled": self._recycled,
+            }
+
+    def shutdown(self):
+        """Stop the workers, discarding queued tasks."""
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Initialize the shared process pool (workers start on first use)
+process_pool = ProcessPool()
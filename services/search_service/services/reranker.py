@@ -0,0 +1,114 @@
+from typing import Dict, List, Optional, Tuple
+import asyncio
+import logging
+import threading
+import time
+from .tracing import traced
+
+logger = logging.getLogger(__name__)
+
+class Reranker:
+    """Cross-encoder reranking of vector-search candidates under a latency budget."""
+
+    def __init__(
+        self,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        batch_size: int = 16,
+        budget_ms: float = 200.0,
+        max_length: int = 512
+    ):
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        # Running estimate of cross-encoder cost per candidate, used to size batches to the remaining budget
+        self._ms_per_candidate: Optional[float] = None
+
+        self._stats_lock = threading.Lock()
+        self._stats = {
+            "calls": 0,
+            "candidates_scored": 0,
+            "budget_exceeded": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0
+        }
+
+    @traced("rerank", size=("candidates", lambda result: len(result[0])))
+    def rerank(
+        self,
+        query: str,
+        candidates: List[str],
+        top_k: Optional[int] = None,
+        budget_ms: Optional[float] = None
+    ) -> Tuple[List[int], float]:
+        """Order candidate texts by cross-encoder relevance to the query.
+
+        Candidates must arrive in vector order. They are scored in batches until
+        the budget runs out; the scored prefix is reordered and the unscored
+        remainder keeps its vector order. Batches are shrunk to what the
+        remaining budget fits at the measured cost per candidate, so a single
+        batch overruns the budget only by the error of that estimate. Returns
+        candidate indices and the time spent in milliseconds.
+
+        Blocks for the whole scoring; async callers use ``rerank_async``.
+        """
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        start = time.perf_counter()
+        scores: List[float] = []
+
+        while len(scores) < len(candidates):
+            remaining_ms = budget_ms - (time.perf_counter() - start) * 1000
+            size = self.batch_size
+            if self._ms_per_candidate:
+                size = min(size, int(remaining_ms / self._ms_per_candidate))
+            if remaining_ms <= 0 or size < 1:
+                break
+            batch = candidates[len(scores):len(scores) + size]
+            batch_start = time.perf_counter()
+            scores.extend(float(s) for s in self.model.predict([(query, text) for text in batch]))
+            cost = (time.perf_counter() - batch_start) * 1000 / len(batch)
+            self._ms_per_candidate = cost if self._ms_per_candidate is None else 0.8 * self._ms_per_candidate + 0.2 * cost
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        exceeded = len(scores) < len(candidates)
+
+        order = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        order.extend(range(len(scores), len(candidates)))
+        if top_k is not None:
+            order = order[:top_k]
+
+        self._record(len(scores), elapsed_ms, exceeded)
+        if exceeded:
+            logger.warning(
+                f"Rerank budget of {budget_ms:.0f} ms exceeded after {len(scores)}/{len(candidates)} candidates"
+            )
+        else:
+            logger.debug(f"Reranked {len(candidates)} candidates in {elapsed_ms:.1f} ms")
+        return order, elapsed_ms
+
+    async def rerank_async(
+        self,
+        query: str,
+        candidates: List[str],
+        top_k: Optional[int] = None,
+        budget_ms: Optional[float] = None
+    ) -> Tuple[List[int], float]:
+        """``rerank`` in a worker thread, keeping the event loop free while the cross-encoder runs."""
+        return await asyncio.to_thread(self.rerank, query, candidates, top_k, budget_ms)
+
+    def stats(self) -> Dict[str, float]:
+        """Cumulative rerank latency and budget statistics."""
+        with self._stats_lock:
+            stats = dict(self._stats)
+        stats["avg_ms"] = stats["total_ms"] / stats["calls"] if stats["calls"] else 0.0
+        stats["ms_per_candidate"] = self._ms_per_candidate or 0.0
+        return stats
+
+    def _record(self, scored: int, elapsed_ms: float, exceeded: bool):
+        with self._stats_lock:
+            self._stats["calls"] += 1
+            self._stats["candidates_scored"] += scored
+            self._stats["budget_exceeded"] += int(exceeded)
+            self._stats["total_ms"] += elapsed_ms
+            self._stats["max_ms"] = max(self._stats["max_ms"], elapsed_ms)
@@ -0,0 +1,376 @@
+"""Per-request stage timing, exported as Prometheus metrics and Server-Timing headers.
+
+With TRACING_ENABLED unset, ``traced`` returns functions unchanged and no
+middleware or SQLAlchemy listeners are installed, so the only cost left is
+the /metrics route.
+
+Metrics live in each process. With PROMETHEUS_MULTIPROC_DIR set, every worker
+also writes its metrics to that directory and /metrics adds up all of them,
+so a scrape answered by any worker covers the whole server.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import asyncio
+import atexit
+import functools
+import glob
+import json
+import os
+import threading
+import time
+from dotenv import load_dotenv
+
+load_dotenv()
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "false").lower() == "true"
+# Also return each request's stage timings in a Server-Timing response header
+SERVER_TIMING_ENABLED = os.getenv("SERVER_TIMING", "false").lower() == "true"
+# Directory where worker processes share their metrics; unset keeps them per process
+METRICS_MULTIPROC_DIR = os.getenv("PROMETHEUS_MULTIPROC_DIR") or None
+# Seconds between writes of a worker's metrics to METRICS_MULTIPROC_DIR
+METRICS_SYNC_INTERVAL = float(os.getenv("METRICS_SYNC_INTERVAL", "5"))
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class MetricsRegistry:
+    """Thread-safe counters and histograms rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, List[float]]] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}
+
+    def describe(self, name: str, kind: str, text: str):
+        self._help[name] = (kind, text)
+
+    def inc(self, name: str, labels: Labels, amount: float = 1.0):
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[labels] = series.get(labels, 0.0) + amount
+
+    def observe(self, name: str, labels: Labels, value: float):
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            # Bucket counts, then sum and count
+            values = series.get(labels)
+            if values is None:
+                values = series[labels] = [0.0] * (len(BUCKETS) + 2)
+            for i, bound in enumerate(BUCKETS):
+                if value <= bound:
+                    values[i] += 1
+            values[-2] += value
+            values[-1] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Counters and histograms as JSON-serialisable data, for ``merge``."""
+        with self._lock:
+            return {
+                kind: {name: [[list(labels), value] for labels, value in series.items()] for name, series in source.items()}
+                for kind, source in (("counters", self._counters), ("histograms", self._histograms))
+            }
+
+    def merge(self, snapshot: Dict[str, Any]):
+        """Add the counts of another registry's ``snapshot``."""
+        with self._lock:
+            for name, entries in snapshot.get("counters", {}).items():
+                series = self._counters.setdefault(name, {})
+                for labels, value in entries:
+                    labels = tuple(tuple(pair) for pair in labels)
+                    series[labels] = series.get(labels, 0.0) + value
+            for name, entries in snapshot.get("histograms", {}).items():
+                series = self._histograms.setdefault(name, {})
+                for labels, values in entries:
+                    labels = tuple(tuple(pair) for pair in labels)
+                    current = series.setdefault(labels, [0.0] * (len(BUCKETS) + 2))
+                    for i, value in enumerate(values):
+                        current[i] += value
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def render(self) -> str:
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                lines.extend(self._header(name, "counter"))
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value:g}")
+            for name, series in sorted(self._histograms.items()):
+                lines.extend(self._header(name, "histogram"))
+                for labels, values in sorted(series.items()):
+                    for bound, count in zip(BUCKETS, values):
+                        lines.append(f"{name}_bucket{_format_labels(labels + (('le', f'{bound:g}'),))} {count:g}")
+                    lines.append(f"{name}_bucket{_format_labels(labels + (('le', '+Inf'),))} {values[-1]:g}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {values[-2]:.6f}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {values[-1]:g}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, name: str, kind: str) -> List[str]:
+        kind, text = self._help.get(name, (kind, ""))
+        return [f"# HELP {name} {text}", f"# TYPE {name} {kind}"]
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        key + '="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for key, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+metrics = MetricsRegistry()
+metrics.describe("pensionos_stage_seconds", "histogram", "Duration of an instrumented stage")
+metrics.describe("pensionos_stage_errors_total", "counter", "Exceptions raised inside a stage")
+metrics.describe("pensionos_stage_items_total", "counter", "Items processed by a stage (vectors, rows, tokens, ...)")
+metrics.describe("pensionos_http_request_seconds", "histogram", "HTTP request duration by route and status")
+
+# Process whose metrics the sync thread writes to METRICS_MULTIPROC_DIR
+_sync_pid: Optional[int] = None
+_sync_lock = threading.Lock()
+
+
+def _snapshot_path(pid: Any) -> str:
+    return os.path.join(METRICS_MULTIPROC_DIR, f"metrics_{pid}.json")
+
+
+def write_snapshot():
+    """Write this process's metrics to METRICS_MULTIPROC_DIR, replacing its previous file."""
+    path = _snapshot_path(os.getpid())
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(metrics.snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+def _sync_forever():
+    while True:
+        time.sleep(METRICS_SYNC_INTERVAL)
+        try:
+            write_snapshot()
+        except OSError:
+            pass
+
+
+def _ensure_sync():
+    """Start writing this process's metrics to METRICS_MULTIPROC_DIR, once per process."""
+    global _sync_pid
+    if METRICS_MULTIPROC_DIR is None or _sync_pid == os.getpid():
+        return
+    with _sync_lock:
+        if _sync_pid == os.getpid():
+            return
+        os.makedirs(METRICS_MULTIPROC_DIR, exist_ok=True)
+        threading.Thread(target=_sync_forever, name="metrics-sync", daemon=True).start()
+        atexit.register(write_snapshot)
+        _sync_pid = os.getpid()
+
+
+def render_metrics() -> str:
+    """Prometheus text for this process, plus every other worker's with METRICS_MULTIPROC_DIR."""
+    if METRICS_MULTIPROC_DIR is None:
+        return metrics.render()
+    _ensure_sync()
+    combined = MetricsRegistry()
+    combined._help = metrics._help
+    combined.merge(metrics.snapshot())
+    own = _snapshot_path(os.getpid())
+    for path in glob.glob(_snapshot_path("*")):
+        if path == own:
+            continue
+        try:
+            with open(path) as f:
+                combined.merge(json.load(f))
+        except (OSError, ValueError):
+            # Removed or replaced while reading; the next scrape picks it up
+            continue
+    return combined.render()
+
+
+# A forked worker starts from zero instead of re-exporting what the master recorded
+os.register_at_fork(after_in_child=metrics.clear)
+
+# Stage timings of the current request, collected for the Server-Timing header
+_spans: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("tracing_spans", default=None)
+
+
+def record_stage(stage: str, seconds: float, error: Optional[BaseException] = None):
+    """Record one stage duration, and its error if it failed."""
+    metrics.observe("pensionos_stage_seconds", (("stage", stage),), seconds)
+    if error is not None:
+        record_error(stage, error)
+    spans = _spans.get()
+    if spans is not None:
+        spans.append((stage, seconds))
+
+
+def record_size(stage: str, unit: str, amount: float):
+    """Count items handled by a stage, e.g. ``record_size("llm.query", "tokens", 812)``."""
+    if TRACING_ENABLED and amount:
+        metrics.inc("pensionos_stage_items_total", (("stage", stage), ("unit", unit)), amount)
+
+
+def record_error(stage: str, error: BaseException):
+    """Count an error in a stage, including ones a handler later turns into a response."""
+    if TRACING_ENABLED:
+        metrics.inc("pensionos_stage_errors_total", (("stage", stage), ("error", type(error).__name__)))
+
+
+@contextmanager
+def span(stage: str):
+    """Time a block as ``stage``."""
+    if not TRACING_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    except BaseException as e:
+        record_stage(stage, time.perf_counter() - start, e)
+        raise
+    record_stage(stage, time.perf_counter() - start)
+
+
+def traced(stage: Optional[str] = None, size: Optional[Tuple[str, Callable[[Any], float]]] = None):
+    """Decorator timing a function (sync or async) as ``stage``.
+
+    ``size`` is a ``(unit, fn)`` pair; ``fn(result)`` gives the number of
+    units the call produced, e.g. ``("vectors", len)``.
+    """
+    def decorator(fn):
+        if not TRACING_ENABLED:
+            return fn
+        name = stage or fn.__qualname__
+
+        def finish(start: float, result=None, error: Optional[BaseException] = None):
+            record_stage(name, time.perf_counter() - start, error)
+            if size is not None and error is None:
+                try:
+                    record_size(name, size[0], size[1](result))
+                except Exception:
+                    pass
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = await fn(*args, **kwargs)
+                except BaseException as e:
+                    finish(start, error=e)
+                    raise
+                finish(start, result)
+                return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                finish(start, error=e)
+                raise
+            finish(start, result)
+            return result
+        return wrapper
+    return decorator
+
+
+def _route_path(scope) -> str:
+    """The matched route template (``/pension-plans/{plan_id}``), keeping label cardinality bounded."""
+    from starlette.routing import Match
+
+    app = scope.get("app")
+    for route in getattr(app, "routes", []):
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return getattr(route, "path", scope["path"])
+    return "unmatched"
+
+
+def _server_timing(spans: List[Tuple[str, float]], total: float) -> str:
+    totals: Dict[str, float] = {}
+    for stage, seconds in spans:
+        totals[stage] = totals.get(stage, 0.0) + seconds
+    entries = [f"{stage};dur={1000 * seconds:.1f}" for stage, seconds in totals.items()]
+    entries.append(f"total;dur={1000 * total:.1f}")
+    return ", ".join(entries)
+
+
+class TracingMiddleware:
+    """ASGI middleware recording request durations and collecting stage spans."""
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING_ENABLED):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        _ensure_sync()
+        spans: List[Tuple[str, float]] = []
+        token = _spans.set(spans)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    header = _server_timing(spans, time.perf_counter() - start)
+                    message["headers"] = list(message.get("headers", [])) + [(b"server-timing", header.encode())]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            labels = (("method", scope["method"]), ("route", _route_path(scope)), ("status", str(status)))
+            metrics.observe("pensionos_http_request_seconds", labels, time.perf_counter() - start)
+            _spans.reset(token)
+
+
+def instrument_app(app):
+    """Add the tracing middleware (when enabled) and a /metrics endpoint."""
+    from fastapi.responses import PlainTextResponse
+
+    if TRACING_ENABLED:
+        app.add_middleware(TracingMiddleware)
+
+    async def metrics_endpoint():
+        return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
+
+
+def instrument_engine(engine, stage: str = "db.query"):
+    """Time every SQL statement run through a SQLAlchemy engine and count returned rows."""
+    if not TRACING_ENABLED:
+        return
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("tracing_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        record_stage(stage, time.perf_counter() - conn.info["tracing_start"].pop())
+        record_size(stage, "rows", max(cursor.rowcount, 0))
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        starts = context.connection.info.get("tracing_start") if context.connection is not None else None
+        if starts:
+            record_stage(stage, time.perf_counter() - starts.pop(), context.original_exception)
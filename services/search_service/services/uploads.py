@@ -0,0 +1,84 @@
+from typing import BinaryIO, Optional
+import hashlib
+import io
+import os
+import tempfile
+from dotenv import load_dotenv
+from .tracing import span
+
+load_dotenv()
+
+# Upload bytes held in memory before the spool moves to a temporary file
+UPLOAD_SPOOL_MAX_MEMORY = int(os.getenv("UPLOAD_SPOOL_MAX_MEMORY", str(1024 * 1024)))
+# Directory for spooled uploads; the system temp directory when unset
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+# Bytes read from the request per step
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+# Larger uploads are rejected while streaming; 0 disables the limit
+UPLOAD_MAX_BYTES = int(os.getenv("UPLOAD_MAX_BYTES", str(100 * 1024 * 1024)))
+
+
+class UploadTooLarge(Exception):
+    """The upload exceeded UPLOAD_MAX_BYTES."""
+
+
+class SpooledUpload:
+    """An uploaded file copied into a spooled temporary file, with its size and SHA-256.
+
+    Small uploads stay in memory; anything over UPLOAD_SPOOL_MAX_MEMORY is
+    on disk, so holding one costs at most that much memory whatever the file
+    size. Use it as a context manager so the spool is removed afterwards.
+    """
+
+    def __init__(self, file: BinaryIO, size: int, sha256: str, filename: Optional[str] = None, content_type: Optional[str] = None):
+        self.file = file
+        self.size = size
+        self.sha256 = sha256
+        self.filename = filename
+        self.content_type = content_type
+
+    def open(self) -> BinaryIO:
+        """The spooled bytes, rewound, for parsers that take a file handle."""
+        self.file.seek(0)
+        return self.file
+
+    def read_text(self, encoding: str = "utf-8") -> str:
+        """Decode the upload straight from the spool, without an intermediate bytes copy."""
+        reader = io.TextIOWrapper(self.open(), encoding=encoding)
+        try:
+            return reader.read()
+        finally:
+            # Leave the spool open; closing the wrapper would close it too
+            reader.detach()
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self) -> "SpooledUpload":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+async def spool_upload(upload, max_bytes: int = UPLOAD_MAX_BYTES) -> SpooledUpload:
+    """Stream a FastAPI ``UploadFile`` into a spooled temporary file, hashing it on the way.
+
+    Raises UploadTooLarge as soon as more than ``max_bytes`` have been read.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_MAX_MEMORY, dir=UPLOAD_SPOOL_DIR)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with span("upload.spool"):
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if max_bytes and size > max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+                digest.update(chunk)
+                spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return SpooledUpload(spool, size, digest.hexdigest(), upload.filename, upload.content_type)
@@ -0,0 +1,128 @@
+from typing import Iterable, Iterator, Optional, Set
+import hashlib
+import os
+import tempfile
+import time
+import zlib
+
+try:
+    import zstandard
+except ImportError:  # zstd is optional; zlib is used without it
+    zstandard = None
+
+CODECS = ("zstd", "zlib", "none")
+_EXTENSIONS = {"zstd": ".zst", "zlib": ".zz", "none": ".bin"}
+
+
+class BlobStore:
+    """Local content-addressed store for large immutable bodies (e.g. parsed document text).
+
+    Blobs are keyed by the SHA-256 of their uncompressed bytes, so identical
+    bodies are stored once. Each blob is compressed with ``compression``
+    (zstd when installed, else zlib) and written atomically under a two-level
+    fan-out directory; the codec is part of the file name, so the setting
+    can change without rewriting existing blobs.
+    """
+
+    def __init__(self, path: str, compression: str = "zstd", level: int = 3):
+        if compression not in CODECS:
+            raise ValueError(f"Unsupported blob compression: {compression}")
+        if compression == "zstd" and zstandard is None:
+            compression = "zlib"
+        self.path = path
+        self.compression = compression
+        self.level = level
+        os.makedirs(path, exist_ok=True)
+
+    def _file(self, key: str, compression: str) -> str:
+        return os.path.join(self.path, key[:2], key[2:4], key + _EXTENSIONS[compression])
+
+    def _find(self, key: str) -> Optional[str]:
+        for compression in CODECS:
+            path = self._file(key, compression)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put(self, data: bytes) -> str:
+        """Store ``data`` and return its key; storing the same bytes twice is a no-op."""
+        key = hashlib.sha256(data).hexdigest()
+        existing = self._find(key)
+        if existing is not None:
+            # Refresh the mtime so pruning by age cannot remove a blob that is being referenced again
+            os.utime(existing)
+            return key
+
+        if self.compression == "zstd":
+            payload = zstandard.ZstdCompressor(level=self.level).compress(data)
+        elif self.compression == "zlib":
+            payload = zlib.compress(data, min(self.level, 9))
+        else:
+            payload = data
+
+        path = self._file(key, self.compression)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temporary file and rename, so readers never see a partial blob
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path))
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        return key
+
+    def get(self, key: str) -> bytes:
+        """The full uncompressed blob; raises KeyError for unknown keys."""
+        return b"".join(self.stream(key))
+
+    def stream(self, key: str, chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+        """Yield the uncompressed blob in chunks without holding it in memory."""
+        path = self._find(key)
+        if path is None:
+            raise KeyError(key)
+        with open(path, "rb") as f:
+            if path.endswith(_EXTENSIONS["zstd"]):
+                if zstandard is None:
+                    raise RuntimeError(f"Blob {key} is zstd-compressed but zstandard is not installed")
+                yield from zstandard.ZstdDecompressor().read_to_iter(f, read_size=chunk_size, write_size=chunk_size)
+            elif path.endswith(_EXTENSIONS["zlib"]):
+                decompressor = zlib.decompressobj()
+                while chunk := f.read(chunk_size):
+                    yield decompressor.decompress(chunk)
+                yield decompressor.flush()
+            else:
+                while chunk := f.read(chunk_size):
+                    yield chunk
+
+    def __contains__(self, key: str) -> bool:
+        return self._find(key) is not None
+
+    def delete(self, key: str):
+        path = self._find(key)
+        if path is not None:
+            os.unlink(path)
+
+    def keys(self) -> Iterator[str]:
+        for _, _, files in os.walk(self.path):
+            for name in files:
+                key, extension = os.path.splitext(name)
+                if extension in _EXTENSIONS.values():
+                    yield key
+
+    def prune(self, live_keys: Iterable[str], min_age: float = 3600.0) -> int:
+        """Delete unreferenced blobs; returns how many were removed.
+
+        Blobs younger than ``min_age`` seconds are kept, since an upload writes
+        its blob before committing the row that references it.
+        """
+        live: Set[str] = set(live_keys)
+        cutoff = time.time() - min_age
+        removed = 0
+        for key in list(self.keys()):
+            path = self._find(key)
+            if key not in live and path is not None and os.path.getmtime(path) < cutoff:
+                os.unlink(path)
+                removed += 1
+        return removed
@@ -0,0 +1,200 @@
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Set, Tuple
+import gzip
+import json
+import math
+import os
+import re
+import threading
+
+# Compound tokens such as "pn-2023-001", "12.3" or "§12" are kept whole and
+# also split into their parts, so exact identifiers and their pieces both match
+TOKEN_PATTERN = re.compile(r"[§\w]+(?:[./-][§\w]+)*")
+PART_PATTERN = re.compile(r"[./-]")
+SECTION_SPACE_PATTERN = re.compile(r"§\s+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase BM25 terms."""
+    text = SECTION_SPACE_PATTERN.sub("§", (text or "").lower())
+    tokens = []
+    for token in TOKEN_PATTERN.findall(text):
+        tokens.append(token)
+        parts = PART_PATTERN.split(token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part)
+    return tokens
+
+
+def reciprocal_rank_fusion(
+    rankings: Sequence[Sequence[str]],
+    k: int = 60,
+    weights: Optional[Sequence[float]] = None
+) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists into one ranking by reciprocal rank fusion."""
+    weights = weights or [1.0] * len(rankings)
+    scores: Dict[str, float] = {}
+    for ranking, weight in zip(rankings, weights):
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + weight / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class BM25Index:
+    """In-memory BM25 inverted index persisted as a gzip snapshot plus an append-only journal.
+
+    Every add/remove is appended to the journal; the snapshot is rewritten and
+    the journal truncated once ``compact_every`` operations have accumulated.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+        compact_every: int = 1000
+    ):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.compact_every = compact_every
+
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._doc_terms: Dict[str, Dict[str, int]] = {}
+        self._doc_lengths: Dict[str, int] = {}
+        self._total_length = 0
+        self._journal_size = 0
+        self._lock = threading.RLock()
+
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+
+    @property
+    def _snapshot_path(self) -> str:
+        return os.path.join(self.path, "snapshot.json.gz")
+
+    @property
+    def _journal_path(self) -> str:
+        return os.path.join(self.path, "journal.jsonl")
+
+    def __len__(self) -> int:
+        return len(self._doc_terms)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._doc_terms
+
+    def ids(self) -> Set[str]:
+        with self._lock:
+            return set(self._doc_terms)
+
+    def add(self, doc_id: str, text: str):
+        """Index a document, replacing any previous version with the same id."""
+        with self._lock:
+            terms = dict(Counter(tokenize(text)))
+            self._apply_add(doc_id, terms)
+            self._journal({"op": "add", "id": doc_id, "terms": terms})
+
+    def add_many(self, documents: Iterable[Tuple[str, str]]):
+        """Index many (doc_id, text) pairs and write a fresh snapshot."""
+        with self._lock:
+            for doc_id, text in documents:
+                self._apply_add(doc_id, dict(Counter(tokenize(text))))
+            self.save()
+
+    def remove(self, doc_id: str):
+        """Remove a document from the index if present."""
+        with self._lock:
+            if doc_id not in self._doc_terms:
+                return
+            self._apply_remove(doc_id)
+            self._journal({"op": "remove", "id": doc_id})
+
+    def search(
+        self,
+        query: str,
+        limit: int = 10,
+        candidates: Optional[Iterable[str]] = None
+    ) -> List[Tuple[str, float]]:
+        """Return up to ``limit`` (doc_id, score) pairs ranked by BM25."""
+        with self._lock:
+            if not self._doc_terms:
+                return []
+            allowed = set(candidates) if candidates is not None else None
+            doc_count = len(self._doc_terms)
+            avg_length = self._total_length / doc_count or 1.0
+
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf in postings.items():
+                    if allowed is not None and doc_id not in allowed:
+                        continue
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1) / (tf + norm)
+
+            return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:limit]
+
+    def save(self):
+        """Write a snapshot of the whole index and truncate the journal."""
+        if not self.path:
+            return
+        with self._lock:
+            tmp_path = self._snapshot_path + ".tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+                json.dump({"k1": self.k1, "b": self.b, "docs": self._doc_terms}, f, separators=(",", ":"))
+            os.replace(tmp_path, self._snapshot_path)
+            open(self._journal_path, "w").close()
+            self._journal_size = 0
+
+    def _apply_add(self, doc_id: str, terms: Dict[str, int]):
+        if doc_id in self._doc_terms:
+            self._apply_remove(doc_id)
+        self._doc_terms[doc_id] = terms
+        length = sum(terms.values())
+        self._doc_lengths[doc_id] = length
+        self._total_length += length
+        for term, tf in terms.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+
+    def _apply_remove(self, doc_id: str):
+        terms = self._doc_terms.pop(doc_id)
+        self._total_length -= self._doc_lengths.pop(doc_id)
+        for term in terms:
+            postings = self._postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self._postings[term]
+
+    def _journal(self, entry: Dict):
+        if not self.path:
+            return
+        with open(self._journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+        self._journal_size += 1
+        if self._journal_size >= self.compact_every:
+            self.save()
+
+    def _load(self):
+        if os.path.exists(self._snapshot_path):
+            with gzip.open(self._snapshot_path, "rt", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            for doc_id, terms in snapshot["docs"].items():
+                self._apply_add(doc_id, terms)
+
+        if os.path.exists(self._journal_path):
+            with open(self._journal_path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A torn final line from a crash mid-write
+                        continue
+                    if entry["op"] == "add":
+                        self._apply_add(entry["id"], entry["terms"])
+                    elif entry["id"] in self._doc_terms:
+                        self._apply_remove(entry["id"])
+                    self._journal_size += 1
@@ -1,15 +1,35 @@
 from chromadb import Client, Settings
-from typing import List, Dict, Optional
+from typing import Any, List, Dict, Optional
+import logging
+import threading
 import chromadb
+from services.tracing import traced
+
+logger = logging.getLogger(__name__)
 
 class ChromaStore:
-    def __init__(self, persist_directory: str = "./chroma_db"):
+    def __init__(
+        self,
+        persist_directory: str = "./chroma_db",
+        batch_size: int = 256,
+        flush_interval: Optional[float] = 1.0,
+        max_attempts: int = 3
+    ):
         self.client = chromadb.PersistentClient(path=persist_directory)
         self.collection = self.client.get_or_create_collection(
             name="documents",
             metadata={"hnsw:space": "cosine"}
         )
 
+        # Buffered writes, keyed by id so repeated writes collapse into one
+        self.batch_size = min(batch_size, self.client.get_max_batch_size())
+        self.flush_interval = flush_interval
+        # Failed flushes an entry survives before it is dropped (and logged)
+        self.max_attempts = max_attempts
+        self._pending: Dict[str, Dict] = {}
+        self._lock = threading.RLock()
+        self._timer: Optional[threading.Timer] = None
+
     def add_documents(
         self,
         documents: List[str],
@@ -25,25 +45,211 @@ class ChromaStore:
             ids=ids
         )
 
+    def upsert_documents(
+        self,
+        documents: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict],
+        ids: List[str]
+    ):
+        """Insert documents, replacing any existing entries with the same IDs."""
+        self.collection.upsert(
+            documents=documents,
+            embeddings=embeddings,
+            metadatas=metadatas,
+            ids=ids
+        )
+
+    def buffer_add(
+        self,
+        documents: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict],
+        ids: List[str]
+    ):
+        """Queue documents to be added on the next flush."""
+        self._buffer("add", documents, embeddings, metadatas, ids)
+
+    def buffer_upsert(
+        self,
+        documents: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict],
+        ids: List[str]
+    ):
+        """Queue documents to be upserted on the next flush."""
+        self._buffer("upsert", documents, embeddings, metadatas, ids)
+
+    def _buffer(
+        self,
+        operation: str,
+        documents: List[str],
+        embeddings: List[List[float]],
+        metadatas: List[Dict],
+        ids: List[str]
+    ):
+        """Record pending writes and flush once a full batch has accumulated."""
+        with self._lock:
+            for doc_id, document, embedding, metadata in zip(ids, documents, embeddings, metadatas):
+                # The latest write for an id wins; an upsert is never downgraded to an add
+                previous = self._pending.pop(doc_id, None)
+                if previous is not None and previous["operation"] == "upsert":
+                    operation_for_id = "upsert"
+                else:
+                    operation_for_id = operation
+                self._pending[doc_id] = {
+                    "operation": operation_for_id,
+                    "document": document,
+                    "embedding": embedding,
+                    "metadata": metadata,
+                    "attempts": 0
+                }
+
+            if len(self._pending) >= self.batch_size:
+                # Buffered writes are asynchronous to the caller; failures are logged and retried
+                self._try_flush()
+            else:
+                self._schedule_flush()
+
+    def _schedule_flush(self):
+        """Flush after ``flush_interval`` seconds unless a flush is already scheduled."""
+        if self.flush_interval and self._timer is None:
+            self._timer = threading.Timer(self.flush_interval, self._try_flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _try_flush(self):
+        """Flush where a failed write must not fail the caller: timers, reads and buffering."""
+        try:
+            self.flush()
+        except Exception:
+            # flush() logged the error and kept the entries for a bounded number of retries
+            pass
+
+    @traced("chroma.flush")
+    def flush(self):
+        """Write all pending adds and upserts to ChromaDB in batches."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, {}
+
+            written = set()
+            error = None
+            for operation in ("add", "upsert"):
+                items = [(doc_id, entry) for doc_id, entry in pending.items() if entry["operation"] == operation]
+                write = self.collection.add if operation == "add" else self.collection.upsert
+                for start in range(0, len(items), self.batch_size):
+                    batch = items[start:start + self.batch_size]
+                    try:
+                        self._write(write, batch)
+                        written.update(doc_id for doc_id, _ in batch)
+                        continue
+                    except Exception as e:
+                        error = e
+                    if len(batch) > 1:
+                        # Write one at a time so a rejected entry does not hold back the rest
+                        for item in batch:
+                            try:
+                                self._write(write, [item])
+                                written.add(item[0])
+                            except Exception as e:
+                                error = e
+            if error is None:
+                return
+
+            # Put back what was not written, so the next flush retries it, up to max_attempts
+            failed = {doc_id: entry for doc_id, entry in pending.items() if doc_id not in written}
+            retry, dropped = {}, []
+            for doc_id, entry in failed.items():
+                entry["attempts"] += 1
+                if entry["attempts"] < self.max_attempts:
+                    retry[doc_id] = entry
+                else:
+                    dropped.append(doc_id)
+            self._pending = {**retry, **self._pending}
+            logger.error(f"Failed to write {len(failed)} buffered documents to ChromaDB: {str(error)}")
+            if dropped:
+                logger.error(f"Dropped {len(dropped)} documents after {self.max_attempts} failed writes: {dropped}")
+            if self._pending:
+                self._schedule_flush()
+            raise error
+
+    @staticmethod
+    def _write(write, batch):
+        write(
+            ids=[doc_id for doc_id, _ in batch],
+            documents=[entry["document"] for _, entry in batch],
+            embeddings=[entry["embedding"] for _, entry in batch],
+            metadatas=[entry["metadata"] for _, entry in batch]
+        )
+
+    @traced("chroma.search", size=("results", lambda result: len(result["ids"][0])))
     def search(
         self,
         query_embedding: List[float],
-        n_results: int = 5
+        n_results: int = 5,
+        where: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None
     ) -> Dict:
-        """Search for similar documents using the query embedding."""
+        """Search for similar documents using the query embedding.
+
+        ``where`` filters on metadata and ``where_document`` on document text;
+        both are applied inside the index so the top-k is exact for the filter.
+        """
+        self._try_flush()
         results = self.collection.query(
             query_embeddings=[query_embedding],
             n_results=n_results,
+            where=where or None,
+            where_document=where_document or None,
             include=["documents", "metadatas", "distances"]
         )
         return results
 
+    @traced("chroma.get", size=("documents", len))
+    def get_documents(
+        self,
+        ids: List[str],
+        where: Optional[Dict[str, Any]] = None,
+        where_document: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Dict]:
+        """Get documents by ID, keeping only those that match the filters."""
+        self._try_flush()
+        if not ids:
+            return {}
+        result = self.collection.get(
+            ids=ids,
+            where=where or None,
+            where_document=where_document or None,
+            include=["documents", "metadatas"]
+        )
+        return {
+            doc_id: {"document": document, "metadata": metadata}
+            for doc_id, document, metadata in zip(result["ids"], result["documents"], result["metadatas"])
+        }
+
+    @traced("chroma.get")
+    def find_ids(self, where: Dict[str, Any], limit: Optional[int] = None) -> List[str]:
+        """IDs of documents whose metadata matches ``where``."""
+        self._try_flush()
+        return self.collection.get(where=where, limit=limit, include=[])["ids"]
+
+    @traced("chroma.delete")
     def delete_document(self, document_id: str):
-        """Delete a document by its ID."""
+        """Delete a document by its ID, including a write of it still in the buffer."""
+        with self._lock:
+            self._pending.pop(document_id, None)
+        self._try_flush()
         self.collection.delete(ids=[document_id])
 
+    @traced("chroma.get")
     def get_document(self, document_id: str) -> Optional[Dict]:
         """Get a document by its ID."""
+        self._try_flush()
         try:
             result = self.collection.get(ids=[document_id])
             if result["ids"]:
@@ -53,4 +259,17 @@ class ChromaStore:
                 }
         except:
             return None
-        return None 
\ No newline at end of file
+        return None
+
+
+def build_where(equals: Dict[str, Any], where: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+    """Combine equality filters and a raw ``where`` clause into one Chroma filter."""
+    clauses = [{key: value} for key, value in equals.items() if value is not None]
+    if where:
+        # Chroma accepts one key per filter object, so {"a": 1, "b": 2} becomes two clauses
+        clauses.extend({key: value} for key, value in where.items())
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {"$and": clauses}
@@ -1,6 +1,7 @@
 from neo4j import GraphDatabase
 from typing import List, Dict, Optional
 import logging
+from services.tracing import traced
 
 class Neo4jStore:
     def __init__(self, uri: str, username: str, password: str):
@@ -21,6 +22,7 @@ class Neo4jStore:
                 FOR (e:Entity) REQUIRE e.name IS UNIQUE
             """)
 
+    @traced("neo4j.add_document")
     def add_document(self, doc_id: str, title: str, content: str, metadata: Dict):
         """Add a document node to the graph."""
         with self.driver.session() as session:
@@ -31,6 +33,7 @@ class Neo4jStore:
                     d.metadata = $metadata
             """, doc_id=doc_id, title=title, content=content, metadata=metadata)
 
+    @traced("neo4j.add_entity")
     def add_entity(self, name: str, entity_type: str, properties: Dict = None):
         """Add an entity node to the graph."""
         with self.driver.session() as session:
@@ -40,6 +43,7 @@ class Neo4jStore:
                     e.properties = $properties
             """, name=name, type=entity_type, properties=properties or {})
 
+    @traced("neo4j.add_relationship")
     def add_relationship(self, from_id: str, to_name: str, relationship_type: str, properties: Dict = None):
         """Add a relationship between a document and an entity."""
         with self.driver.session() as session:
@@ -52,6 +56,7 @@ class Neo4jStore:
                 relationship_type=relationship_type,
                 properties=properties or {})
 
+    @traced("neo4j.get_document_entities", size=("records", len))
     def get_document_entities(self, doc_id: str) -> List[Dict]:
         """Get all entities connected to a document."""
         with self.driver.session() as session:
@@ -63,6 +68,7 @@ class Neo4jStore:
             """, doc_id=doc_id)
             return [dict(record) for record in result]
 
+    @traced("neo4j.get_entity_documents", size=("records", len))
     def get_entity_documents(self, entity_name: str) -> List[Dict]:
         """Get all documents connected to an entity."""
         with self.driver.session() as session:
@@ -73,6 +79,7 @@ class Neo4jStore:
             """, name=entity_name)
             return [dict(record) for record in result]
 
+    @traced("neo4j.delete_document")
     def delete_document(self, doc_id: str):
         """Delete a document and its relationships."""
         with self.driver.session() as session:
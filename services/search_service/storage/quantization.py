@@ -0,0 +1,65 @@
+from typing import Tuple
+import numpy as np
+
+# Supported on-disk embedding formats and their bytes per dimension. Sign-bit
+# codes (binary_codes) are only a search prefilter: they cannot be unpacked
+# into a usable vector, so they are not a storage format.
+FORMATS = {
+    "float32": 4,
+    "float16": 2,
+    "int8": 1,
+}
+
+# Number of set bits for every byte value, used for Hamming distances
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale vectors (1-D or rows of a 2-D array) to unit length as float32."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+def quantize_int8(vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Symmetric per-vector int8 quantization; returns codes and float32 scales."""
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    scales = np.abs(vectors).max(axis=1) / 127
+    scales[scales == 0] = 1
+    codes = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return codes, scales.astype(np.float32)
+
+
+def binary_codes(vectors: np.ndarray) -> np.ndarray:
+    """Sign-bit hash of each vector, packed eight dimensions per byte."""
+    return np.packbits(np.atleast_2d(vectors) > 0, axis=-1)
+
+
+def hamming_distances(query_code: np.ndarray, codes: np.ndarray) -> np.ndarray:
+    """Hamming distance between one packed code and every row of ``codes``."""
+    return _POPCOUNT[np.bitwise_xor(codes, query_code)].sum(axis=1, dtype=np.int32)
+
+
+def pack_embedding(vector, fmt: str) -> bytes:
+    """Serialise one embedding in one of FORMATS; ``int8`` blobs start with the float32 scale."""
+    vector = np.asarray(vector, dtype=np.float32)
+    if fmt == "float32":
+        return vector.tobytes()
+    if fmt == "float16":
+        return vector.astype(np.float16).tobytes()
+    if fmt == "int8":
+        codes, scales = quantize_int8(vector)
+        return scales.tobytes() + codes.tobytes()
+    raise ValueError(f"Unsupported embedding storage format: {fmt} (expected one of {', '.join(FORMATS)})")
+
+
+def unpack_embedding(blob: bytes, fmt: str) -> np.ndarray:
+    """Deserialise an embedding written by ``pack_embedding`` to float32."""
+    if fmt == "float32":
+        return np.frombuffer(blob, dtype=np.float32).copy()
+    if fmt == "float16":
+        return np.frombuffer(blob, dtype=np.float16).astype(np.float32)
+    if fmt == "int8":
+        scale = np.frombuffer(blob[:4], dtype=np.float32)[0]
+        return np.frombuffer(blob[4:], dtype=np.int8).astype(np.float32) * scale
+    raise ValueError(f"Cannot unpack embedding format: {fmt}")
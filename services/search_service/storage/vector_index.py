@@ -0,0 +1,304 @@
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Tuple
+import json
+import os
+import threading
+import numpy as np
+from .quantization import normalize, quantize_int8, binary_codes, hamming_distances
+
+_DTYPES = {"float32": np.float32, "float16": np.float16, "int8": np.int8}
+# Rows dequantized per step when scoring, bounding the float32 copy to a few MB
+_SCORE_CHUNK = 2048
+# Fewest empty rows a snapshot leaves for vectors added after it is mapped
+_MIN_SPARE_ROWS = 1024
+
+
+class QuantizedVectorIndex:
+    """In-memory cosine index holding unit vectors in float32, float16 or int8.
+
+    Searches over more than ``shortlist`` vectors can run in two stages: a
+    coarse pass over the whole corpus picks a shortlist, which is then rescored
+    against the stored full-dimension vectors. The coarse pass ranks either by
+    Hamming distance between packed sign bits (``binary_prefilter``) or by
+    cosine over the first ``coarse_dim`` components (Matryoshka prefixes);
+    the two are mutually exclusive.
+
+    With ``exact_rescore`` the float32 vectors are kept as well and the
+    shortlist is rescored exactly against them; a plain scan then serves as
+    the coarse pass. Mapped from a snapshot (``load``), only the pages of
+    rescored rows are read, so the float copy stays out of resident memory.
+    Scans dequantize the codes a chunk at a time and apply int8 scales after
+    the dot product, so no full-corpus float copy is made per query.
+    """
+
+    def __init__(
+        self,
+        fmt: str = "int8",
+        binary_prefilter: bool = True,
+        shortlist: int = 200,
+        coarse_dim: Optional[int] = None,
+        exact_rescore: bool = False
+    ):
+        if fmt not in _DTYPES:
+            raise ValueError(f"Unsupported index format: {fmt}")
+        if binary_prefilter and coarse_dim:
+            # Only one coarse pass runs; silently ignoring coarse_dim would hide a misconfiguration
+            raise ValueError("binary_prefilter and coarse_dim are alternative coarse passes; set only one")
+        self.fmt = fmt
+        self.binary_prefilter = binary_prefilter
+        self.shortlist = shortlist
+        self.coarse_dim = coarse_dim
+        self.exact_rescore = exact_rescore
+
+        self._ids: List[Hashable] = []
+        self._rows: Dict[Hashable, int] = {}
+        self._codes: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._bits: Optional[np.ndarray] = None
+        self._coarse_norms: Optional[np.ndarray] = None
+        self._exact: Optional[np.ndarray] = None
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, item_id: Hashable) -> bool:
+        return item_id in self._rows
+
+    @property
+    def dimension(self) -> Optional[int]:
+        return None if self._codes is None else self._codes.shape[1]
+
+    def memory_bytes(self) -> int:
+        """Bytes held by the vector arrays for the stored vectors."""
+        size = len(self._ids)
+        if self._codes is None:
+            return 0
+        total = self._codes[:size].nbytes + self._scales[:size].nbytes + self._coarse_norms[:size].nbytes
+        if self._bits is not None:
+            total += self._bits[:size].nbytes
+        if self._exact is not None and not isinstance(self._exact, np.memmap):
+            total += self._exact[:size].nbytes
+        return total
+
+    def add(self, item_id: Hashable, vector):
+        """Insert or replace one vector."""
+        self.add_many([(item_id, vector)])
+
+    def add_many(self, items: Iterable[Tuple[Hashable, Any]]):
+        """Insert or replace many vectors at once."""
+        items = [(item_id, vector) for item_id, vector in items if vector is not None]
+        if not items:
+            return
+        vectors = normalize(np.array([vector for _, vector in items], dtype=np.float32))
+        codes, scales = self._encode(vectors)
+        bits = binary_codes(vectors) if self.binary_prefilter else None
+        coarse_norms = np.linalg.norm(vectors[:, :self.coarse_dim], axis=1) if self.coarse_dim else scales
+
+        with self._lock:
+            self._reserve(len(self._ids) + len(items), vectors.shape[1])
+            for i, (item_id, _) in enumerate(items):
+                row = self._rows.get(item_id)
+                if row is None:
+                    row = len(self._ids)
+                    self._ids.append(item_id)
+                    self._rows[item_id] = row
+                self._codes[row] = codes[i]
+                self._scales[row] = scales[i]
+                self._coarse_norms[row] = coarse_norms[i]
+                if bits is not None:
+                    self._bits[row] = bits[i]
+                if self._exact is not None:
+                    self._exact[row] = vectors[i]
+
+    def remove(self, item_id: Hashable):
+        """Remove a vector if present, moving the last row into its slot."""
+        with self._lock:
+            row = self._rows.pop(item_id, None)
+            if row is None:
+                return
+            last = len(self._ids) - 1
+            if row != last:
+                moved_id = self._ids[last]
+                self._ids[row] = moved_id
+                self._rows[moved_id] = row
+                self._codes[row] = self._codes[last]
+                self._scales[row] = self._scales[last]
+                self._coarse_norms[row] = self._coarse_norms[last]
+                if self._bits is not None:
+                    self._bits[row] = self._bits[last]
+                if self._exact is not None:
+                    self._exact[row] = self._exact[last]
+            self._ids.pop()
+
+    def search(self, query, k: int = 10, min_score: Optional[float] = None) -> List[Tuple[Hashable, float]]:
+        """Return up to ``k`` (id, cosine similarity) pairs, best first."""
+        with self._lock:
+            size = len(self._ids)
+            if size == 0:
+                return []
+            query = normalize(query)
+
+            shortlist = max(self.shortlist, k)
+            rows = None
+            if size > shortlist:
+                # Coarse pass over the whole corpus, then rescore only the shortlist
+                if self._bits is not None:
+                    coarse = -hamming_distances(binary_codes(query)[0], self._bits[:size])
+                elif self.coarse_dim and self.coarse_dim < len(query):
+                    coarse = self._scores(query, self.coarse_dim)
+                    coarse /= np.where(self._coarse_norms[:size] == 0, 1, self._coarse_norms[:size])
+                elif self._exact is not None:
+                    coarse = self._scores(query)
+                else:
+                    coarse = None
+                if coarse is not None:
+                    rows = np.argpartition(-coarse, shortlist)[:shortlist]
+
+            if rows is None:
+                rows = np.arange(size)
+                scores = self._scores(query) if self._exact is None else self._rescore(rows, query)
+            else:
+                scores = self._rescore(rows, query)
+            top = min(k, len(rows))
+            best = np.argpartition(-scores, top - 1)[:top]
+            best = best[np.argsort(-scores[best])]
+            results = [(self._ids[rows[i]], float(scores[i])) for i in best]
+
+        if min_score is not None:
+            results = [(item_id, score) for item_id, score in results if score >= min_score]
+        return results
+
+    def score(self, query, item_ids: List[Hashable]) -> List[Optional[float]]:
+        """Cosine similarity of the query to specific ids; None for unknown ids."""
+        with self._lock:
+            rows = [self._rows.get(item_id) for item_id in item_ids]
+            known = [row for row in rows if row is not None]
+            if not known:
+                return [None] * len(item_ids)
+            scores = iter(self._rescore(np.array(known), normalize(query)).tolist())
+            return [None if row is None else next(scores) for row in rows]
+
+    def save(self, path: str, spare_rows: Optional[int] = None):
+        """Write the index to ``path`` as .npy arrays plus a JSON id list.
+
+        The arrays end in ``spare_rows`` empty rows (by default a quarter of
+        the size, at least _MIN_SPARE_ROWS). An index mapped by ``load`` fills
+        those in place, so adding vectors copies only the touched pages to
+        the heap rather than every array.
+        """
+        os.makedirs(path, exist_ok=True)
+        with self._lock:
+            size = len(self._ids)
+            capacity = size + (max(_MIN_SPARE_ROWS, size // 4) if spare_rows is None else spare_rows)
+            arrays = {
+                "codes": self._codes, "scales": self._scales, "coarse_norms": self._coarse_norms,
+                "bits": self._bits, "exact": self._exact
+            }
+            for name, array in arrays.items():
+                if array is not None:
+                    # Write beside the old file and rename, so mappings of the old snapshot stay valid
+                    target = os.path.join(path, f"{name}.npy")
+                    out = np.lib.format.open_memmap(
+                        f"{target}.tmp", mode="w+", dtype=array.dtype, shape=(capacity,) + array.shape[1:]
+                    )
+                    out[:size] = array[:size]
+                    out.flush()
+                    del out
+                    os.replace(f"{target}.tmp", target)
+            meta = {
+                "fmt": self.fmt, "ids": self._ids, "binary_prefilter": self._bits is not None,
+                "exact_rescore": self._exact is not None, "coarse_dim": self.coarse_dim
+            }
+            with open(os.path.join(path, "ids.json"), "w") as f:
+                json.dump(meta, f)
+
+    def load(self, path: str, mmap: bool = True) -> bool:
+        """Replace the contents with a snapshot written by ``save``.
+
+        With ``mmap`` the arrays are mapped copy-on-write, so processes that
+        map the same files share their pages until a row is modified.
+        Returns False when there is no usable snapshot at ``path``.
+        """
+        meta_path = os.path.join(path, "ids.json")
+        if not os.path.exists(meta_path):
+            return False
+        with open(meta_path) as f:
+            meta = json.load(f)
+        if (
+            meta["fmt"] != self.fmt
+            or meta["binary_prefilter"] != self.binary_prefilter
+            or meta.get("exact_rescore", False) != self.exact_rescore
+            or meta.get("coarse_dim") != self.coarse_dim
+            or not meta["ids"]
+        ):
+            return False
+
+        mode = "c" if mmap else None
+        optional = {"bits": self.binary_prefilter, "exact": self.exact_rescore}
+        arrays = {
+            name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode=mode)
+            for name in ("codes", "scales", "coarse_norms", "bits", "exact")
+            if optional.get(name, True)
+        }
+        if any(len(array) < len(meta["ids"]) for array in arrays.values()):
+            return False
+        with self._lock:
+            self._ids = list(meta["ids"])
+            self._rows = {item_id: row for row, item_id in enumerate(self._ids)}
+            self._codes, self._scales = arrays["codes"], arrays["scales"]
+            self._coarse_norms = arrays["coarse_norms"]
+            self._bits = arrays.get("bits")
+            self._exact = arrays.get("exact")
+        return True
+
+    def _encode(self, vectors: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        if self.fmt == "int8":
+            return quantize_int8(vectors)
+        return vectors.astype(_DTYPES[self.fmt]), np.ones(len(vectors), dtype=np.float32)
+
+    def _scores(self, query: np.ndarray, dimension: Optional[int] = None, rows: Optional[np.ndarray] = None) -> np.ndarray:
+        """Dot products of ``query`` with the stored codes (all rows, or ``rows``), a chunk at a time."""
+        count = len(self._ids) if rows is None else len(rows)
+        query = query[:dimension]
+        scores = np.empty(count, dtype=np.float32)
+        for start in range(0, count, _SCORE_CHUNK):
+            stop = min(start + _SCORE_CHUNK, count)
+            chunk = slice(start, stop) if rows is None else rows[start:stop]
+            scores[start:stop] = self._codes[chunk, :dimension].astype(np.float32, copy=False) @ query
+            if self.fmt == "int8":
+                # Scaling the scores equals scaling every row first, at a fraction of the work
+                scores[start:stop] *= self._scales[chunk]
+        return scores
+
+    def _rescore(self, rows: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """Full-dimension scores for ``rows``, exact when float vectors are kept."""
+        if self._exact is not None:
+            return self._exact[rows] @ query
+        return self._scores(query, rows=rows)
+
+    def _reserve(self, size: int, dimension: int):
+        """Grow the backing arrays geometrically so appends stay amortised O(1)."""
+        if self._codes is not None:
+            if dimension != self._codes.shape[1]:
+                raise ValueError(f"Expected {self._codes.shape[1]}-dimensional vectors, got {dimension}")
+            if size <= len(self._codes):
+                return
+        capacity = max(size, 2 * (0 if self._codes is None else len(self._codes)), 64)
+        used = len(self._ids)
+
+        codes = np.zeros((capacity, dimension), dtype=_DTYPES[self.fmt])
+        scales = np.ones(capacity, dtype=np.float32)
+        coarse_norms = np.ones(capacity, dtype=np.float32)
+        bits = np.zeros((capacity, (dimension + 7) // 8), dtype=np.uint8) if self.binary_prefilter else None
+        exact = np.zeros((capacity, dimension), dtype=np.float32) if self.exact_rescore else None
+        if self._codes is not None:
+            codes[:used] = self._codes[:used]
+            scales[:used] = self._scales[:used]
+            coarse_norms[:used] = self._coarse_norms[:used]
+            if bits is not None:
+                bits[:used] = self._bits[:used]
+            if exact is not None:
+                exact[:used] = self._exact[:used]
+        self._codes, self._scales, self._bits = codes, scales, bits
+        self._coarse_norms = coarse_norms
+        self._exact = exact
@@ -15,7 +15,7 @@ Description: ${plan.description}
 ${
   plan.documents
     ? `Related Documents: ${plan.documents
-        .map((doc: any) => doc.content)
+        .map((doc: any) => doc.summary)
         .join("\n")}`
     : ""
 }
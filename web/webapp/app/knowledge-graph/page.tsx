@@ -50,6 +50,33 @@ interface SearchResult {
   metadata?: Record<string, any>;
 }
 
+// Maximum number of nodes requested per graph page
+const GRAPH_PAGE_SIZE = 500;
+
+interface ColumnarGraph {
+  nodes: { id: string[]; x: number[]; y: number[]; community: number[]; degree: number[] };
+  edges: { source: string[]; target: string[]; relationship: string[]; weight: number[] };
+  metadata: GraphData['metadata'];
+}
+
+// Expand the columnar graph encoding into React Flow nodes and edges
+const columnarToGraphData = ({ nodes, edges, metadata }: ColumnarGraph): GraphData => ({
+  nodes: nodes.id.map((id, i) => ({
+    id,
+    position: { x: nodes.x[i], y: nodes.y[i] },
+    data: { label: id, community: nodes.community[i], degree: nodes.degree[i] },
+  })),
+  edges: edges.source.map((source, i) => ({
+    id: `e${source}-${edges.target[i]}`,
+    source,
+    target: edges.target[i],
+    animated: true,
+    label: edges.relationship[i],
+    data: { relationship: edges.relationship[i], weight: edges.weight[i] },
+  })),
+  metadata,
+});
+
 // Update simulation node and link types
 interface SimulationNode extends d3.SimulationNodeDatum {
   id: string;
@@ -487,10 +514,20 @@ function Flow() {
         return;
       }
 
-      const response = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/graph/`);
+      // Only request the nodes inside the current viewport, as parallel arrays
+      const { x, y, zoom } = reactFlowInstance.getViewport();
+      const params = new URLSearchParams({
+        encoding: 'columnar',
+        limit: String(GRAPH_PAGE_SIZE),
+        min_x: String(-x / zoom),
+        min_y: String(-y / zoom),
+        max_x: String((window.innerWidth - x) / zoom),
+        max_y: String((window.innerHeight - y) / zoom),
+      });
+      const response = await fetch(`${process.env.NEXT_PUBLIC_API_URL}/graph/?${params}`);
       if (!response.ok) throw new Error('Failed to fetch graph data');
       
-      const data: GraphData = await response.json();
+      const data: GraphData = columnarToGraphData(await response.json());
       
       // Process nodes with enhanced styling
       const processedNodes = data.nodes.map((node: any) => ({